@@ -1,7 +1,8 @@
 from typing import Dict, Any
 from src.guardrails import OutputModel
 from src.hooks import LifecycleHooks
-import google.generativeai as genai
+from src.llm_cache import llm_cache
+from src.llm_clients import get_model
 from src.context import UserSessionContext
 
 class InjurySupportAgent:
@@ -30,19 +31,19 @@ class InjurySupportAgent:
             Keep the response under 300 words.
             """
             
-            model = genai.GenerativeModel('gemini-pro')
-            response = model.generate_content(prompt)
+            model = get_model()
+            text = llm_cache.generate(model, prompt, 'injury_support')
             
             # Update injury notes if new information was provided
             if "injur" in input_text.lower() or "pain" in input_text.lower():
                 context.injury_notes = input_text
             
-            LifecycleHooks.on_tool_end('InjurySupportAgent', context, {'response': response.text})
+            LifecycleHooks.on_tool_end('InjurySupportAgent', context, {'response': text})
             
             return OutputModel(
                 success=True,
                 message="Injury support response generated",
-                data={'response': response.text}
+                data={'response': text}
             ).model_dump()
         
         except Exception as e:
@@ -2,7 +2,17 @@ from typing import Dict, Any
 from src.agent import WellnessAgent
 from src.context import UserSessionContext
 from src.hooks import LifecycleHooks
-import google.generativeai as genai
+from src.intents import IntentMatcher
+from src.llm_cache import llm_cache
+from src.llm_clients import get_model
+
+# Specialized agent chosen for a message by keyword, in priority order
+AGENT_INTENTS = IntentMatcher([
+    ("injury", ["pain", "painful", "hurt*", "injur*"]),
+    ("nutrition", ["food*", "meal*", "diet*", "eat*"]),
+    ("sleep", ["tired", "sleep*", "insomnia"]),
+    ("escalation", ["human", "talk to someone"])
+])
 
 class MainAgent(WellnessAgent):
     """Enhanced main agent with additional coordination capabilities"""
@@ -13,17 +23,10 @@ class MainAgent(WellnessAgent):
     
     def coordinate_agents(self, input_text: str) -> Dict[str, Any]:
         """Coordinate between specialized agents based on input"""
-        agent_priority = [
-            ("injury", ["pain", "hurt", "injury"]),
-            ("nutrition", ["food", "meal", "diet", "eat"]),
-            ("sleep", ["tired", "sleep", "insomnia"]),
-            ("escalation", ["human", "talk to someone"])
-        ]
-        
-        for agent, keywords in agent_priority:
-            if any(keyword in input_text.lower() for keyword in keywords):
-                self.current_focus = agent
-                return self.specialized_agents[agent].process(input_text, self.context)
+        agent = AGENT_INTENTS.match(input_text).intent
+        if agent:
+            self.current_focus = agent
+            return self.specialized_agents[agent].process(input_text, self.context)
         
         self.current_focus = "general"
         return super().process_user_input(input_text)
@@ -45,6 +48,5 @@ class MainAgent(WellnessAgent):
         Keep it under 200 words.
         """
         
-        model = genai.GenerativeModel('gemini-pro')
-        response = model.generate_content(prompt)
-        return response.text
\ No newline at end of file
+        model = get_model()
+        return llm_cache.generate(model, prompt, 'daily_summary')
\ No newline at end of file
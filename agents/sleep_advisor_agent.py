@@ -1,7 +1,8 @@
 from typing import Dict, Any
 from src.guardrails import OutputModel
 from src.hooks import LifecycleHooks
-import google.generativeai as genai
+from src.llm_cache import llm_cache
+from src.llm_clients import get_model
 from src.context import UserSessionContext
 
 class SleepAdvisorAgent:
@@ -30,15 +31,15 @@ class SleepAdvisorAgent:
             Keep the response under 300 words.
             """
             
-            model = genai.GenerativeModel('gemini-pro')
-            response = model.generate_content(prompt)
+            model = get_model()
+            text = llm_cache.generate(model, prompt, 'sleep_advisor')
             
-            LifecycleHooks.on_tool_end('SleepAdvisorAgent', context, {'response': response.text})
+            LifecycleHooks.on_tool_end('SleepAdvisorAgent', context, {'response': text})
             
             return OutputModel(
                 success=True,
                 message="Sleep advisor response generated",
-                data={'response': response.text}
+                data={'response': text}
             ).model_dump()
         
         except Exception as e:
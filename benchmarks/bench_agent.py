@@ -0,0 +1,107 @@
+"""Agent load test: turn throughput and tail latency against the offline fake LLM.
+
+Runs ``--sessions`` concurrent chat sessions, each sending ``--turns``
+messages one after another through WellnessAgent.aprocess_user_input on
+one event loop. Messages are drawn from the labeled specialist examples
+plus tool requests (goals, meal and workout plans, moods). Every model
+call goes to the fake provider in src/fake_llm.py, so no network access
+or API quota is needed; ``--latency``, ``--error-rate`` and ``--seed``
+set its simulated delays and failures. The LLM cache is disabled unless
+``--cache`` is given, so every turn pays for its model calls.
+
+Reports turns per second, p50/p95/p99 turn latency, turns by status and
+the model calls made.
+
+Usage:
+  python benchmarks/bench_agent.py [--sessions 50] [--turns 10] [--latency lognormal:400,0.5] [--error-rate 0]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+# Add project root to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+EXAMPLES = Path(__file__).parent.parent / "src" / "specialist_examples.tsv"
+TOOL_MESSAGES = [
+    "My goal is to lose 5kg in 2 months",
+    "Can you make me a meal plan for this week?",
+    "What food should I eat for my goal?",
+    "Suggest a workout I can do at home",
+    "Give me a new exercise routine",
+    "I'm in a great mood today",
+    "I feel a bit anxious about my progress",
+]
+
+
+def percentile(values: list, share: float) -> float:
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+async def session(agent, messages: list, latencies: list, statuses: Counter):
+    for text in messages:
+        started = time.perf_counter()
+        result = await agent.aprocess_user_input(text)
+        latencies.append(time.perf_counter() - started)
+        statuses[result.get("status")] += 1
+
+
+async def run(args, load_examples, WellnessAgent, UserSessionContext) -> tuple:
+    rng = random.Random(args.seed)
+    corpus = [text for _, text in load_examples(EXAMPLES)] + TOOL_MESSAGES * 10
+    latencies, statuses = [], Counter()
+    sessions = []
+    for uid in range(args.sessions):
+        context = UserSessionContext(name=f"user{uid}", uid=uid, goal={"description": "lose 5kg in 2 months"})
+        sessions.append(session(WellnessAgent(context), rng.choices(corpus, k=args.turns), latencies, statuses))
+    started = time.perf_counter()
+    await asyncio.gather(*sessions)
+    return time.perf_counter() - started, sorted(latencies), statuses
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--turns", type=int, default=10)
+    parser.add_argument("--latency", default="lognormal:400,0.5", help="fake model delay in ms or a distribution")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--cache", action="store_true", help="keep the in-memory LLM cache on")
+    args = parser.parse_args()
+
+    # The provider and its timing are read when the modules are imported
+    os.environ["WELLNESS_LLM_PROVIDER"] = "fake"
+    os.environ["WELLNESS_LLM_CACHE"] = "off"
+    os.environ["WELLNESS_FAKE_LLM_LATENCY_MS"] = args.latency
+    os.environ["WELLNESS_FAKE_LLM_ERROR_RATE"] = str(args.error_rate)
+    os.environ["WELLNESS_FAKE_LLM_SEED"] = str(args.seed)
+    from src.agent import WellnessAgent
+    from src.classifier import load_examples
+    from src.context import UserSessionContext
+    from src.llm_cache import llm_cache
+    from src.llm_clients import registry
+
+    if not args.cache:
+        llm_cache.ttls = {site: 0.0 for site in llm_cache.ttls}
+        llm_cache.default_ttl = 0.0
+
+    seconds, latencies, statuses = asyncio.run(run(args, load_examples, WellnessAgent, UserSessionContext))
+    calls = registry.summary()["calls"]
+    print(f"{args.sessions} sessions x {args.turns} turns, fake model latency {args.latency}, "
+          f"error rate {args.error_rate:.0%}")
+    print(f"  {len(latencies) / seconds:,.1f} turns/s over {seconds:.2f}s")
+    print(f"  latency p50 {percentile(latencies, 0.5) * 1000:,.0f}ms  p95 {percentile(latencies, 0.95) * 1000:,.0f}ms"
+          f"  p99 {percentile(latencies, 0.99) * 1000:,.0f}ms  max {latencies[-1] * 1000:,.0f}ms")
+    print(f"  statuses {dict(statuses)}")
+    for name, stats in calls.items():
+        print(f"  model {name}: {stats['calls']} calls ({stats['calls'] / len(latencies):.2f}/turn), "
+              f"{stats['errors']} errors")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""Micro-batching benchmark: classification throughput per Gemini request with a fake model.
+
+Sends ``--requests`` specialist-routing requests, arriving at ``--rate``
+per second, through a MicroBatcher backed by a fake model. Each fake
+call takes ``--llm-ms`` plus ``--item-ms`` per item in the prompt, and
+at most ``--quota`` calls run at once, like a provider's concurrency
+quota; the batcher is allowed as many batches in flight. The fake answers batches item by item from the labeled examples
+in src/specialist_examples.tsv. Every message is made unique so neither
+the cache nor deduplication within a batch plays a part.
+
+For each max batch size the benchmark reports requests per second, the
+Gemini calls made (the quota units spent), requests per call, p50/p95
+latency and whether every caller got the answer to its own message. A
+max batch size of 1 is the unbatched baseline.
+
+Usage:
+  python benchmarks/bench_batching.py [--requests 1000] [--rate 500] [--sizes 1,8,16,32] [--wait-ms 5]
+"""
+import argparse
+import asyncio
+import json
+import re
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+
+# Add project root to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.batching import MicroBatcher
+from src.classifier import load_examples
+from src.llm_cache import LLMCache
+
+EXAMPLES = Path(__file__).parent.parent / "src" / "specialist_examples.tsv"
+INSTRUCTIONS = "For each user input, answer with nutrition, injury, sleep, escalation or None."
+ITEM = re.compile(r"^\d+\. (\".*\")$", re.MULTILINE)
+MESSAGE = re.compile(r"Input: (.*) \(#\d+\)$", re.MULTILINE)
+
+
+class Response:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class FakeModel:
+    """Answers single and batched routing prompts after a simulated delay, ``quota`` calls at a time"""
+
+    model_name = "models/fake"
+
+    def __init__(self, labels: dict, llm_ms: float, item_ms: float, quota: int):
+        self.labels = labels
+        self.llm_ms = llm_ms
+        self.item_ms = item_ms
+        self.slots = threading.Semaphore(quota)
+        self.async_slots = asyncio.Semaphore(quota)
+        self.calls = 0
+
+    def label(self, message: str) -> str:
+        return self.labels[message.rsplit(" (#", 1)[0]]
+
+    def generate_content(self, prompt: str) -> Response:
+        items = [json.loads(item) for item in ITEM.findall(prompt)]
+        with self.slots:
+            self.calls += 1
+            time.sleep((self.llm_ms + self.item_ms * max(len(items), 1)) / 1000)
+        return self.answer(prompt, items)
+
+    async def generate_content_async(self, prompt: str) -> Response:
+        items = [json.loads(item) for item in ITEM.findall(prompt)]
+        async with self.async_slots:
+            self.calls += 1
+            await asyncio.sleep((self.llm_ms + self.item_ms * max(len(items), 1)) / 1000)
+        return self.answer(prompt, items)
+
+    def answer(self, prompt: str, items: list) -> Response:
+        if items:
+            return Response(json.dumps([self.label(item) for item in items]))
+        return Response(self.label(MESSAGE.search(prompt).group(1)))
+
+
+async def run(batcher: MicroBatcher, model: FakeModel, messages: list, rate: float) -> tuple:
+    """Send the messages at ``rate`` per second; wall time, latencies and answers"""
+    latencies = [0.0] * len(messages)
+
+    async def ask(i: int, message: str):
+        await asyncio.sleep(i / rate)
+        started = time.perf_counter()
+        answer = await batcher.agenerate(model, f"Route this message.\nInput: {message}", message)
+        latencies[i] = time.perf_counter() - started
+        return answer
+
+    started = time.perf_counter()
+    answers = await asyncio.gather(*(ask(i, message) for i, message in enumerate(messages)))
+    return time.perf_counter() - started, latencies, answers
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--rate", type=float, default=500.0, help="requests arriving per second")
+    parser.add_argument("--sizes", type=lambda text: [int(value) for value in text.split(",")],
+                        default=[1, 8, 16, 32])
+    parser.add_argument("--wait-ms", type=float, default=5.0, help="max time a request waits for its batch")
+    parser.add_argument("--llm-ms", type=float, default=300.0, help="simulated latency of a Gemini call")
+    parser.add_argument("--item-ms", type=float, default=5.0, help="extra latency per item in a prompt")
+    parser.add_argument("--quota", type=int, default=8, help="Gemini calls allowed in flight at once")
+    args = parser.parse_args()
+
+    examples = load_examples(EXAMPLES)
+    labels = {text: label if label != "none" else "None" for label, text in examples}
+    messages = [f"{examples[i % len(examples)][1]} (#{i})" for i in range(args.requests)]
+    expected = [labels[message.rsplit(" (#", 1)[0]] for message in messages]
+    print(f"{len(messages):,} requests at {args.rate:,.0f}/s, {args.llm_ms:.0f}ms + {args.item_ms:.0f}ms/item "
+          f"per call, {args.quota} calls in flight")
+    print(f"{'max batch':>9} {'req/s':>8} {'calls':>7} {'req/call':>9} {'p50 ms':>8} {'p95 ms':>8}  correct")
+    for size in args.sizes:
+        model = FakeModel(labels, args.llm_ms, args.item_ms, args.quota)
+        # A TTL of 0 leaves the cache out of the measurement
+        cache = LLMCache(path=None, ttls={"specialist_router": 0})
+        batcher = MicroBatcher("specialist_router", INSTRUCTIONS, max_size=size, max_wait_ms=args.wait_ms,
+                               max_in_flight=args.quota, cache=cache)
+        seconds, latencies, answers = asyncio.run(run(batcher, model, messages, args.rate))
+        latencies.sort()
+        p95 = latencies[int(len(latencies) * 0.95)]
+        print(f"{size:>9} {len(messages) / seconds:>8,.0f} {model.calls:>7,} {len(messages) / model.calls:>9.1f} "
+              f"{statistics.median(latencies) * 1000:>8,.0f} {p95 * 1000:>8,.0f}  {answers == expected}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Throughput of the bulk NDJSON biofeedback ingest endpoint.
+
+Usage: python benchmarks/bench_bulk_ingest.py [--readings 100000] [--users 100]
+"""
+import argparse
+import json
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Add project root to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from fastapi.testclient import TestClient
+from src import backend_main
+from src.storage import create_store
+
+
+def build_payload(readings: int, users: int) -> bytes:
+    """NDJSON body of readings spread over users, one reading per minute"""
+    user_ids = [str(uuid.uuid4()) for _ in range(users)]
+    start = datetime.now() - timedelta(minutes=readings)
+    lines = []
+    for i in range(readings):
+        lines.append(json.dumps({
+            "user_id": user_ids[i % users],
+            "heart_rate": random.randint(55, 110),
+            "stress_level": random.randint(1, 10),
+            "sleep_quality": random.randint(1, 10),
+            "steps": random.randint(0, 200),
+            "timestamp": (start + timedelta(minutes=i)).isoformat()
+        }))
+    return "\n".join(lines).encode()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--readings", type=int, default=100_000)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--engine", default="memory")
+    args = parser.parse_args()
+
+    payload = build_payload(args.readings, args.users)
+    backend_main.db = create_store(args.engine)
+    client = TestClient(backend_main.app)
+
+    start = time.perf_counter()
+    response = client.post("/biofeedback/bulk", content=payload,
+                           headers={"Content-Type": "application/x-ndjson"})
+    elapsed = time.perf_counter() - start
+    result = response.json()
+
+    print(f"accepted={result['accepted']} rejected={result['rejected']} "
+          f"in {elapsed:.2f}s -> {result['accepted'] / elapsed:,.0f} readings/s")
+    backend_main.db.close()
+
+
+if __name__ == "__main__":
+    main()
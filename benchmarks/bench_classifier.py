@@ -0,0 +1,75 @@
+"""Specialist routing benchmark: local classifier hit rate, accuracy and latency saved.
+
+Splits the labeled examples in src/specialist_examples.tsv into
+``--folds`` folds, trains on all but one and routes the held-out messages
+through a FallbackClassifier whose fallback stands in for the Gemini call:
+it sleeps ``--llm-ms`` and returns the true label. For each confidence
+threshold it reports how many messages were answered locally, how many of
+those were right, the mean local prediction time and the latency saved.
+
+Usage:
+  python benchmarks/bench_classifier.py [--folds 5] [--llm-ms 20] [--thresholds 0.5,0.6,0.7,0.8]
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+# Add project root to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.classifier import FallbackClassifier, HashedNgramClassifier, load_examples
+
+EXAMPLES = Path(__file__).parent.parent / "src" / "specialist_examples.tsv"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--examples", default=str(EXAMPLES))
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--llm-ms", type=float, default=20.0, help="simulated latency of an LLM fallback")
+    parser.add_argument("--thresholds", type=lambda text: [float(value) for value in text.split(",")],
+                        default=[0.5, 0.6, 0.7, 0.8])
+    args = parser.parse_args()
+
+    examples = load_examples(args.examples)
+    random.Random(0).shuffle(examples)
+    started = time.perf_counter()
+    HashedNgramClassifier.train(examples)
+    print(f"{len(examples)} examples, trained in {time.perf_counter() - started:.2f}s")
+    models = [HashedNgramClassifier.train([example for i, example in enumerate(examples) if i % args.folds != fold])
+              for fold in range(args.folds)]
+
+    print(f"{'threshold':>9} {'hit rate':>9} {'local acc':>10} {'local ms':>9} {'saved s':>8}")
+    for threshold in args.thresholds:
+        correct = 0
+        totals = {"local": 0, "requests": 0, "local_ms": 0.0, "saved": 0.0}
+        for fold, model in enumerate(models):
+            held_out = examples[fold::args.folds]
+            labels = {text: label for label, text in held_out}
+
+            def ask_llm(text):
+                time.sleep(args.llm_ms / 1000)
+                return None if labels[text] == "none" else labels[text]
+
+            router = FallbackClassifier(args.examples, ask_llm, threshold)
+            router.model = model
+            before = 0
+            for label, text in held_out:
+                routed = router.classify(text)
+                if router.local > before:
+                    correct += routed == (None if label == "none" else label)
+                    before = router.local
+            stats = router.stats()
+            totals["local"] += stats["local"]
+            totals["requests"] += stats["requests"]
+            totals["local_ms"] += stats["mean_local_ms"] * stats["requests"]
+            totals["saved"] += stats["latency_saved_seconds"] or 0.0
+        print(f"{threshold:>9.2f} {totals['local'] / totals['requests']:>9.1%} "
+              f"{correct / max(totals['local'], 1):>10.1%} {totals['local_ms'] / totals['requests']:>9.3f} "
+              f"{totals['saved']:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
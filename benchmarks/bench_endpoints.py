@@ -0,0 +1,239 @@
+"""Load and latency benchmark suite for every FastAPI backend endpoint.
+
+Drives the app in-process through httpx's ASGI transport (no network).
+Seeds a dataset, then sends ``--requests`` calls to each endpoint from
+``--concurrency`` concurrent clients and reports throughput and
+p50/p95/p99 latency. Results can be saved as JSON and compared against
+an earlier run; the exit code is 1 if any endpoint regressed.
+
+Usage:
+  python benchmarks/bench_endpoints.py [--concurrency 16] [--requests 1000]
+      [--users 50] [--history 1000] [--engine memory]
+      [--output results.json] [--compare baseline.json] [--threshold 0.15]
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+
+# Add project root to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import httpx
+from src import backend_main
+from src.storage import create_store
+
+GOAL_TEXTS = [
+    "I want to lose 5 kg of fat before summer",
+    "Gain muscle and get stronger",
+    "Sleep better and walk more every day",
+    "Lose weight for my wedding",
+]
+
+
+async def seed(client: httpx.AsyncClient, users: int, history: int, goals: int) -> list:
+    """Create users with goals, plans and ``history`` biofeedback readings each"""
+    user_ids = []
+    for i in range(users):
+        response = await client.post("/users/", json={"name": f"bench{i}", "email": f"seed{i}@bench.local"})
+        user_ids.append(response.json()["user_id"])
+    for user_id in user_ids:
+        for j in range(goals):
+            await client.post("/goals/", json={"user_id": user_id, "description": GOAL_TEXTS[j % len(GOAL_TEXTS)],
+                                               "target": "5kg", "timeframe": "2 months"})
+        await client.post("/meal-plans/", json={"user_id": user_id, "plan": {"Monday": ["Oats"]}})
+        await client.post("/workouts/", json={"user_id": user_id, "exercises": {"Monday": ["Run"]}})
+
+    start = datetime.now() - timedelta(minutes=history)
+    lines = [
+        json.dumps({"user_id": user_id, "heart_rate": random.randint(55, 110),
+                    "stress_level": random.randint(1, 10), "sleep_quality": random.randint(1, 10),
+                    "timestamp": (start + timedelta(minutes=k)).isoformat()})
+        for user_id in user_ids for k in range(history)
+    ]
+    await client.post("/biofeedback/bulk", content="\n".join(lines))
+    return user_ids
+
+
+def build_cases(user_ids: list) -> list:
+    """``(name, method, make_request)`` for every endpoint; make_request returns (url, kwargs)"""
+    emails = itertools.count()
+    pick = lambda: random.choice(user_ids)
+    reading = lambda: {"user_id": pick(), "heart_rate": random.randint(55, 110),
+                       "stress_level": random.randint(1, 10), "sleep_quality": random.randint(1, 10)}
+
+    def bulk():
+        lines = [json.dumps(reading()) for _ in range(100)]
+        return "/biofeedback/bulk", {"content": "\n".join(lines)}
+
+    def bulk_goals():
+        goals = [{"user_id": pick(), "description": random.choice(GOAL_TEXTS), "target": "3kg", "timeframe": "3 months"}
+                 for _ in range(100)]
+        return "/goals/bulk", {"json": goals}
+
+    def bulk_users():
+        return "/users/bulk", {"json": [{"name": "u", "email": f"load{next(emails)}@bench.local"} for _ in range(100)]}
+
+    return [
+        ("health", "GET", lambda: ("/health", {})),
+        ("create_user", "POST", lambda: ("/users/", {"json": {"name": "u", "email": f"load{next(emails)}@bench.local"}})),
+        ("bulk_users_100", "POST", bulk_users),
+        ("get_user", "GET", lambda: (f"/users/{pick()}", {})),
+        ("create_goal", "POST", lambda: ("/goals/", {"json": {"user_id": pick(), "description": random.choice(GOAL_TEXTS),
+                                                             "target": "3kg", "timeframe": "3 months"}})),
+        ("bulk_goals_100", "POST", bulk_goals),
+        ("list_goals", "GET", lambda: (f"/goals/user/{pick()}", {})),
+        ("create_meal_plan", "POST", lambda: ("/meal-plans/", {"json": {"user_id": pick(), "plan": {"Monday": ["Oats"]}}})),
+        ("list_meal_plans", "GET", lambda: (f"/meal-plans/user/{pick()}", {})),
+        ("generate_meal_plan", "GET", lambda: (f"/meal-plans/generate?diet={random.choice(['keto', 'vegan', 'balanced'])}", {})),
+        ("create_workout", "POST", lambda: ("/workouts/", {"json": {"user_id": pick(), "exercises": {"Monday": ["Run"]}}})),
+        ("list_workouts", "GET", lambda: (f"/workouts/user/{pick()}", {})),
+        ("generate_workout", "GET", lambda: (f"/workouts/generate?goal_type={random.choice(['weight_loss', 'general'])}", {})),
+        ("add_biofeedback", "POST", lambda: ("/biofeedback/", {"json": reading()})),
+        ("bulk_biofeedback_100", "POST", bulk),
+        ("list_biofeedback", "GET", lambda: (f"/biofeedback/user/{pick()}", {})),
+        ("biofeedback_range_24h", "GET", lambda: (f"/biofeedback/user/{pick()}/range?last=24h", {})),
+        ("biofeedback_stats", "GET", lambda: (f"/biofeedback/user/{pick()}/stats", {})),
+        ("biofeedback_downsample", "GET", lambda: (f"/biofeedback/user/{pick()}/downsample?bucket=1h", {})),
+        ("wellness_tip", "GET", lambda: ("/wellness-tip", {})),
+        ("metrics", "GET", lambda: ("/metrics", {})),
+    ]
+
+
+async def run_case(client: httpx.AsyncClient, method: str, make_request, requests: int, concurrency: int) -> dict:
+    """Send ``requests`` calls from ``concurrency`` workers and summarize latency"""
+    latencies = []
+    errors = 0
+    remaining = itertools.count()
+
+    async def worker():
+        nonlocal errors
+        while next(remaining) < requests:
+            url, kwargs = make_request()
+            start = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    p50, p95, p99 = np.percentile(np.array(latencies) * 1000, [50, 95, 99])
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3)
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=Path(__file__).parent).stdout.strip()
+    except OSError:
+        return ""
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """Print changes against a previous run and return the names that regressed"""
+    regressions = []
+    print(f"\n{'endpoint':<26} {'req/s':>16} {'p95 ms':>18}")
+    for name, current in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        throughput_change = current["throughput"] / before["throughput"] - 1
+        p95_change = current["p95_ms"] / before["p95_ms"] - 1 if before["p95_ms"] else 0.0
+        regressed = p95_change > threshold or throughput_change < -threshold
+        if regressed:
+            regressions.append(name)
+        print(f"{name:<26} {before['throughput']:>7.0f} {throughput_change:>+7.1%} "
+              f"{before['p95_ms']:>8.2f} {p95_change:>+8.1%}{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+
+async def run(args) -> dict:
+    random.seed(args.seed)
+    options = {"path": tempfile.mkdtemp(prefix="wellness-bench-")} if args.engine == "durable" else {}
+    if args.engine == "sqlite":
+        options = {"path": str(Path(tempfile.mkdtemp(prefix="wellness-bench-")) / "bench.db")}
+    backend_main.db = create_store(args.engine, **options)
+    transport = httpx.ASGITransport(app=backend_main.app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            started = time.perf_counter()
+            user_ids = await seed(client, args.users, args.history, args.goals)
+            print(f"seeded {args.users} users x {args.history} readings in {time.perf_counter() - started:.1f}s "
+                  f"({args.engine} engine, concurrency {args.concurrency})")
+            print(f"{'endpoint':<26} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+            results = {}
+            for name, method, make_request in build_cases(user_ids):
+                if args.only and name not in args.only:
+                    continue
+                result = await run_case(client, method, make_request, args.requests, args.concurrency)
+                results[name] = result
+                print(f"{name:<26} {result['throughput']:>9.0f} {result['p50_ms']:>8.2f} "
+                      f"{result['p95_ms']:>8.2f} {result['p99_ms']:>8.2f} {result['errors']:>7}")
+    finally:
+        backend_main.db.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=16, help="concurrent clients per endpoint")
+    parser.add_argument("--requests", type=int, default=1000, help="requests sent to each endpoint")
+    parser.add_argument("--users", type=int, default=50, help="users in the seeded dataset")
+    parser.add_argument("--history", type=int, default=1000, help="biofeedback readings per seeded user")
+    parser.add_argument("--goals", type=int, default=10, help="goals per seeded user")
+    parser.add_argument("--engine", default="memory", help="storage engine (memory, sqlite, durable)")
+    parser.add_argument("--only", type=lambda text: set(text.split(",")), default=None,
+                        help="comma-separated endpoint names to run")
+    parser.add_argument("--seed", type=int, default=0, help="random seed for reproducible request mixes")
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.15,
+                        help="relative p95 increase or throughput drop counted as a regression")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+
+    if args.output:
+        report = {
+            "meta": {
+                "timestamp": datetime.now().isoformat(),
+                "commit": git_commit(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "args": {key: value for key, value in vars(args).items()
+                         if key not in ("output", "compare", "only")}
+            },
+            "results": results
+        }
+        Path(args.output).write_text(json.dumps(report, indent=2))
+        print(f"\nresults written to {args.output}")
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())["results"]
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} endpoint(s) regressed more than {args.threshold:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""Throughput benchmark: substring keyword routers versus the compiled intent matcher.
+
+Generates a corpus of ``--messages`` synthetic chat messages and routes
+each through the four keyword routers (goal analysis, agent tool routing,
+specialized agent coordination and the Streamlit chat), first with the
+original ``any(word in text ...)`` chains and then with IntentMatcher.
+Reports messages per second for both and how often they agree; the
+matcher only matches whole words (or prefixes marked ``*``), so messages
+like "great" (eat), "again" (gain) or "fatigue" (fat) are expected to
+route differently. A second run routes the same corpus through one
+synthetic table of ``--keywords`` keywords to show how each approach
+scales with the size of the table.
+
+The router tables are repeated here so the benchmark runs without the
+LLM and Streamlit dependencies of the modules that own them.
+
+Usage:
+  python benchmarks/bench_intents.py [--messages 100000] [--keywords 400] [--repeat 3]
+"""
+import argparse
+import random
+import string
+import sys
+import time
+from pathlib import Path
+
+# Add project root to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.intents import IntentMatcher
+
+WORDS = [
+    "i", "want", "to", "my", "the", "a", "and", "for", "this", "week", "today", "really", "please", "could",
+    "you", "help", "me", "with", "some", "again", "great", "fatigue", "heat", "feature", "shoulder", "knee",
+    "plan", "more", "less", "after", "work", "morning", "evening", "running", "walking", "water", "protein",
+]
+KEYWORDS = [
+    "lose", "losing", "weight", "fat", "muscle", "gain", "gaining", "goal", "goals", "target", "meal", "meals",
+    "food", "diet", "eat", "eating", "workout", "workouts", "exercise", "exercises", "training", "mood", "feel",
+    "feeling", "pain", "hurts", "injury", "injured", "tired", "sleep", "sleeping", "insomnia", "human",
+    "talk to someone", "tips", "advice", "suggestions", "happy", "sad", "angry", "down", "frustrated", "good",
+]
+
+GOAL_INTENTS = IntentMatcher([
+    ("lose", ["lose*", "losing"]),
+    ("weight", ["weight*", "fat"]),
+    ("muscle_gain", ["muscle*", "gain*"])
+])
+TOOL_INTENTS = IntentMatcher([
+    ("goal_analyzer", ["goal*", "target*"]),
+    ("meal_planner", ["meal*", "food*"]),
+    ("workout_recommender", ["workout*", "exercis*"]),
+    ("mood_detector", ["mood*", "feel*"])
+])
+AGENT_INTENTS = IntentMatcher([
+    ("injury", ["pain", "painful", "hurt*", "injur*"]),
+    ("nutrition", ["food*", "meal*", "diet*", "eat*"]),
+    ("sleep", ["tired", "sleep*", "insomnia"]),
+    ("escalation", ["human", "talk to someone"])
+])
+CHAT_TABLE = [
+    ("meal", ["meal*", "diet*", "food*", "eat*"]),
+    ("workout", ["workout*", "exercis*", "train*"]),
+    ("goal", ["goal*", "target*", "objective*"]),
+    ("tip", ["tip", "tips", "advice", "suggestion*"]),
+    ("mood", ["mood*", "happy", "sad", "angry"])
+]
+CHAT_INTENTS = IntentMatcher(CHAT_TABLE)
+
+
+def make_messages(count: int) -> list:
+    """Chat messages of 4-20 words, most containing one to three keywords"""
+    random.seed(0)
+    messages = []
+    for _ in range(count):
+        words = random.choices(WORDS, k=random.randint(4, 20))
+        for _ in range(random.choice([0, 1, 1, 2, 3])):
+            words.insert(random.randrange(len(words) + 1), random.choice(KEYWORDS))
+        if random.random() < 0.5:
+            words[0] = words[0].capitalize()
+        messages.append(" ".join(words) + random.choice([".", "?", "!", ""]))
+    return messages
+
+
+def substring_routes(text: str) -> tuple:
+    """The four routers as they were written before the shared matcher"""
+    lower = text.lower()
+    if "lose" in lower and ("weight" in lower or "fat" in lower):
+        goal = "weight_loss"
+    elif "muscle" in lower or "gain" in lower:
+        goal = "muscle_gain"
+    else:
+        goal = "general"
+
+    if "goal" in lower or "target" in lower:
+        tool = "goal_analyzer"
+    elif "meal" in lower or "food" in lower:
+        tool = "meal_planner"
+    elif "workout" in lower or "exercise" in lower:
+        tool = "workout_recommender"
+    elif "mood" in lower or "feel" in lower:
+        tool = "mood_detector"
+    else:
+        tool = None
+
+    agent = None
+    for name, keywords in [("injury", ["pain", "hurt", "injury"]), ("nutrition", ["food", "meal", "diet", "eat"]),
+                           ("sleep", ["tired", "sleep", "insomnia"]), ("escalation", ["human", "talk to someone"])]:
+        if any(keyword in lower for keyword in keywords):
+            agent = name
+            break
+
+    if any(word in lower for word in ["meal", "diet", "food", "eat"]):
+        chat = "meal"
+    elif any(word in lower for word in ["workout", "exercise", "train"]):
+        chat = "workout"
+    elif any(word in lower for word in ["goal", "target", "objective"]):
+        chat = "goal"
+    elif any(word in lower for word in ["tip", "advice", "suggestion"]):
+        chat = "tip"
+    elif any(word in lower for word in ["happy", "sad", "angry", "mood"]):
+        chat = "mood"
+    else:
+        chat = None
+    return goal, tool, agent, chat
+
+
+def matcher_routes(text: str) -> tuple:
+    """The four routers using IntentMatcher"""
+    found = GOAL_INTENTS.match(text).intents
+    if "lose" in found and "weight" in found:
+        goal = "weight_loss"
+    elif "muscle_gain" in found:
+        goal = "muscle_gain"
+    else:
+        goal = "general"
+    return (goal, TOOL_INTENTS.match(text).intent, AGENT_INTENTS.match(text).intent,
+            CHAT_INTENTS.match(text).intent)
+
+
+def large_table(keywords: int) -> list:
+    """The chat keywords plus random filler words, spread over intents of 20 keywords each"""
+    random.seed(1)
+    words = [keyword for _, keywords in CHAT_TABLE for keyword in keywords]
+    while len(words) < keywords:
+        words.append("".join(random.choices(string.ascii_lowercase, k=random.randint(4, 9))))
+    random.shuffle(words)
+    return [(f"intent{i // 20}", words[i:i + 20]) for i in range(0, len(words), 20)]
+
+
+def substring_router(table: list):
+    """``any(keyword in text ...)`` over each intent in priority order, like the original routers"""
+    table = [(intent, [keyword.rstrip("*") for keyword in keywords]) for intent, keywords in table]
+
+    def route(text: str):
+        lower = text.lower()
+        for intent, keywords in table:
+            if any(keyword in lower for keyword in keywords):
+                return intent
+        return None
+    return route
+
+
+def run(route, messages: list, repeat: int) -> tuple:
+    """Best messages/sec over ``repeat`` passes, and the routes of the last pass"""
+    best = 0.0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        routes = [route(text) for text in messages]
+        best = max(best, len(messages) / (time.perf_counter() - started))
+    return best, routes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=100_000)
+    parser.add_argument("--keywords", type=int, default=400)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    messages = make_messages(args.messages)
+    print(f"{len(messages):,} messages, {sum(map(len, messages)) / len(messages):.0f} chars on average")
+    before, old = run(substring_routes, messages, args.repeat)
+    after, new = run(matcher_routes, messages, args.repeat)
+    print("four routers:")
+    print(f"  substring  {before:>10,.0f} messages/s")
+    print(f"  matcher    {after:>10,.0f} messages/s  ({after / before:.2f}x)")
+
+    names = ["goal", "tool", "agent", "chat"]
+    for i, name in enumerate(names):
+        differing = [text for text, a, b in zip(messages, old, new) if a[i] != b[i]]
+        agreement = 1 - len(differing) / len(messages)
+        example = f"  e.g. {differing[0]!r}" if differing else ""
+        print(f"  {name:<6} routers agree on {agreement:.1%}{example}")
+
+    table = large_table(args.keywords)
+    matcher = IntentMatcher(table)
+    before, _ = run(substring_router(table), messages, args.repeat)
+    after, _ = run(lambda text: matcher.match(text).intent, messages, args.repeat)
+    print(f"one router, {sum(len(keywords) for _, keywords in table)} keywords in {len(table)} intents:")
+    print(f"  substring  {before:>10,.0f} messages/s")
+    print(f"  matcher    {after:>10,.0f} messages/s  ({after / before:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""Memory benchmark: bytes per stored record, dict layout versus compact layout.
+
+Stores ``--readings`` biofeedback readings (1M by default) and
+``--documents`` goals, first as the plain dicts the API builds, then in
+the storage engine's compact form: columnar biofeedback series with
+packed UUID ids, and slotted document records with epoch timestamps and
+interned strings. Rows are generated in batches inside each measurement
+and tracemalloc reports what is still held afterwards, so each figure is
+exactly what that layout keeps.
+
+Usage:
+  python benchmarks/bench_memory.py [--readings 1000000] [--users 100] [--documents 100000]
+"""
+import argparse
+import gc
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Add project root to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.storage import IndexedStore, generate_ids
+
+# Rows generated and inserted per step
+BATCH = 10_000
+GOAL_TEXTS = [
+    ("Lose 5 kg before summer", "weight_loss", "Aim for 1-2 lbs per week", "Combine cardio and strength training"),
+    ("Gain muscle and get stronger", "muscle_gain", "Focus on progressive overload", "3-5 strength sessions per week"),
+    ("Sleep better and walk more", "general", "Stay consistent with healthy habits", "Balance activity and recovery"),
+]
+
+
+def make_readings(count: int, users: int):
+    """Batches of ``(id, record)`` rows shaped like those the ingest endpoint stores"""
+    random.seed(0)
+    user_ids = generate_ids(users)
+    start = datetime.now() - timedelta(seconds=count)
+    for offset in range(0, count, BATCH):
+        yield [(reading_id, {
+            "user_id": user_ids[(offset + i) % users],
+            "heart_rate": random.randint(55, 110),
+            "stress_level": random.randint(1, 10),
+            "sleep_quality": random.randint(1, 10),
+            "id": reading_id,
+            "timestamp": (start + timedelta(seconds=offset + i, microseconds=random.randint(0, 999_999))).isoformat()
+        }) for i, reading_id in enumerate(generate_ids(min(BATCH, count - offset)))]
+
+
+def make_goals(count: int, users: int):
+    """Batches of ``(id, record)`` rows shaped like those the goals endpoint stores
+
+    Strings sent by the client get their own objects per record, as they
+    would when parsed from separate request bodies.
+    """
+    random.seed(0)
+    user_ids = generate_ids(users)
+    for offset in range(0, count, BATCH):
+        rows = []
+        for goal_id in generate_ids(min(BATCH, count - offset)):
+            description, goal_type, recommendation, plan = random.choice(GOAL_TEXTS)
+            rows.append((goal_id, {
+                "user_id": "".join(random.choice(user_ids)),
+                "description": "".join(description),
+                "target": "".join("5kg"),
+                "timeframe": "".join("3 months"),
+                "id": goal_id,
+                "created_at": datetime.now().isoformat(),
+                "type": goal_type,
+                "recommendation": recommendation,
+                "plan": plan
+            }))
+        yield rows
+
+
+def measure(build) -> tuple:
+    """Bytes still held once ``build()`` returns, and the seconds it took"""
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    kept = build()
+    elapsed = time.perf_counter() - started
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    return size, elapsed
+
+
+def report(name: str, count: int, before: tuple, after: tuple):
+    print(f"{name}: {count:,} records")
+    print(f"  dicts    {before[0] / 2 ** 20:8.1f} MiB  {before[0] / count:6.1f} B/record  ({before[1]:.2f}s)")
+    print(f"  compact  {after[0] / 2 ** 20:8.1f} MiB  {after[0] / count:6.1f} B/record  ({after[1]:.2f}s)")
+    print(f"  {before[0] / after[0]:.1f}x smaller")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--readings", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--documents", type=int, default=100_000)
+    args = parser.parse_args()
+
+    def reading_dicts():
+        return {reading_id: record for rows in make_readings(args.readings, args.users) for reading_id, record in rows}
+
+    def reading_series():
+        store = IndexedStore()
+        for rows in make_readings(args.readings, args.users):
+            store.insert_many("biofeedback", rows)
+        return store
+
+    report("biofeedback", args.readings, measure(reading_dicts), measure(reading_series))
+
+    def goal_dicts():
+        return {goal_id: record for rows in make_goals(args.documents, args.users) for goal_id, record in rows}
+
+    def goal_records():
+        store = IndexedStore()
+        for rows in make_goals(args.documents, args.users):
+            store.insert_many("goals", rows)
+        return store
+
+    print()
+    report("goals", args.documents, measure(goal_dicts), measure(goal_records))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Warm-start time of the durable engine from a snapshot plus a WAL tail.
+
+Fills a durable store with biofeedback, snapshots it, writes a tail of
+readings that are only in the log, then drops the store without a final
+snapshot (as a crash would) and times how long a new store takes to load.
+
+Usage: python benchmarks/bench_recovery.py [--readings 1000000] [--users 1000] [--tail 10000]
+"""
+import argparse
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add project root to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.storage import create_store, generate_ids
+
+BATCH = 1000
+
+
+def readings(users, count, start_us):
+    """Rows for ``count`` readings spread over ``users``, one second apart per user"""
+    ids = generate_ids(count)
+    rows = []
+    for i, record_id in enumerate(ids):
+        rows.append((record_id, {
+            "id": record_id,
+            "user_id": users[i % len(users)],
+            "timestamp": (start_us + i * 1_000_000) / 1_000_000,
+            "heart_rate": 60 + i % 40,
+            "stress_level": i % 10,
+            "sleep_quality": 5
+        }))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--readings", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--tail", type=int, default=10_000, help="readings written after the last snapshot")
+    parser.add_argument("--path", default=None, help="data directory (default: a temporary directory)")
+    args = parser.parse_args()
+
+    path = args.path or tempfile.mkdtemp(prefix="wellness-recovery-")
+    users = generate_ids(args.users)
+    start_us = 1_700_000_000_000_000
+    try:
+        store = create_store("durable", path=path, sync="none", snapshot_interval=float("inf"),
+                             snapshot_wal_bytes=2 ** 62)
+        started = time.perf_counter()
+        for offset in range(0, args.readings, BATCH * 100):
+            rows = readings(users, min(BATCH * 100, args.readings - offset), start_us + offset * 1_000_000)
+            for i in range(0, len(rows), BATCH):
+                store.insert_many("biofeedback", rows[i:i + BATCH])
+        print(f"loaded {args.readings:,} readings in {time.perf_counter() - started:.2f}s")
+
+        started = time.perf_counter()
+        snapshot = store.snapshot()
+        print(f"snapshot {Path(snapshot).stat().st_size / 1e6:.1f} MB written in {time.perf_counter() - started:.2f}s")
+
+        tail = readings(users, args.tail, start_us + args.readings * 1_000_000)
+        for i in range(0, len(tail), 100):
+            store.insert_many("biofeedback", tail[i:i + 100])
+        # Simulate a crash: sync the log but skip the final snapshot
+        store.wal.close()
+        del store
+
+        started = time.perf_counter()
+        recovered = create_store("durable", path=path, snapshot_interval=float("inf"))
+        elapsed = time.perf_counter() - started
+        info = recovered.recovery
+        expected = args.readings + args.tail
+        print(f"recovered {recovered.count('biofeedback'):,}/{expected:,} readings in {elapsed:.2f}s "
+              f"(snapshot {info['snapshot_seconds']:.2f}s, "
+              f"{info['replayed_entries']} log entries {info['replay_seconds']:.2f}s)")
+        assert recovered.count("biofeedback") == expected, "recovered store is missing readings"
+        recovered.wal.close()
+    finally:
+        if not args.path:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
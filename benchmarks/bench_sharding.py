@@ -0,0 +1,127 @@
+"""Throughput of the user-sharded multi-process mode as shards are added.
+
+For each worker count, starts ``python -m src.sharding`` on a local port,
+seeds users with biofeedback history, then drives it from several client
+processes for a fixed time with a mix of per-user reads and writes.
+Worker count 0 runs the plain single-process backend without a
+dispatcher, the baseline the sharded runs are compared with.
+
+The dispatcher, every shard and every client process each need a core of
+their own: with fewer cores they only take turns on the same CPUs and
+adding shards adds dispatch overhead instead of throughput. The script
+warns when a run has fewer cores than that.
+
+Usage: python benchmarks/bench_sharding.py [--workers 0,1,2,4] [--clients 8] [--seconds 10]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+ROOT = Path(__file__).parent.parent
+
+
+def wait_for(url: str, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up")
+
+
+def seed(base_url: str, users: int, history: int) -> list:
+    """Create users and give each one ``history`` readings"""
+    with httpx.Client(base_url=base_url) as client:
+        user_ids = [
+            client.post("/users/", json={"name": f"load{i}", "email": f"load{i}@bench.local"}).json()["user_id"]
+            for i in range(users)
+        ]
+        lines = [json.dumps({"user_id": user_id, "heart_rate": random.randint(55, 110),
+                             "stress_level": random.randint(1, 10), "sleep_quality": random.randint(1, 10)})
+                 for user_id in user_ids for _ in range(history)]
+        client.post("/biofeedback/bulk", content="\n".join(lines))
+    return user_ids
+
+
+def drive(base_url: str, user_ids: list, seconds: float, counter):
+    """Client process: send a read-heavy request mix until time is up"""
+    done = 0
+    deadline = time.monotonic() + seconds
+    with httpx.Client(base_url=base_url) as client:
+        while time.monotonic() < deadline:
+            user_id = random.choice(user_ids)
+            roll = random.random()
+            if roll < 0.6:
+                response = client.get(f"/biofeedback/user/{user_id}", params={"limit": 100})
+            elif roll < 0.8:
+                response = client.get(f"/biofeedback/user/{user_id}/downsample", params={"bucket": "1m"})
+            else:
+                response = client.post("/biofeedback/", json={"user_id": user_id, "heart_rate": 70,
+                                                               "stress_level": 4, "sleep_quality": 7})
+            response.raise_for_status()
+            done += 1
+    with counter.get_lock():
+        counter.value += done
+
+
+def run(workers: int, args) -> float:
+    port = args.port
+    base_url = f"http://127.0.0.1:{port}"
+    env = dict(os.environ, WELLNESS_STORAGE_ENGINE="memory")
+    if workers:
+        command = ["-m", "src.sharding", "--workers", str(workers)]
+    else:
+        command = ["-m", "uvicorn", "src.backend_main:app", "--log-level", "warning"]
+    server = subprocess.Popen([sys.executable, *command, "--host", "127.0.0.1", "--port", str(port)],
+                              cwd=ROOT, env=env)
+    try:
+        wait_for(f"{base_url}/health")
+        user_ids = seed(base_url, args.users, args.history)
+        counter = multiprocessing.Value("q", 0)
+        clients = [multiprocessing.Process(target=drive, args=(base_url, user_ids, args.seconds, counter))
+                   for _ in range(args.clients)]
+        for client in clients:
+            client.start()
+        for client in clients:
+            client.join()
+        return counter.value / args.seconds
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", default="0,1,2,4",
+                        help="comma-separated shard counts to compare; 0 runs the unsharded backend")
+    parser.add_argument("--clients", type=int, default=8, help="load generator processes")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--history", type=int, default=500, help="readings per user")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+    print(f"{cpus} CPUs, {args.clients} client processes")
+    baseline = None
+    for workers in [int(n) for n in args.workers.split(",")]:
+        processes = (workers + 1 if workers else 1) + args.clients
+        throughput = run(workers, args)
+        baseline = baseline or throughput
+        note = f"  (needs {processes} CPUs to scale, has {cpus})" if processes > cpus else ""
+        print(f"workers={workers:<3} {throughput:>9,.0f} req/s  speedup {throughput / baseline:.2f}x{note}")
+
+
+if __name__ == "__main__":
+    main()
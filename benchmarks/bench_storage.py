@@ -0,0 +1,93 @@
+"""Create/list throughput of the memory and SQLite storage engines.
+
+Drives the FastAPI app in-process for each engine, checks that both engines
+return the same data for the same request sequence, then reports requests
+per second for the create and list endpoints.
+
+Usage: python benchmarks/bench_storage.py [--users 50] [--records 20]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add project root to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from fastapi.testclient import TestClient
+from src import backend_main
+from src.storage import create_store
+
+ENGINES = ("memory", "sqlite")
+
+
+def strip_volatile(records):
+    """Drop ids and timestamps so results from two engines can be compared"""
+    volatile = {"id", "user_id", "created_at", "timestamp"}
+    return [{k: v for k, v in r.items() if k not in volatile} for r in records]
+
+
+def run_engine(engine: str, users: int, records: int, workdir: str):
+    options = {"path": os.path.join(workdir, "bench.db")} if engine == "sqlite" else {}
+    backend_main.db = create_store(engine, **options)
+    client = TestClient(backend_main.app)
+    user_ids = []
+    timings = {}
+
+    start = time.perf_counter()
+    for i in range(users):
+        response = client.post("/users/", json={"name": f"user{i}", "email": f"user{i}@bench.local"})
+        user_ids.append(response.json()["user_id"])
+    timings["POST /users/"] = users / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for user_id in user_ids:
+        for j in range(records):
+            client.post("/goals/", json={
+                "user_id": user_id, "description": f"lose {j} kg of fat",
+                "target": f"{j}kg", "timeframe": "3 months"
+            })
+    timings["POST /goals/"] = users * records / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for user_id in user_ids:
+        for j in range(records):
+            client.post("/biofeedback/", json={
+                "user_id": user_id, "heart_rate": 60 + j, "stress_level": j % 10, "sleep_quality": 7
+            })
+    timings["POST /biofeedback/"] = users * records / (time.perf_counter() - start)
+
+    results = {}
+    for path in ("/goals/user/{}", "/biofeedback/user/{}"):
+        start = time.perf_counter()
+        for user_id in user_ids:
+            results.setdefault(path, []).append(strip_volatile(client.get(path.format(user_id)).json()))
+        timings[f"GET {path.format('{user_id}')}"] = users / (time.perf_counter() - start)
+
+    backend_main.db.close()
+    return timings, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--records", type=int, default=20)
+    args = parser.parse_args()
+
+    timings, results = {}, {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for engine in ENGINES:
+            timings[engine], results[engine] = run_engine(engine, args.users, args.records, workdir)
+
+    if results["memory"] != results["sqlite"]:
+        sys.exit("Engines returned different results")
+
+    print(f"{'endpoint':<34}" + "".join(f"{engine + ' req/s':>16}" for engine in ENGINES))
+    for endpoint in timings["memory"]:
+        print(f"{endpoint:<34}" + "".join(f"{timings[engine][endpoint]:>16.0f}" for engine in ENGINES))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Fan-out latency of live biofeedback streams with many subscribers.
+
+Opens ``--subscribers`` subscriptions on one user, publishes batches of
+readings from a worker thread (as the sync endpoints do), and measures how
+long it takes until every subscriber has drained each batch.
+
+Usage: python benchmarks/bench_stream_fanout.py [--subscribers 5000] [--batches 50] [--readings 10]
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+
+# Add project root to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.pubsub import Broker
+
+
+async def run(subscribers: int, batches: int, readings: int):
+    broker = Broker()
+    broker.bind(asyncio.get_running_loop())
+    user_id = "bench-user"
+    subscriptions = [broker.subscribe(user_id, "1h") for _ in range(subscribers)]
+    received = [0] * subscribers
+    drained = asyncio.Event()
+    remaining = [subscribers]
+
+    async def consume(i, subscription):
+        while received[i] < batches * readings:
+            batch = await subscription.next_batch(timeout=30)
+            received[i] += len(batch["readings"])
+            if received[i] % readings == 0:
+                remaining[0] -= 1
+                if remaining[0] == 0:
+                    drained.set()
+
+    tasks = [asyncio.create_task(consume(i, s)) for i, s in enumerate(subscriptions)]
+    payload = [{"id": str(n), "user_id": user_id, "heart_rate": 70} for n in range(readings)]
+    latencies = []
+    for _ in range(batches):
+        drained.clear()
+        remaining[0] = subscribers
+        start = time.perf_counter()
+        threading.Thread(target=broker.publish, args=(user_id, payload, {"1h": {"count": readings}})).start()
+        await drained.wait()
+        latencies.append((time.perf_counter() - start) * 1000)
+    await asyncio.gather(*tasks)
+    print(f"{subscribers} subscribers, {readings} readings per batch: "
+          f"median {statistics.median(latencies):.1f} ms, max {max(latencies):.1f} ms to reach all subscribers "
+          f"({subscribers / statistics.median(latencies) * 1000:,.0f} deliveries/s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--subscribers", type=int, default=5000)
+    parser.add_argument("--batches", type=int, default=50)
+    parser.add_argument("--readings", type=int, default=10)
+    args = parser.parse_args()
+    asyncio.run(run(args.subscribers, args.batches, args.readings))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Per-user read latency of the indexed store versus a full collection scan.
+
+Usage: python benchmarks/bench_user_index.py [--sizes 1000,10000,100000,1000000]
+"""
+import argparse
+import statistics
+import sys
+import time
+import uuid
+from pathlib import Path
+
+# Add project root to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.storage import IndexedStore
+
+RECORDS_PER_USER = 50
+REPEATS = 200
+
+
+def build_store(total_records: int):
+    """Fill the goals collection with users of RECORDS_PER_USER goals each"""
+    store = IndexedStore()
+    target_user = None
+    user_id = None
+    for i in range(total_records):
+        if i % RECORDS_PER_USER == 0:
+            user_id = str(uuid.uuid4())
+            target_user = target_user or user_id
+        store.insert("goals", str(i), {"user_id": user_id, "description": "walk more"})
+    return store, target_user
+
+
+def time_call(fn, repeats: int = REPEATS) -> float:
+    """Median wall time of fn() in microseconds"""
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1e6)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="1000,10000,100000,1000000")
+    args = parser.parse_args()
+
+    print(f"{'records':>10} {'indexed (us)':>14} {'scan (us)':>12}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        store, user_id = build_store(size)
+        records = store["goals"]
+        indexed = time_call(lambda: store.list_for_user("goals", user_id))
+        scan = time_call(
+            lambda: [r for r in records.values() if r["user_id"] == user_id],
+            repeats=max(3, REPEATS * 1000 // size),
+        )
+        print(f"{size:>10} {indexed:>14.2f} {scan:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,12 @@
+import ast
+import asyncio
+import json
 import os
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Tuple
 
 # Add project root to Python path
 sys.path.insert(0, str(Path(__file__).parent.parent))
@@ -9,7 +14,11 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 from src.context import UserSessionContext
 from src.guardrails import InputValidator, OutputModel
 from src.hooks import LifecycleHooks
-import google.generativeai as genai
+from src.intents import IntentMatcher
+from src.batching import MicroBatcher
+from src.classifier import FallbackClassifier
+from src.llm_cache import llm_cache
+from src.llm_clients import get_model
 
 # Tool imports
 from tools.goal_analyzer import GoalAnalyzer
@@ -24,9 +33,102 @@ from agents.injury_support_agent import InjurySupportAgent
 from agents.sleep_advisor_agent import SleepAdvisorAgent
 from agents.escalation_agent import EscalationAgent
 
-# Configure Gemini
-genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
-model = genai.GenerativeModel('gemini-pro')
+# Tool chosen for a message by keyword, in priority order
+TOOL_INTENTS = IntentMatcher([
+    ('goal_analyzer', ['goal*', 'target*']),
+    ('meal_planner', ['meal*', 'food*']),
+    ('workout_recommender', ['workout*', 'exercis*']),
+    ('mood_detector', ['mood*', 'feel*'])
+])
+
+# Specialist routing is decided locally unless the classifier is less confident than this
+SPECIALIST_EXAMPLES = os.getenv('WELLNESS_SPECIALIST_EXAMPLES', str(Path(__file__).parent / 'specialist_examples.tsv'))
+SPECIALIST_THRESHOLD = float(os.getenv('WELLNESS_SPECIALIST_THRESHOLD', '0.7'))
+# Threads running the blocking tools and specialized agents for the async pipeline
+AGENT_THREADS = int(os.getenv('WELLNESS_AGENT_THREADS', '32'))
+# Ask for a tool's output and the chat reply in one Gemini request
+FUSED_TOOLS = os.getenv('WELLNESS_FUSED_TOOLS', '1') not in ('0', 'false', 'no')
+
+# Appended to a tool's prompt in fused mode
+FUSED_REPLY_PROMPT = """
+Then, as {persona}, the health coach of {name}, write a conversational reply
+(under 150 words) to their message below that refers to the result where it helps.
+User message: {input_text}
+
+Return only a JSON object with two keys:
+- "result": the output requested above
+- "reply": the reply to the user
+"""
+
+# Concurrent routing questions from different sessions share one Gemini request
+specialist_batcher = MicroBatcher('specialist_router', """
+For each user input, decide whether it requires a specialized agent:
+- nutrition: for diet-specific questions, allergies, diabetes
+- injury: for pain, physical limitations
+- sleep: for fatigue, insomnia
+- escalation: when user asks for human support
+Answer each with only the keyword, or None if no specialized agent is needed.
+""")
+
+async def _ask_specialist_agent(input_text: str) -> Optional[str]:
+    """Ask Gemini which specialized agent, if any, should handle the input"""
+    prompt = f"""
+    Analyze this user input and determine if it requires a specialized agent:
+    {input_text}
+    
+    Options:
+    - nutrition: for diet-specific questions, allergies, diabetes
+    - injury: for pain, physical limitations
+    - sleep: for fatigue, insomnia
+    - escalation: when user asks for human support
+    
+    Return only the keyword or None if no specialized agent needed.
+    """
+    text = (await specialist_batcher.agenerate(get_model(), prompt, input_text)).strip().lower()
+    return text if text in ['nutrition', 'injury', 'sleep', 'escalation'] else None
+
+# Shared by every agent so the model is trained once and the statistics cover all sessions
+specialist_classifier = FallbackClassifier(SPECIALIST_EXAMPLES, _ask_specialist_agent, SPECIALIST_THRESHOLD)
+
+_executor = ThreadPoolExecutor(max_workers=AGENT_THREADS, thread_name_prefix='wellness-agent')
+
+async def _in_thread(function, *args):
+    """Run a blocking tool or agent call on the agent thread pool"""
+    return await asyncio.get_running_loop().run_in_executor(_executor, function, *args)
+
+def _parse_fused(text: str) -> Tuple[Any, str]:
+    """Tool result and reply from a fused response; raises ValueError if malformed"""
+    text = text.strip()
+    if text.startswith('```'):
+        text = text.strip('`').removeprefix('json').strip()
+    try:
+        payload = json.loads(text)
+    except ValueError:
+        try:
+            payload = ast.literal_eval(text)
+        except (ValueError, SyntaxError) as e:
+            raise ValueError(f"Fused response is not a JSON object: {e}")
+    if not isinstance(payload, dict) or 'result' not in payload or not isinstance(payload.get('reply'), str):
+        raise ValueError("Fused response needs 'result' and 'reply' keys")
+    return payload['result'], payload['reply']
+
+# Event loop that runs the async pipeline for sync callers, started on first use
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+
+def run_sync(coroutine):
+    """Run a coroutine on the shared agent event loop and wait for its result
+
+    One long-lived loop serves every sync caller, so async Gemini clients
+    bound to it keep working across turns, and callers that already run
+    their own event loop (Streamlit, notebooks) are not affected.
+    """
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name='wellness-agent-loop', daemon=True).start()
+    return asyncio.run_coroutine_threadsafe(coroutine, _loop).result()
 
 class WellnessAgent:
     """Main agent class handling conversation and tool orchestration"""
@@ -49,27 +151,67 @@ class WellnessAgent:
 
     def process_user_input(self, input_text: str) -> Dict[str, Any]:
         """Process user input and return response dictionary"""
+        return run_sync(self.aprocess_user_input(input_text))
+
+    async def aprocess_user_input(self, input_text: str) -> Dict[str, Any]:
+        """Process user input, running the routing branches concurrently
+
+        Specialist detection usually finishes locally in its first step.
+        Only while it waits on Gemini are the other branches started
+        speculatively: the reply draft and the keyword-routed tool.
+        Whichever branch loses is cancelled. A speculative tool only
+        computes its output; the session context and the tool hooks are
+        updated once the tool has won. In fused mode a tool turn gets its
+        reply from the same request as the tool output, so no draft is made
+        for it unless a specialist takes the message.
+        """
+        # Validate input
+        if not InputValidator.validate_input(input_text):
+            return {
+                'response': "Please ask a health-related question",
+                'status': 'validation_error'
+            }
+
+        tasks = []
         try:
-            # Validate input
-            if not InputValidator.validate_input(input_text):
-                return {
-                    'response': "Please ask a health-related question",
-                    'status': 'validation_error'
-                }
+            tool_name = TOOL_INTENTS.match(input_text).intent
+            specialist = asyncio.create_task(self._detect_specialized_agent_needed(input_text))
+            tasks.append(specialist)
+            # Let detection run its local step before deciding what to speculate on
+            await asyncio.sleep(0)
+            draft = None
+            if not (FUSED_TOOLS and tool_name):
+                draft = asyncio.create_task(self.agenerate_response(input_text))
+                tasks.append(draft)
+            tool = None
+            if tool_name and not specialist.done():
+                tool = asyncio.create_task(self._tool_turn(tool_name, input_text, draft))
+                tasks.append(tool)
 
             # Route to specialized agent if needed
-            specialized_agent = self._detect_specialized_agent_needed(input_text)
+            specialized_agent = await specialist
             if specialized_agent:
-                return self._handle_specialized_agent(input_text, specialized_agent)
+                if tool is not None:
+                    tool.cancel()
+                if draft is None:
+                    draft = asyncio.create_task(self.agenerate_response(input_text))
+                    tasks.append(draft)
+                return await self._handle_specialized_agent(input_text, specialized_agent, draft)
 
             # Route to appropriate tool
-            tool_response = self._route_to_tool(input_text)
-            if tool_response:
-                return tool_response
+            if tool_name:
+                result, reply, error = await (tool if tool is not None else self._tool_turn(tool_name, input_text, draft))
+                self._finish_tool(tool_name, result, error)
+                return {
+                    'response': reply,
+                    'status': 'success',
+                    'tool': tool_name,
+                    'data': result
+                }
 
             # Default generative response
             return {
-                'response': self.generate_response(input_text),
+                'response': await draft,
                 'status': 'success'
             }
 
@@ -79,96 +221,171 @@ class WellnessAgent:
                 'response': f"Sorry, I encountered an error: {str(e)}",
                 'status': 'error'
             }
+        finally:
+            # A cancelled tool thread still finishes in the background; its result is dropped
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+                elif not task.cancelled():
+                    # A failed branch nobody awaited: the turn has already answered or reported its error
+                    task.exception()
 
-    def _handle_specialized_agent(self, input_text: str, agent_type: str) -> Dict[str, Any]:
+    async def _handle_specialized_agent(self, input_text: str, agent_type: str, draft: asyncio.Task) -> Dict[str, Any]:
         """Handle specialized agent processing"""
         LifecycleHooks.on_handoff('WellnessAgent', agent_type, self.context)
-        agent_response = self.specialized_agents[agent_type].process(input_text, self.context)
+        agent_response = await _in_thread(self.specialized_agents[agent_type].process, input_text, self.context)
+        if 'response' in agent_response:
+            draft.cancel()
+            response = agent_response['response']
+        else:
+            response = await draft
         return {
-            'response': agent_response.get('response', self.generate_response(input_text)),
+            'response': response,
             'status': 'success',
             'agent_type': agent_type,
             **agent_response
         }
 
-    def _route_to_tool(self, input_text: str) -> Optional[Dict[str, Any]]:
-        """Route input to appropriate tool"""
-        input_lower = input_text.lower()
-        
-        if "goal" in input_lower or "target" in input_lower:
-            return self._process_with_tool('goal_analyzer', input_text)
-        elif "meal" in input_lower or "food" in input_lower:
-            return self._process_with_tool('meal_planner', input_text)
-        elif "workout" in input_lower or "exercise" in input_lower:
-            return self._process_with_tool('workout_recommender', input_text)
-        elif "mood" in input_lower or "feel" in input_lower:
-            return self._process_with_tool('mood_detector', input_text)
-        return None
-
-    def _process_with_tool(self, tool_name: str, input_text: str) -> Dict[str, Any]:
-        """Process input with specified tool"""
-        LifecycleHooks.on_tool_start(tool_name, self.context)
-        result = self.tools[tool_name].process(input_text, self.context)
-        LifecycleHooks.on_tool_end(tool_name, self.context, result)
-        
-        return {
-            'response': self.generate_response(input_text),
-            'status': 'success',
-            'tool': tool_name,
-            'data': result
-        }
-    
-    def _detect_specialized_agent_needed(self, input_text: str) -> Optional[str]:
+    async def _tool_turn(self, tool_name: str, input_text: str,
+                         draft: Optional[asyncio.Task]) -> Tuple[Dict[str, Any], str, Optional[Exception]]:
+        """Tool output, chat reply and any tool error for a tool-routed message
+
+        Nothing is stored in the session context; see _finish_tool.
+        """
+        if FUSED_TOOLS:
+            return await self._fused_tool_turn(tool_name, input_text)
+        result = await _in_thread(self._call_tool, tool_name, input_text)
+        return result, await draft, None
+
+    async def _detect_specialized_agent_needed(self, input_text: str) -> Optional[str]:
         """Determine if a specialized agent is needed"""
+        return await specialist_classifier.aclassify(input_text)
+
+    def routing_stats(self) -> Dict[str, Any]:
+        """Local specialist routing hit rate and the LLM latency it saved"""
+        return specialist_classifier.stats()
+
+    def _reply_prompt(self, input_text: str, tool_result: Optional[Dict[str, Any]] = None) -> str:
         prompt = f"""
-        Analyze this user input and determine if it requires a specialized agent:
-        {input_text}
-        
-        Options:
-        - nutrition: for diet-specific questions, allergies, diabetes
-        - injury: for pain, physical limitations
-        - sleep: for fatigue, insomnia
-        - escalation: when user asks for human support
+        Respond to the user as {self.context.coach_persona}, their health coach.
+        User: {self.context.name}
+        Goal: {self.context.goal}
+        Mood: {self.context.mood}
         
-        Return only the keyword or None if no specialized agent needed.
+        User message: {input_text}
+        """
+        if tool_result is not None:
+            prompt += f"""
+        Result of the tool that handled the message: {tool_result}
+        """
+        return prompt + """
+        Respond conversationally and keep it under 150 words.
+        """
+
+    def generate_response(self, input_text: str) -> str:
+        """Generate the coach's reply to the user"""
+        return llm_cache.generate(get_model(), self._reply_prompt(input_text), 'reply')
+
+    async def agenerate_response(self, input_text: str, tool_result: Optional[Dict[str, Any]] = None) -> str:
+        """Generate the coach's reply to the user without blocking the event loop"""
+        return await llm_cache.agenerate(get_model(), self._reply_prompt(input_text, tool_result), 'reply')
+
+    def _tool_prompt(self, tool_name: str, input_text: str) -> str:
+        """The prompt a Gemini-backed tool would send for this message"""
+        if tool_name == 'meal_planner':
+            return self.tools['meal_planner'].build_prompt(self.context.goal, self.context.diet_preferences)
+        if tool_name == 'workout_recommender':
+            return self.tools['workout_recommender'].build_prompt(self.context.goal, self.context.injury_notes)
+        return self.tools['mood_detector'].build_prompt(input_text)
+
+    async def _fused_tool_turn(self, tool_name: str,
+                               input_text: str) -> Tuple[Dict[str, Any], str, Optional[Exception]]:
+        """Tool output and a reply that can refer to it, from a single Gemini request
+
+        The goal analyzer needs no model, so its result goes into the reply
+        prompt instead. A response that cannot be parsed is dropped from the
+        cache and the tool reports the failure like an unparseable tool call.
+        Like _tool_turn, this leaves the session context untouched.
         """
-        response = model.generate_content(prompt)
-        return response.text.lower() if response.text.lower() in ['nutrition', 'injury', 'sleep', 'escalation'] else None
+        if tool_name == 'goal_analyzer':
+            result = self._call_tool(tool_name, input_text)
+            return result, await self.agenerate_response(input_text, result), None
+
+        tool = self.tools[tool_name]
+        model = get_model()
+        try:
+            prompt = self._tool_prompt(tool_name, input_text) + FUSED_REPLY_PROMPT.format(
+                persona=self.context.coach_persona, name=self.context.name, input_text=input_text)
+            text = await llm_cache.agenerate(model, prompt, f'fused_{tool_name}')
+            try:
+                payload, reply = _parse_fused(text)
+                result = tool.result(payload)
+            except ValueError:
+                llm_cache.discard(model, prompt)
+                raise
+        except Exception as e:
+            result = OutputModel(success=False, message=str(e), data={}).model_dump()
+            return result, await self.agenerate_response(input_text), e
+        return result, reply, None
+
+    def _call_tool(self, tool_name: str, input_text: str) -> Dict[str, Any]:
+        """A tool's output for the message, without storing it in the context"""
+        tool = self.tools[tool_name]
+        if tool_name == 'goal_analyzer':
+            return tool.analyze(input_text)
+        if tool_name == 'meal_planner':
+            return tool.generate_plan(self.context.goal, self.context.diet_preferences)
+        if tool_name == 'workout_recommender':
+            return tool.generate_plan(self.context.goal, self.context.injury_notes)
+        return tool.detect(input_text)
+
+    def _finish_tool(self, tool_name: str, result: Dict[str, Any], error: Optional[Exception] = None):
+        """Record a tool run that answered the message in the hooks and the session context"""
+        LifecycleHooks.on_tool_start(tool_name, self.context)
+        if error is not None:
+            LifecycleHooks.on_error(tool_name, error, self.context)
+        self._apply_tool_result(tool_name, result)
+        LifecycleHooks.on_tool_end(tool_name, self.context, result)
+
+    def _apply_tool_result(self, tool_name: str, result: Dict[str, Any]):
+        """Store a successful tool output in the session context"""
+        if not result['success']:
+            return
+        if tool_name == 'goal_analyzer':
+            self.context.goal = result['data']
+        elif tool_name == 'meal_planner':
+            self.context.meal_plan = result['data']['plan']
+        elif tool_name == 'workout_recommender':
+            self.context.workout_plan = result['data']['plan']
+        elif tool_name == 'mood_detector':
+            self.context.mood = result['data'].get('mood')
+
+    def _process_tool(self, tool_name: str, input_text: str) -> Tuple[Dict[str, Any], str]:
+        """Tool output and reply for the sync helpers, fused into one request when enabled"""
+        if FUSED_TOOLS:
+            result, reply, error = run_sync(self._fused_tool_turn(tool_name, input_text))
+            self._finish_tool(tool_name, result, error)
+            return result, reply
+        result = self._call_tool(tool_name, input_text)
+        self._finish_tool(tool_name, result)
+        return result, self.generate_response(input_text)
     
     def _process_goal(self, input_text: str) -> Dict[str, Any]:
         """Process goal-related input"""
-        LifecycleHooks.on_tool_start('goal_analyzer', self.context)
-        result = self.tools['goal_analyzer'].analyze(input_text)
-        self.context.goal = result['data']
-        LifecycleHooks.on_tool_end('goal_analyzer', self.context, result)
-        return {'response': self.generate_response(input_text), 'goal': result}
+        result, reply = self._process_tool('goal_analyzer', input_text)
+        return {'response': reply, 'goal': result}
     
     def _process_meal(self, input_text: str) -> Dict[str, Any]:
         """Process meal-related input"""
-        LifecycleHooks.on_tool_start('meal_planner', self.context)
-        result = self.tools['meal_planner'].generate_plan(
-            self.context.goal, 
-            self.context.diet_preferences
-        )
-        self.context.meal_plan = result['data']['plan']
-        LifecycleHooks.on_tool_end('meal_planner', self.context, result)
-        return {'response': self.generate_response(input_text), 'meal_plan': result}
+        result, reply = self._process_tool('meal_planner', input_text)
+        return {'response': reply, 'meal_plan': result}
     
     def _process_workout(self, input_text: str) -> Dict[str, Any]:
         """Process workout-related input"""
-        LifecycleHooks.on_tool_start('workout_recommender', self.context)
-        result = self.tools['workout_recommender'].generate_plan(
-            self.context.goal,
-            self.context.injury_notes
-        )
-        self.context.workout_plan = result['data']['plan']
-        LifecycleHooks.on_tool_end('workout_recommender', self.context, result)
-        return {'response': self.generate_response(input_text), 'workout_plan': result}
+        result, reply = self._process_tool('workout_recommender', input_text)
+        return {'response': reply, 'workout_plan': result}
     
     def _process_mood(self, input_text: str) -> Dict[str, Any]:
         """Process mood-related input"""
-        LifecycleHooks.on_tool_start('mood_detector', self.context)
-        result = self.tools['mood_detector'].detect(input_text)
-        self.context.mood = result['data']['mood']
-        LifecycleHooks.on_tool_end('mood_detector', self.context, result)
-        return {'response': self.generate_response(input_text), 'mood': result}
\ No newline at end of file
+        result, reply = self._process_tool('mood_detector', input_text)
+        return {'response': reply, 'mood': result}
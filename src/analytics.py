@@ -0,0 +1,148 @@
+import os
+import threading
+import time
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.timeseries import _clean
+
+# Fields summarised by the stats endpoint and how long a cached result may be reused
+STATS_FIELDS = ("heart_rate", "stress_level", "sleep_quality")
+DEFAULT_WINDOWS = "1h,24h,7d"
+STATS_MAX_AGE = float(os.getenv("WELLNESS_STATS_MAX_AGE", "30"))
+
+
+def window_stats(timestamps: np.ndarray, values: np.ndarray, now_us: int) -> Dict[str, Any]:
+    """Summary statistics of each field over the readings passed in
+
+    ``values`` has one row per field. NaN marks a missing reading and is
+    excluded from every statistic. The trend slope is the least-squares
+    change per hour.
+    """
+    hours = (timestamps - now_us) / 3.6e9
+    present = ~np.isnan(values)
+    counts = present.sum(axis=1)
+    result = {"count": int(len(timestamps))}
+    if not len(timestamps):
+        return result
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        filled = np.where(present, values, 0.0)
+        mean = filled.sum(axis=1) / counts
+        x = np.where(present, hours, 0.0)
+        x_mean = x.sum(axis=1) / counts
+        dx = np.where(present, hours - x_mean[:, None], 0.0)
+        dy = np.where(present, values - mean[:, None], 0.0)
+        slope = (dx * dy).sum(axis=1) / (dx * dx).sum(axis=1)
+        std = np.sqrt((dy * dy).sum(axis=1) / counts)
+        minimum = np.where(present, values, np.inf).min(axis=1)
+        maximum = np.where(present, values, -np.inf).max(axis=1)
+    p50, p95 = _percentiles(values, present)
+
+    for i, field in enumerate(STATS_FIELDS):
+        if not counts[i]:
+            continue
+        result[field] = {
+            "mean": round(float(mean[i]), 3),
+            "min": _clean(float(minimum[i])),
+            "max": _clean(float(maximum[i])),
+            "p50": round(float(p50[i]), 3),
+            "p95": round(float(p95[i]), 3),
+            "std": round(float(std[i]), 3),
+            "slope_per_hour": round(float(slope[i]), 4) if np.isfinite(slope[i]) else 0.0
+        }
+    return result
+
+
+def _percentiles(values: np.ndarray, present: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """p50/p95 per field over the readings that are present"""
+    p50 = np.full(len(values), np.nan)
+    p95 = np.full(len(values), np.nan)
+    for i in np.flatnonzero(present.any(axis=1)):
+        p50[i], p95[i] = np.percentile(values[i][present[i]], [50, 95])
+    return p50, p95
+
+
+def compute_stats(columns: Dict[str, Sequence], windows: Dict[str, int], now_us: int) -> Dict[str, Any]:
+    """Stats for each trailing window, slicing one sorted column set with searchsorted"""
+    timestamps = np.asarray(columns["timestamp"], dtype=np.int64)
+    values = np.vstack([np.asarray(columns[field], dtype=np.float64) for field in STATS_FIELDS]) \
+        if len(timestamps) else np.empty((len(STATS_FIELDS), 0))
+    end = int(np.searchsorted(timestamps, now_us, side="right"))
+    result = {}
+    for name, window_us in windows.items():
+        start = int(np.searchsorted(timestamps, now_us - window_us, side="left"))
+        result[name] = window_stats(timestamps[start:end], values[:, start:end], now_us)
+    return result
+
+
+class StatsCache:
+    """Per-user cache of computed stats
+
+    Entries are dropped for a single user when new readings arrive for that
+    user, and are recomputed once they are older than ``max_age`` seconds so
+    trailing windows keep moving forward for users that stop sending data.
+    Every ``max_age`` seconds users without a fresh entry are evicted along
+    with their invalidation counter, so the cache only holds active users.
+    """
+
+    def __init__(self, max_age: float = STATS_MAX_AGE):
+        self.max_age = max_age
+        self.entries: Dict[str, Dict[str, Tuple[float, Any]]] = {}
+        # Clock value of each user's last invalidation, and the latest one among evicted users
+        self.generations: Dict[str, int] = {}
+        self.clock = 0
+        self.floor = 0
+        self.swept = time.monotonic()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def generation(self) -> int:
+        """Clock bumped on every invalidation; read it before computing and pass it back to put()
+
+        The clock is shared, but put() compares it with the user's own last
+        invalidation, so writes for one user never discard another's stats.
+        """
+        return self.clock
+
+    def get(self, user_id: str, key: str) -> Optional[Any]:
+        entry = self.entries.get(user_id, {}).get(key)
+        if entry is None or time.monotonic() - entry[0] > self.max_age:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[1]
+
+    def put(self, user_id: str, key: str, value: Any, generation: int):
+        """Store a result unless the user's data changed while it was computed
+
+        An evicted user's counter is gone, so their results are checked
+        against the newest evicted counter instead; at worst that skips
+        storing a result that was still valid.
+        """
+        with self.lock:
+            now = time.monotonic()
+            if self.generations.get(user_id, self.floor) <= generation:
+                self.entries.setdefault(user_id, {})[key] = (now, value)
+            self._sweep(now)
+
+    def invalidate(self, user_id: str):
+        """Forget cached stats for one user"""
+        with self.lock:
+            self.clock += 1
+            self.generations[user_id] = self.clock
+            self.entries.pop(user_id, None)
+            self._sweep(time.monotonic())
+
+    def _sweep(self, now: float):
+        """Evict users without a fresh entry, at most once per ``max_age``; call with the lock held"""
+        if now - self.swept < self.max_age:
+            return
+        self.swept = now
+        for user_id in set(self.entries) | set(self.generations):
+            if any(now - stored <= self.max_age for stored, _ in self.entries.get(user_id, {}).values()):
+                continue
+            self.entries.pop(user_id, None)
+            self.floor = max(self.floor, self.generations.pop(user_id, 0))
@@ -1,19 +1,63 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import Any, Callable, List, Dict, Iterable, Optional, Tuple, Type, Union
+from functools import partial
+import asyncio
+import json
 import uuid
 from enum import Enum
 import uvicorn
+import sys
+from contextlib import asynccontextmanager
+from pathlib import Path
+
+# Add project root to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.storage import COLLECTIONS, create_store, generate_ids, DuplicateEmailError
+from src.timeseries import downsample, parse_duration, to_epoch_us
+from src.http_cache import precompute
+from src.responses import JSON_RESPONSE_CLASS, json_response
+from src.sharding import new_user_id, new_user_ids, store_options
+from src.analytics import DEFAULT_WINDOWS, StatsCache, compute_stats
+from src.persistence import dumps, loads
+from src.pubsub import Broker
+from src.intents import IntentMatcher
+from src.guardrails import InputValidator
+from src.stream_metrics import StreamStats, StreamTotals
+from src.retention import Compactor
+from src.metrics import CONTENT_TYPE, MetricsMiddleware, MetricsRegistry, metric, resident_memory_bytes
+from src.pagination import (DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER,
+                            decode_cursor, encode_cursor, parse_fields)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Live biofeedback streams are delivered on the server's event loop
+    broker.bind(asyncio.get_running_loop())
+    # Retention runs on its own thread, never on the event loop
+    compactor.start(db)
+    yield
+    compactor.stop()
+    # Commit any writes still waiting for a batched commit
+    db.close()
 
 app = FastAPI(
     title="Wellness Coach API",
     description="Backend for Health & Wellness application",
     version="1.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan,
+    default_response_class=JSON_RESPONSE_CLASS
 )
 
+# Per-route request counts and latency histograms, served at /metrics
+metrics = MetricsRegistry()
+app.add_middleware(MetricsMiddleware, registry=metrics)
+
 # --- Enums ---
 class DietType(str, Enum):
     VEGETARIAN = "vegetarian"
@@ -27,19 +71,31 @@ class GoalType(str, Enum):
     MUSCLE_GAIN = "muscle_gain"
     GENERAL = "general"
 
+class RollupResolution(str, Enum):
+    HOURLY = "hourly"
+    DAILY = "daily"
+
 class CoachPreference(str, Enum):
     ZENBOT = "ZenBot"
     FITNESS = "FitnessCoach"
     NUTRITION = "NutritionExpert"
 
 # --- Database ---
-db = {
-    "users": {},
-    "goals": {},
-    "meal_plans": {},
-    "workouts": {},
-    "biofeedback": {}
-}
+# Engine is picked by WELLNESS_STORAGE_ENGINE ("memory" or "sqlite"); shard workers get their own files
+db = create_store(**store_options())
+
+# Per-user cache for /biofeedback/user/{user_id}/stats
+stats_cache = StatsCache()
+
+# Live biofeedback subscribers for /biofeedback/user/{user_id}/stream
+broker = Broker()
+STREAM_KEEPALIVE = 15.0
+
+# Time to first token and tokens/sec of /chat/stream replies, served at /metrics
+chat_totals = StreamTotals()
+
+# Rolls old biofeedback into hourly/daily rollups per WELLNESS_RETENTION
+compactor = Compactor(on_compacted=stats_cache.invalidate)
 
 # --- Models ---
 class User(BaseModel):
@@ -65,23 +121,38 @@ class WorkoutPlan(BaseModel):
     exercises: Dict[str, List[str]]
     goal_type: GoalType = GoalType.GENERAL
 
+class ChatMessage(BaseModel):
+    message: str
+    name: str = "Guest"
+    coach_preference: CoachPreference = CoachPreference.ZENBOT
+    goal: Optional[str] = None
+    mood: Optional[str] = None
+
 class Biofeedback(BaseModel):
     user_id: str
     heart_rate: int
     stress_level: int
     sleep_quality: int
-    timestamp: datetime = datetime.now()
+    steps: Optional[int] = None
+    timestamp: datetime = Field(default_factory=datetime.now)
 
 # --- Helper Functions ---
+# Goal keywords; a weight loss goal needs both a "lose" and a "weight" keyword
+GOAL_INTENTS = IntentMatcher([
+    ("lose", ["lose*", "losing"]),
+    ("weight", ["weight*", "fat"]),
+    ("muscle_gain", ["muscle*", "gain*"])
+])
+
 def analyze_goal(text: str) -> Dict[str, str]:
-    text = text.lower()
-    if "lose" in text and ("weight" in text or "fat" in text):
+    found = GOAL_INTENTS.match(text).intents
+    if "lose" in found and "weight" in found:
         return {
             "type": GoalType.WEIGHT_LOSS,
             "recommendation": "Aim for 1-2 lbs per week",
             "plan": "Combine cardio and strength training"
         }
-    elif "muscle" in text or "gain" in text:
+    elif "muscle_gain" in found:
         return {
             "type": GoalType.MUSCLE_GAIN,
             "recommendation": "Focus on progressive overload",
@@ -93,42 +164,310 @@ def analyze_goal(text: str) -> Dict[str, str]:
         "plan": "Balance activity and recovery"
     }
 
-def generate_meal_plan(diet: DietType = DietType.BALANCED) -> Dict[str, List[str]]:
-    plans = {
-        DietType.VEGETARIAN: {
-            "Monday": ["Oatmeal with berries", "Chickpea salad", "Lentil curry"],
-            "Tuesday": ["Smoothie bowl", "Quinoa salad", "Vegetable stir-fry"]
-        },
-        DietType.KETO: {
-            "Monday": ["Eggs with avocado", "Chicken Caesar salad", "Salmon with asparagus"],
-            "Tuesday": ["Bulletproof coffee", "Beef stir-fry", "Cheese omelet"]
-        },
-        DietType.BALANCED: {
-            "Monday": ["Whole grain toast", "Grilled chicken", "Fish with rice"],
-            "Tuesday": ["Yogurt with nuts", "Turkey sandwich", "Pasta primavera"]
-        }
+def analyze_goals(texts: List[str]) -> List[Dict[str, str]]:
+    """analyze_goal over a batch, analyzing each distinct description once"""
+    analyses: Dict[str, Dict[str, str]] = {}
+    results = []
+    for text in texts:
+        analysis = analyses.get(text)
+        if analysis is None:
+            analysis = analyses[text] = analyze_goal(text)
+        results.append(analysis)
+    return results
+
+MEAL_PLAN_TEMPLATES = {
+    DietType.VEGETARIAN: {
+        "Monday": ["Oatmeal with berries", "Chickpea salad", "Lentil curry"],
+        "Tuesday": ["Smoothie bowl", "Quinoa salad", "Vegetable stir-fry"]
+    },
+    DietType.KETO: {
+        "Monday": ["Eggs with avocado", "Chicken Caesar salad", "Salmon with asparagus"],
+        "Tuesday": ["Bulletproof coffee", "Beef stir-fry", "Cheese omelet"]
+    },
+    DietType.BALANCED: {
+        "Monday": ["Whole grain toast", "Grilled chicken", "Fish with rice"],
+        "Tuesday": ["Yogurt with nuts", "Turkey sandwich", "Pasta primavera"]
+    },
+    DietType.VEGAN: {
+        "Monday": ["Chia pudding with mango", "Black bean burrito bowl", "Tofu and broccoli stir-fry"],
+        "Tuesday": ["Peanut butter banana toast", "Lentil soup", "Chickpea coconut curry"]
+    },
+    DietType.PALEO: {
+        "Monday": ["Sweet potato hash with eggs", "Grilled chicken salad", "Steak with roasted vegetables"],
+        "Tuesday": ["Berry and almond bowl", "Tuna lettuce wraps", "Baked salmon with zucchini"]
+    }
+}
+
+WORKOUT_PLAN_TEMPLATES = {
+    GoalType.WEIGHT_LOSS: {
+        "Monday": ["30 min cardio", "Bodyweight circuit"],
+        "Wednesday": ["HIIT training", "Core exercises"],
+        "Friday": ["Jogging", "Yoga"]
+    },
+    GoalType.MUSCLE_GAIN: {
+        "Monday": ["Chest & Triceps", "Strength training"],
+        "Wednesday": ["Back & Biceps", "Deadlifts"],
+        "Friday": ["Leg day", "Squats"]
+    },
+    GoalType.GENERAL: {
+        "Monday": ["30 min walk", "Stretching"],
+        "Wednesday": ["Yoga session"],
+        "Friday": ["Swimming"]
     }
-    return plans.get(diet, plans[DietType.BALANCED])
+}
+
+def generate_meal_plan(diet: DietType = DietType.BALANCED) -> Dict[str, List[str]]:
+    plan = MEAL_PLAN_TEMPLATES.get(diet, MEAL_PLAN_TEMPLATES[DietType.BALANCED])
+    return {day: list(meals) for day, meals in plan.items()}
 
 def generate_workout_plan(goal_type: GoalType = GoalType.GENERAL) -> Dict[str, List[str]]:
-    plans = {
-        GoalType.WEIGHT_LOSS: {
-            "Monday": ["30 min cardio", "Bodyweight circuit"],
-            "Wednesday": ["HIIT training", "Core exercises"],
-            "Friday": ["Jogging", "Yoga"]
-        },
-        GoalType.MUSCLE_GAIN: {
-            "Monday": ["Chest & Triceps", "Strength training"],
-            "Wednesday": ["Back & Biceps", "Deadlifts"],
-            "Friday": ["Leg day", "Squats"]
-        },
-        GoalType.GENERAL: {
-            "Monday": ["30 min walk", "Stretching"],
-            "Wednesday": ["Yoga session"],
-            "Friday": ["Swimming"]
+    plan = WORKOUT_PLAN_TEMPLATES.get(goal_type, WORKOUT_PLAN_TEMPLATES[GoalType.GENERAL])
+    return {day: list(exercises) for day, exercises in plan.items()}
+
+# Plan template responses are serialized once at startup and served with ETags
+MEAL_PLAN_RESPONSES = precompute({
+    diet: {"status": "success", "diet": diet.value, "plan": generate_meal_plan(diet)} for diet in DietType
+})
+WORKOUT_PLAN_RESPONSES = precompute({
+    goal_type: {"status": "success", "goal_type": goal_type.value, "plan": generate_workout_plan(goal_type)}
+    for goal_type in GoalType
+})
+
+def validate_user_id(user_id: str):
+    try:
+        uuid.UUID(user_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid user ID format")
+
+def resolve_time_range(start: Optional[datetime], end: Optional[datetime], last: Optional[str]):
+    """Turn start/end/last query parameters into an epoch-microsecond range"""
+    try:
+        end_us = to_epoch_us(end or datetime.now()) if (end or last) else None
+        if last:
+            start_us = end_us - parse_duration(last)
+        else:
+            start_us = to_epoch_us(start) if start else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return start_us, end_us
+
+def paginate(fetch: Callable, cursor: Optional[str], limit: int, fields: Optional[str]):
+    """Run a storage page query and expose the continuation in the X-Next-Cursor header"""
+    try:
+        records, position = fetch(after=decode_cursor(cursor), limit=limit, fields=parse_fields(fields))
+    except (ValueError, TypeError, IndexError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    headers = {NEXT_CURSOR_HEADER: encode_cursor(position)} if position is not None else None
+    return json_response(records, headers=headers)
+
+def format_validation_error(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in e['loc']) or 'body'}: {e['msg']}"
+        for e in error.errors(include_url=False)
+    )
+
+def validate_many(model: Type[BaseModel], body: bytes) -> Tuple[int, List[Tuple[int, BaseModel]], List[Dict]]:
+    """Validate a JSON array body into (item count, (index, item) pairs of valid items, per-item errors)
+
+    The whole array is validated in one call; items are only validated one
+    at a time to locate errors when that fails.
+    """
+    try:
+        items = BULK_ADAPTERS[model].validate_json(body)
+        return len(items), list(enumerate(items)), []
+    except ValidationError:
+        pass
+    try:
+        items = loads(body)
+    except ValueError:
+        items = None
+    if not isinstance(items, list):
+        raise HTTPException(status_code=400, detail="Body is not a valid JSON array")
+    valid, errors = [], []
+    for index, item in enumerate(items):
+        try:
+            valid.append((index, model.model_validate(item)))
+        except ValidationError as e:
+            errors.append({"index": index, "error": format_validation_error(e)})
+    return len(items), valid, errors
+
+def build_users(users: List[User], ids: List[str], now: str) -> List[Dict]:
+    return [{**user.model_dump(), "id": user_id, "created_at": now, "updated_at": now}
+            for user, user_id in zip(users, ids)]
+
+def build_goals(goals: List[Goal], ids: List[str], now: str) -> List[Dict]:
+    analyses = analyze_goals([goal.description for goal in goals])
+    return [{**goal.model_dump(), "id": goal_id, "created_at": now, **analysis}
+            for goal, goal_id, analysis in zip(goals, ids, analyses)]
+
+def build_plans(plans: List[BaseModel], ids: List[str], now: str) -> List[Dict]:
+    return [{**plan.model_dump(), "id": plan_id, "created_at": now} for plan, plan_id in zip(plans, ids)]
+
+# Request model and record builder of each bulk create endpoint
+BULK_MODELS: Dict[str, Tuple[Type[BaseModel], Callable]] = {
+    "users": (User, build_users),
+    "goals": (Goal, build_goals),
+    "meal_plans": (MealPlan, build_plans),
+    "workouts": (WorkoutPlan, build_plans)
+}
+BULK_ADAPTERS = {model: TypeAdapter(List[model]) for model, _ in BULK_MODELS.values()}
+
+def create_many(collection: str, body: bytes) -> Dict:
+    """Validate and insert a JSON array of new records in one storage operation
+
+    ``ids`` lines up with the request items and holds None where an item
+    was rejected; ``errors`` gives the reason per rejected index.
+    """
+    model, build = BULK_MODELS[collection]
+    count, valid, errors = validate_many(model, body)
+    accepted = []
+    if collection == "users":
+        # Duplicate emails are rejected here so the batch insert does not fail part way
+        emails = set()
+        for index, user in valid:
+            email = user.email.strip().lower()
+            if email in emails or db.find_user_by_email(email) is not None:
+                errors.append({"index": index, "error": f"email: Email {user.email} is already registered"})
+                continue
+            emails.add(email)
+            accepted.append((index, user))
+    else:
+        valid_users = set()
+        for index, item in valid:
+            if item.user_id not in valid_users:
+                try:
+                    uuid.UUID(item.user_id)
+                except ValueError:
+                    errors.append({"index": index, "error": "user_id: Invalid user ID format"})
+                    continue
+                valid_users.add(item.user_id)
+            accepted.append((index, item))
+
+    # In sharded mode user ids must hash to the shard serving this request
+    record_ids = new_user_ids(len(accepted)) if collection == "users" else generate_ids(len(accepted))
+    records = build([item for _, item in accepted], record_ids, datetime.now().isoformat())
+    rows = list(zip(record_ids, records))
+    try:
+        db.insert_many(collection, rows)
+    except DuplicateEmailError:
+        # A concurrent request registered one of the emails; store the rest one by one
+        for (index, _), (user_id, record) in zip(accepted, rows):
+            if db.get("users", user_id) is not None:
+                continue
+            try:
+                db.insert("users", user_id, record)
+            except DuplicateEmailError as e:
+                errors.append({"index": index, "error": f"email: {e}"})
+    ids: List[Optional[str]] = [None] * count
+    rejected = {e["index"] for e in errors}
+    for (index, _), record_id in zip(accepted, record_ids):
+        if index not in rejected:
+            ids[index] = record_id
+    errors.sort(key=lambda e: e["index"])
+    return {
+        "status": "success" if not errors else "partial",
+        "created": count - len(errors),
+        "rejected": len(errors),
+        "ids": ids,
+        "errors": errors
+    }
+
+def parse_windows(windows: str) -> Dict[str, int]:
+    """Turn a ``windows=1h,24h`` parameter into window name -> microseconds"""
+    try:
+        window_us = {name.strip(): parse_duration(name) for name in windows.split(",") if name.strip()}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not window_us:
+        raise HTTPException(status_code=400, detail="At least one window is required")
+    return window_us
+
+def user_stats(user_id: str, window_us: Dict[str, int]) -> Dict:
+    """Rolling stats for a user, served from the per-user cache when fresh"""
+    key = ",".join(window_us)
+    cached = stats_cache.get(user_id, key)
+    if cached is not None:
+        return cached
+
+    generation = stats_cache.generation()
+    now = datetime.now()
+    now_us = to_epoch_us(now)
+    columns = db.biofeedback_columns(user_id, now_us - max(window_us.values()), now_us + 1)
+    result = {
+        "status": "success",
+        "user_id": user_id,
+        "computed_at": now.isoformat(),
+        "windows": compute_stats(columns, window_us, now_us)
+    }
+    stats_cache.put(user_id, key, result, generation)
+    return result
+
+def publish_biofeedback(user_id: str, readings: List[Dict]):
+    """Push new readings and fresh stats to the user's live subscribers, if any"""
+    windows = broker.windows_for(user_id)
+    if not windows:
+        return
+    stats = {key: user_stats(user_id, parse_windows(key))["windows"] for key in windows}
+    broker.publish(user_id, readings, stats)
+
+def ingest_biofeedback(items: Iterable[Union[bytes, Dict[str, Any]]]) -> Dict:
+    """Validate raw NDJSON lines or parsed readings and insert the valid ones in one batch
+
+    Lines are numbered from 1 and blank lines are skipped but still counted,
+    so reported line numbers match the uploaded file.
+    """
+    readings = []
+    errors = []
+    valid_users = set()
+    for number, item in enumerate(items, 1):
+        try:
+            if isinstance(item, (bytes, str)):
+                if not item.strip():
+                    continue
+                reading = Biofeedback.model_validate_json(item)
+            else:
+                reading = Biofeedback.model_validate(item)
+        except ValidationError as e:
+            errors.append({"line": number, "error": format_validation_error(e)})
+            continue
+        if reading.user_id not in valid_users:
+            try:
+                uuid.UUID(reading.user_id)
+            except ValueError:
+                errors.append({"line": number, "error": "user_id: Invalid user ID format"})
+                continue
+            valid_users.add(reading.user_id)
+        readings.append(reading)
+
+    rows = []
+    for feedback_id, reading in zip(generate_ids(len(readings)), readings):
+        record = {
+            "user_id": reading.user_id,
+            "heart_rate": reading.heart_rate,
+            "stress_level": reading.stress_level,
+            "sleep_quality": reading.sleep_quality,
+            "id": feedback_id,
+            "timestamp": reading.timestamp.isoformat()
         }
+        if reading.steps is not None:
+            record["steps"] = reading.steps
+        rows.append((feedback_id, record))
+
+    db.insert_many("biofeedback", rows)
+    for user_id in valid_users:
+        stats_cache.invalidate(user_id)
+    if broker.subscribers:
+        by_user: Dict[str, List[Dict]] = {}
+        for _, record in rows:
+            by_user.setdefault(record["user_id"], []).append(record)
+        for user_id, records in by_user.items():
+            publish_biofeedback(user_id, records)
+    return {
+        "status": "success" if not errors else "partial",
+        "accepted": len(rows),
+        "rejected": len(errors),
+        "errors": errors
     }
-    return plans.get(goal_type, plans[GoalType.GENERAL])
 
 # --- API Endpoints ---
 @app.get("/")
@@ -140,6 +479,7 @@ def root():
             "goals": "/goals",
             "meal_plans": "/meal-plans",
             "workouts": "/workouts",
+            "chat": "/chat/stream",
             "docs": "/docs"
         }
     }
@@ -152,109 +492,316 @@ async def health_check():
         "version": "1.0"
     }
 
-@app.post("/users/", response_model=Dict)
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    """Prometheus text exposition of request, storage and process metrics"""
+    lines = metrics.render()
+    lines += metric("wellness_db_records", "gauge", "Records stored per collection.",
+                    ((f'collection="{name}"', db.count(name)) for name in COLLECTIONS))
+    lines += metric("wellness_stats_cache_hits_total", "counter", "Stats cache hits.", [(None, stats_cache.hits)])
+    lines += metric("wellness_stats_cache_misses_total", "counter", "Stats cache misses.", [(None, stats_cache.misses)])
+    lines += metric("wellness_db_memory_bytes", "gauge", "Approximate bytes held per collection.",
+                    ((f'collection="{name}"', size) for name, size in db.memory_usage().items()))
+    lines += metric("wellness_compaction_passes_total", "counter", "Retention passes completed.",
+                    [(None, compactor.totals["passes"])])
+    lines += metric("wellness_compaction_rows_total", "counter", "Rows removed or merged by retention, by kind.",
+                    ((f'kind="{kind}"', count) for kind, count in compactor.totals.items() if kind != "passes"))
+    lines += metric("wellness_compaction_last_pass_seconds", "gauge", "Duration of the last retention pass.",
+                    [(None, round(compactor.last_pass_seconds, 6))])
+    lines += metric("wellness_stream_subscribers", "gauge", "Open live biofeedback streams.", [(None, broker.count())])
+    lines += metric("wellness_chat_responses_total", "counter", "Streamed chat replies.", [(None, chat_totals.responses)])
+    lines += metric("wellness_chat_ttft_seconds_total", "counter", "Time to first token summed over chat replies.",
+                    [(None, round(chat_totals.ttft_seconds, 6))])
+    lines += metric("wellness_chat_tokens_total", "counter", "Approximate tokens streamed in chat replies.",
+                    [(None, chat_totals.tokens)])
+    lines += metric("wellness_chat_generation_seconds_total", "counter",
+                    "Time from first to last token summed over chat replies.",
+                    [(None, round(chat_totals.generation_seconds, 6))])
+    lines += metric("wellness_chat_errors_total", "counter", "Chat replies that failed upstream.",
+                    [(None, chat_totals.errors)])
+    lines += metric("process_resident_memory_bytes", "gauge", "Resident memory size in bytes.",
+                    [(None, resident_memory_bytes())])
+    return PlainTextResponse("\n".join(lines) + "\n", media_type=CONTENT_TYPE)
+
+@app.post("/users/")
 def create_user(user: User):
-    user_id = str(uuid.uuid4())
-    user_data = user.dict()
+    # In sharded mode the id must hash to the shard serving this request
+    user_id = new_user_id()
+    now = datetime.now().isoformat()
+    user_data = user.model_dump()
     user_data.update({
         "id": user_id,
-        "created_at": datetime.now().isoformat(),
-        "updated_at": datetime.now().isoformat()
+        "created_at": now,
+        "updated_at": now
     })
-    db["users"][user_id] = user_data
-    return {"status": "success", "user_id": user_id, **user_data}
+    try:
+        db.insert("users", user_id, user_data)
+    except DuplicateEmailError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return json_response({"status": "success", "user_id": user_id, **user_data})
 
-@app.get("/users/{user_id}", response_model=Dict)
+@app.post("/users/bulk")
+async def create_users_bulk(request: Request):
+    """Create users from a JSON array; returns their ids in request order and per-item errors"""
+    return json_response(await run_in_threadpool(create_many, "users", await request.body()))
+
+@app.get("/users/{user_id}")
 def get_user(user_id: str):
-    try:
-        uuid.UUID(user_id)
-    except ValueError:
-        raise HTTPException(status_code=400, detail="Invalid user ID format")
+    validate_user_id(user_id)
     
-    if user_id not in db["users"]:
+    user = db.get("users", user_id)
+    if user is None:
         raise HTTPException(status_code=404, detail="User not found")
-    return db["users"][user_id]
+    return json_response(user)
 
-@app.post("/goals/", response_model=Dict)
+@app.post("/goals/")
 def create_goal(goal: Goal):
     goal_id = str(uuid.uuid4())
-    goal_data = goal.dict()
+    goal_data = goal.model_dump()
     analysis = analyze_goal(goal.description)
     goal_data.update({
         "id": goal_id,
         "created_at": datetime.now().isoformat(),
         **analysis
     })
-    db["goals"][goal_id] = goal_data
-    return {"status": "success", "goal_id": goal_id, **goal_data}
+    db.insert("goals", goal_id, goal_data)
+    return json_response({"status": "success", "goal_id": goal_id, **goal_data})
 
-@app.get("/goals/user/{user_id}", response_model=List[Dict])
-def get_user_goals(user_id: str):
-    try:
-        uuid.UUID(user_id)
-    except ValueError:
-        raise HTTPException(status_code=400, detail="Invalid user ID format")
+@app.post("/goals/bulk")
+async def create_goals_bulk(request: Request):
+    """Create goals from a JSON array; returns their ids in request order and per-item errors"""
+    return json_response(await run_in_threadpool(create_many, "goals", await request.body()))
+
+@app.get("/goals/user/{user_id}")
+def get_user_goals(user_id: str,
+                   limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                   cursor: Optional[str] = None, fields: Optional[str] = None):
+    """Page through a user's goals; pass the X-Next-Cursor header back as `cursor`"""
+    validate_user_id(user_id)
     
-    return [g for g in db["goals"].values() if g["user_id"] == user_id]
+    return paginate(partial(db.page_for_user, "goals", user_id), cursor, limit, fields)
 
-@app.post("/meal-plans/", response_model=Dict)
+@app.post("/meal-plans/")
 def create_meal_plan(meal_plan: MealPlan):
     plan_id = str(uuid.uuid4())
-    plan_data = meal_plan.dict()
+    plan_data = meal_plan.model_dump()
     plan_data["id"] = plan_id
-    db["meal_plans"][plan_id] = plan_data
-    return {"status": "success", "plan_id": plan_id, **plan_data}
+    plan_data["created_at"] = datetime.now().isoformat()
+    db.insert("meal_plans", plan_id, plan_data)
+    return json_response({"status": "success", "plan_id": plan_id, **plan_data})
 
-@app.get("/meal-plans/generate", response_model=Dict)
-def generate_meal_plan_endpoint(diet: DietType = DietType.BALANCED):
-    return {
-        "status": "success",
-        "diet": diet,
-        "plan": generate_meal_plan(diet)
-    }
+@app.post("/meal-plans/bulk")
+async def create_meal_plans_bulk(request: Request):
+    """Create meal plans from a JSON array; returns their ids in request order and per-item errors"""
+    return json_response(await run_in_threadpool(create_many, "meal_plans", await request.body()))
+
+@app.get("/meal-plans/user/{user_id}")
+def get_user_meal_plans(user_id: str,
+                        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                        cursor: Optional[str] = None, fields: Optional[str] = None):
+    """Page through a user's meal plans; pass the X-Next-Cursor header back as `cursor`"""
+    validate_user_id(user_id)
+    
+    return paginate(partial(db.page_for_user, "meal_plans", user_id), cursor, limit, fields)
 
-@app.post("/workouts/", response_model=Dict)
+@app.get("/meal-plans/generate")
+def generate_meal_plan_endpoint(request: Request, diet: DietType = DietType.BALANCED):
+    return MEAL_PLAN_RESPONSES[diet].respond(request)
+
+@app.post("/workouts/")
 def create_workout_plan(workout: WorkoutPlan):
     workout_id = str(uuid.uuid4())
-    workout_data = workout.dict()
+    workout_data = workout.model_dump()
     workout_data["id"] = workout_id
-    db["workouts"][workout_id] = workout_data
-    return {"status": "success", "workout_id": workout_id, **workout_data}
+    workout_data["created_at"] = datetime.now().isoformat()
+    db.insert("workouts", workout_id, workout_data)
+    return json_response({"status": "success", "workout_id": workout_id, **workout_data})
 
-@app.get("/workouts/generate", response_model=Dict)
-def generate_workout_plan_endpoint(goal_type: GoalType = GoalType.GENERAL):
-    return {
-        "status": "success",
-        "goal_type": goal_type,
-        "plan": generate_workout_plan(goal_type)
-    }
+@app.post("/workouts/bulk")
+async def create_workouts_bulk(request: Request):
+    """Create workout plans from a JSON array; returns their ids in request order and per-item errors"""
+    return json_response(await run_in_threadpool(create_many, "workouts", await request.body()))
 
-@app.post("/biofeedback/", response_model=Dict)
+@app.get("/workouts/user/{user_id}")
+def get_user_workouts(user_id: str,
+                      limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                      cursor: Optional[str] = None, fields: Optional[str] = None):
+    """Page through a user's workouts; pass the X-Next-Cursor header back as `cursor`"""
+    validate_user_id(user_id)
+    
+    return paginate(partial(db.page_for_user, "workouts", user_id), cursor, limit, fields)
+
+@app.get("/workouts/generate")
+def generate_workout_plan_endpoint(request: Request, goal_type: GoalType = GoalType.GENERAL):
+    return WORKOUT_PLAN_RESPONSES[goal_type].respond(request)
+
+@app.post("/biofeedback/")
 def add_biofeedback(data: Dict):
     if "user_id" not in data:
         raise HTTPException(status_code=400, detail="user_id is required")
     
-    try:
-        uuid.UUID(data["user_id"])
-    except ValueError:
-        raise HTTPException(status_code=400, detail="Invalid user ID format")
+    validate_user_id(data["user_id"])
     
     feedback_id = str(uuid.uuid4())
     data["id"] = feedback_id
     data["timestamp"] = datetime.now().isoformat()
-    db["biofeedback"][feedback_id] = data
-    return {"status": "success", "feedback_id": feedback_id, **data}
-
-@app.get("/biofeedback/user/{user_id}", response_model=List[Dict])
-def get_user_biofeedback(user_id: str):
     try:
-        uuid.UUID(user_id)
-    except ValueError:
-        raise HTTPException(status_code=400, detail="Invalid user ID format")
+        db.insert("biofeedback", feedback_id, data)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Biofeedback readings must be numeric")
+    stats_cache.invalidate(data["user_id"])
+    publish_biofeedback(data["user_id"], [data])
+    return json_response({"status": "success", "feedback_id": feedback_id, **data})
+
+@app.post("/biofeedback/bulk")
+async def add_biofeedback_bulk(request: Request):
+    """Ingest readings for one or more users as NDJSON or a JSON array
+
+    Invalid lines are reported in `errors` without rejecting the rest of the upload.
+    """
+    lines = []
+    pending = b""
+    async for chunk in request.stream():
+        pending += chunk
+        *complete, pending = pending.split(b"\n")
+        lines.extend(complete)
+    lines.append(pending)
+
+    first = next((line.lstrip() for line in lines if line.strip()), b"")
+    if first.startswith(b"["):
+        try:
+            items = json.loads(b"\n".join(lines))
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Body is not a valid JSON array")
+        if not isinstance(items, list):
+            raise HTTPException(status_code=400, detail="Body is not a valid JSON array")
+        lines = items
+
+    return json_response(await run_in_threadpool(ingest_biofeedback, lines))
+
+@app.get("/biofeedback/user/{user_id}")
+def get_user_biofeedback(user_id: str,
+                         limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                         cursor: Optional[str] = None, fields: Optional[str] = None):
+    """Page through a user's biofeedback; pass the X-Next-Cursor header back as `cursor`"""
+    validate_user_id(user_id)
     
-    return [fb for fb in db["biofeedback"].values() if fb["user_id"] == user_id]
+    return paginate(partial(db.page_for_user, "biofeedback", user_id), cursor, limit, fields)
 
-@app.get("/wellness-tip", response_model=Dict)
+@app.get("/biofeedback/user/{user_id}/range")
+def get_user_biofeedback_range(user_id: str, start: Optional[datetime] = None,
+                               end: Optional[datetime] = None, last: Optional[str] = None,
+                               limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                               cursor: Optional[str] = None, fields: Optional[str] = None):
+    """Readings with start <= timestamp < end, or within the `last` duration (e.g. 24h)"""
+    validate_user_id(user_id)
+    start_us, end_us = resolve_time_range(start, end, last)
+    fetch = partial(db.biofeedback_page, user_id, start_us, end_us)
+    return paginate(fetch, cursor, limit, fields)
+
+@app.get("/biofeedback/user/{user_id}/stats")
+def get_user_biofeedback_stats(user_id: str, windows: str = DEFAULT_WINDOWS):
+    """Rolling mean/min/max/p50/p95/std and trend slope per trailing window (e.g. windows=1h,24h,7d)"""
+    validate_user_id(user_id)
+    return json_response(user_stats(user_id, parse_windows(windows)))
+
+@app.get("/biofeedback/user/{user_id}/stream")
+async def stream_user_biofeedback(user_id: str, request: Request, windows: str = "1h"):
+    """Server-sent events with the user's new readings and rolling stats as they arrive
+
+    Each `biofeedback` event carries the readings accepted since the last
+    event and the stats for `windows`; a comment line is sent every 15s to
+    keep idle connections open.
+    """
+    validate_user_id(user_id)
+    subscription = broker.subscribe(user_id, ",".join(parse_windows(windows)))
+
+    async def events():
+        try:
+            yield b"retry: 3000\n\n"
+            while not await request.is_disconnected():
+                batch = await subscription.next_batch(STREAM_KEEPALIVE)
+                if batch is None:
+                    yield b": keepalive\n\n"
+                    continue
+                yield b"event: biofeedback\ndata: " + dumps(batch) + b"\n\n"
+        finally:
+            broker.unsubscribe(subscription)
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.get("/biofeedback/user/{user_id}/downsample")
+def downsample_user_biofeedback(user_id: str, bucket: str = "1h", start: Optional[datetime] = None,
+                                end: Optional[datetime] = None, last: Optional[str] = None):
+    """Mean/min/max of each field per fixed time bucket (e.g. bucket=1h&last=24h)"""
+    validate_user_id(user_id)
+    try:
+        bucket_us = parse_duration(bucket)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if bucket_us <= 0:
+        raise HTTPException(status_code=400, detail="Bucket must be longer than zero")
+    start_us, end_us = resolve_time_range(start, end, last)
+    columns = db.biofeedback_columns(user_id, start_us, end_us)
+    return json_response({
+        "status": "success",
+        "user_id": user_id,
+        "bucket": bucket,
+        "buckets": downsample(columns, bucket_us)
+    })
+
+@app.get("/biofeedback/user/{user_id}/rollups")
+def get_user_biofeedback_rollups(user_id: str, resolution: RollupResolution = RollupResolution.HOURLY,
+                                 start: Optional[datetime] = None, end: Optional[datetime] = None,
+                                 last: Optional[str] = None):
+    """Hourly or daily aggregates of readings that retention has compacted"""
+    validate_user_id(user_id)
+    start_us, end_us = resolve_time_range(start, end, last)
+    return json_response({
+        "status": "success",
+        "user_id": user_id,
+        "resolution": resolution.value,
+        "buckets": db.biofeedback_rollups(user_id, resolution.value, start_us, end_us)
+    })
+
+@app.post("/chat/stream")
+def stream_chat(chat: ChatMessage):
+    """Server-sent events relaying the coach's reply as the model produces it
+
+    Each `chunk` event carries `{"text": ...}` as soon as Gemini sends it;
+    a final `done` event carries the time to first token and tokens/sec.
+    If the model fails, an `error` event carrying `{"error": ...}` ends
+    the stream instead, so clients can fall back to a reply of their own.
+    """
+    if not InputValidator.validate_input(chat.message):
+        raise HTTPException(status_code=400, detail="Please send a non-empty message of reasonable length")
+    # Imported on first chat so the data API runs without the Gemini SDK
+    from utils.streaming import ResponseStreamer
+    from src.context import UserSessionContext
+
+    # The chat prompt only reads these fields, and the UI's persona names differ from the agents'
+    context = UserSessionContext.model_construct(name=chat.name, coach_persona=chat.coach_preference.value,
+                                                 goal=chat.goal, mood=chat.mood)
+    stats = StreamStats()
+
+    # A sync generator: Starlette pulls each chunk on a worker thread, off the event loop
+    def events():
+        yield b"retry: 3000\n\n"
+        try:
+            for chunk in ResponseStreamer.stream_response(chat.message, context, stats, reraise=True):
+                yield b"event: chunk\ndata: " + dumps({"text": chunk}) + b"\n\n"
+        except Exception:
+            chat_totals.add_error()
+            yield b"event: error\ndata: " + dumps({"error": "The coach could not answer right now"}) + b"\n\n"
+            return
+        chat_totals.add(stats)
+        yield b"event: done\ndata: " + dumps(stats.as_dict()) + b"\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.get("/wellness-tip")
 def get_wellness_tip():
     tips = [
         "Stay hydrated throughout the day",
@@ -262,10 +809,10 @@ def get_wellness_tip():
         "Take regular breaks from sitting",
         "Practice mindful breathing exercises"
     ]
-    return {
+    return json_response({
         "status": "success",
         "tip": tips[datetime.now().day % len(tips)]
-    }
+    })
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
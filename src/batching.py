@@ -0,0 +1,345 @@
+"""Micro-batching of short classification-style LLM requests
+
+Under load many users ask the same kind of small question at once, such
+as which specialist should handle a message or what mood a text shows.
+A MicroBatcher holds such requests for up to ``WELLNESS_BATCH_MAX_WAIT_MS``
+milliseconds. It sends up to ``WELLNESS_BATCH_MAX_SIZE`` of them as one
+numbered prompt that asks for a JSON array of answers, and hands each
+answer back to the caller that asked. One Gemini request then serves a
+whole batch. At most ``WELLNESS_BATCH_MAX_IN_FLIGHT`` batches per call
+site wait on Gemini at once; while they do, the next batch keeps filling
+instead of queueing behind them half empty.
+
+Every request still carries its usual single-item prompt. That prompt is
+the cache key, so batched and unbatched answers share cache entries. It
+is also sent on its own when a batch has one item or when the model's
+answer to a batch cannot be split back into items. A max batch size of 1
+turns batching off.
+
+Thread callers' batches are collected by a thread and sent with blocking
+``generate_content`` calls on a small shared pool. Coroutines' batches are
+collected by a task on their event loop and sent with
+``generate_content_async``, so batching on the async pipeline holds no
+threads while it waits on Gemini.
+"""
+import asyncio
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from src.llm_cache import LLMCache, llm_cache, model_name
+
+BATCH_MAX_SIZE = int(os.getenv("WELLNESS_BATCH_MAX_SIZE", "16"))
+BATCH_MAX_WAIT_MS = float(os.getenv("WELLNESS_BATCH_MAX_WAIT_MS", "5"))
+BATCH_MAX_IN_FLIGHT = int(os.getenv("WELLNESS_BATCH_MAX_IN_FLIGHT", "8"))
+# Threads waiting on batched Gemini requests, shared by every batcher
+BATCH_THREADS = int(os.getenv("WELLNESS_BATCH_THREADS", "16"))
+
+BATCH_PROMPT = """
+{instructions}
+
+Items (each a JSON string):
+{items}
+
+Return only a JSON array with exactly {count} answers, one per item in the same order.
+"""
+
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(max_workers=BATCH_THREADS, thread_name_prefix="wellness-batch")
+
+
+class _Request:
+    __slots__ = ("model", "prompt", "item", "key", "ttl", "future")
+
+    def __init__(self, model, prompt: str, item: str, key: str, ttl: float,
+                 future: Union[Future, asyncio.Future, None] = None):
+        self.model = model
+        self.prompt = prompt
+        self.item = item
+        self.key = key
+        self.ttl = ttl
+        self.future = Future() if future is None else future
+
+
+def _resolve(request: _Request, answer: Optional[str] = None, error: Optional[BaseException] = None):
+    """Hand a caller its answer or error, unless it has stopped waiting"""
+    if request.future.done():
+        return
+    if error is not None:
+        request.future.set_exception(error)
+    else:
+        request.future.set_result(answer)
+
+
+def parse_answers(text: str, count: int) -> List[str]:
+    """Answers of a batched response as strings; raises ValueError unless there are ``count`` of them
+
+    Structured answers come back as Python literals, the form the tools
+    already parse from single-item responses.
+    """
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.strip("`").removeprefix("json").strip()
+    answers = json.loads(text)
+    if not isinstance(answers, list) or len(answers) != count:
+        raise ValueError(f"Expected a JSON array of {count} answers")
+    return [answer if isinstance(answer, str) else repr(answer) for answer in answers]
+
+
+class MicroBatcher:
+    """Collects concurrent requests from one call site and sends them to Gemini in batches
+
+    ``instructions`` describe the task for a single item and what each
+    answer should look like. Callers on threads use generate() and
+    coroutines use agenerate(). Requests for different models are never
+    mixed in one batch.
+    """
+
+    def __init__(self, call_site: str, instructions: str, max_size: int = BATCH_MAX_SIZE,
+                 max_wait_ms: float = BATCH_MAX_WAIT_MS, max_in_flight: int = BATCH_MAX_IN_FLIGHT,
+                 cache: LLMCache = llm_cache):
+        self.call_site = call_site
+        self.instructions = instructions
+        self.max_size = max_size
+        self.max_wait = max_wait_ms / 1000
+        self.cache = cache
+        self.max_in_flight = max_in_flight
+        self.in_flight = threading.Semaphore(max_in_flight)
+        self.queue: "queue.Queue[_Request]" = queue.Queue()
+        self.lock = threading.Lock()
+        self.collector: Optional[threading.Thread] = None
+        # Per event loop: the queue its coroutines add to and the task collecting from it
+        self.loop_queues: Dict[asyncio.AbstractEventLoop, Tuple[asyncio.Queue, asyncio.Task]] = {}
+        self.requests = 0
+        self.batches = 0
+        self.batched = 0
+        self.llm_calls = 0
+        self.split_failures = 0
+
+    def submit(self, model, prompt: str, item: str) -> Future:
+        """Future for the answer to ``prompt``, where ``item`` is the text the prompt asks about"""
+        key, ttl, text = self.cache.lookup(model, prompt, self.call_site, {})
+        request = _Request(model, prompt, item, key, ttl)
+        self.requests += 1
+        if text is not None:
+            request.future.set_result(text)
+        elif self.max_size <= 1:
+            _executor.submit(self._send_single, request)
+        else:
+            self._start()
+            self.queue.put(request)
+        return request.future
+
+    def generate(self, model, prompt: str, item: str) -> str:
+        """Answer to ``prompt``, blocking until its batch has been answered"""
+        return self.submit(model, prompt, item).result()
+
+    async def agenerate(self, model, prompt: str, item: str) -> str:
+        """generate() for the event loop, batched with the loop's other requests and sent asynchronously"""
+        key, ttl, text = await self.cache.alookup(model, prompt, self.call_site, {})
+        self.requests += 1
+        if text is not None:
+            return text
+        request = _Request(model, prompt, item, key, ttl, asyncio.get_running_loop().create_future())
+        if self.max_size <= 1:
+            await self._asend_single(request)
+        else:
+            self._loop_queue().put_nowait(request)
+        return await request.future
+
+    def _loop_queue(self) -> "asyncio.Queue[_Request]":
+        loop = asyncio.get_running_loop()
+        entry = self.loop_queues.get(loop)
+        if entry is None:
+            for closed in [other for other in self.loop_queues if other.is_closed()]:
+                del self.loop_queues[closed]
+            requests: "asyncio.Queue[_Request]" = asyncio.Queue()
+            entry = self.loop_queues[loop] = (requests, loop.create_task(self._acollect(requests)))
+        return entry[0]
+
+    def _start(self):
+        if self.collector is None:
+            with self.lock:
+                if self.collector is None:
+                    self.collector = threading.Thread(target=self._collect, daemon=True,
+                                                      name=f"wellness-batch-{self.call_site}")
+                    self.collector.start()
+
+    def _collect(self):
+        """Take requests off the queue until a batch is full or its oldest request has waited max_wait
+
+        The wait for a free in-flight slot counts towards max_wait, and
+        whatever queued up meanwhile joins the batch.
+        """
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            self.in_flight.acquire()
+            while len(batch) < self.max_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    batch.append(self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            _executor.submit(self._dispatch, batch)
+
+    async def _acollect(self, requests: "asyncio.Queue[_Request]"):
+        """_collect() for one event loop's coroutines"""
+        loop = asyncio.get_running_loop()
+        in_flight = asyncio.Semaphore(self.max_in_flight)
+        sending = set()
+        while True:
+            batch = [await requests.get()]
+            deadline = loop.time() + self.max_wait
+            await in_flight.acquire()
+            while len(batch) < self.max_size:
+                remaining = deadline - loop.time()
+                try:
+                    batch.append(await asyncio.wait_for(requests.get(), remaining) if remaining > 0
+                                 else requests.get_nowait())
+                except (asyncio.TimeoutError, asyncio.QueueEmpty):
+                    break
+            task = loop.create_task(self._adispatch(batch, in_flight))
+            sending.add(task)
+            task.add_done_callback(sending.discard)
+
+    async def _adispatch(self, batch: List[_Request], in_flight: asyncio.Semaphore):
+        """_dispatch() on the event loop"""
+        first, *others = self._by_model(batch)
+        try:
+            await asyncio.gather(self._asend(first), *(self._asend(requests) for requests in others))
+        finally:
+            in_flight.release()
+
+    @staticmethod
+    def _by_model(batch: List[_Request]) -> List[List[_Request]]:
+        groups: Dict[str, List[_Request]] = {}
+        for request in batch:
+            groups.setdefault(model_name(request.model), []).append(request)
+        return list(groups.values())
+
+    def _dispatch(self, batch: List[_Request]):
+        """Send a collected batch, split by model, and free its in-flight slot"""
+        first, *others = self._by_model(batch)
+        # Mixed models are rare enough that only the first group holds the slot
+        for requests in others:
+            _executor.submit(self._send, requests)
+        try:
+            self._send(first)
+        finally:
+            self.in_flight.release()
+
+    def _batch(self, requests: List[_Request]) -> Tuple[List[List[_Request]], Optional[str]]:
+        """Requests grouped by prompt, since identical prompts are asked once, and the batch prompt
+
+        The prompt is None when every request shares one prompt, which is
+        then sent on its own.
+        """
+        unique: Dict[str, List[_Request]] = {}
+        for request in requests:
+            unique.setdefault(request.key, []).append(request)
+        if len(unique) == 1:
+            return list(unique.values()), None
+        firsts = [same[0] for same in unique.values()]
+        self.batches += 1
+        self.batched += len(firsts)
+        self.llm_calls += 1
+        return list(unique.values()), BATCH_PROMPT.format(
+            instructions=self.instructions.strip(),
+            items="\n".join(f"{i}. {json.dumps(request.item)}" for i, request in enumerate(firsts, 1)),
+            count=len(firsts)
+        )
+
+    def _split_failed(self, groups: List[List[_Request]], error: Exception):
+        self.split_failures += 1
+        logger.warning(f"Batch of {len(groups)} {self.call_site} requests failed ({error}); sending them one by one")
+
+    def _deliver(self, groups: List[List[_Request]], answers: List[str], seconds: float):
+        """Cache each answer and hand it to every request that asked for it"""
+        for same, answer in zip(groups, answers):
+            self.cache.store(self.call_site, same[0].key, answer, same[0].ttl, seconds)
+            for request in same:
+                _resolve(request, answer)
+
+    async def _adeliver(self, groups: List[List[_Request]], answers: List[str], seconds: float):
+        """_deliver() that answers the callers first and then caches without blocking the loop"""
+        for same, answer in zip(groups, answers):
+            for request in same:
+                _resolve(request, answer)
+        await asyncio.gather(*(self.cache.astore(self.call_site, same[0].key, answer, same[0].ttl, seconds)
+                               for same, answer in zip(groups, answers)))
+
+    def _send(self, requests: List[_Request]):
+        """Answer a batch with one request, falling back to single prompts if it cannot be split"""
+        groups, prompt = self._batch(requests)
+        if prompt is None:
+            self._send_single(*groups[0])
+            return
+        started = time.perf_counter()
+        try:
+            answers = parse_answers(groups[0][0].model.generate_content(prompt).text, len(groups))
+        except Exception as e:
+            self._split_failed(groups, e)
+            for same in groups:
+                _executor.submit(self._send_single, *same)
+            return
+        self._deliver(groups, answers, (time.perf_counter() - started) / len(groups))
+
+    async def _asend(self, requests: List[_Request]):
+        """_send() with generate_content_async"""
+        groups, prompt = self._batch(requests)
+        if prompt is None:
+            await self._asend_single(*groups[0])
+            return
+        started = time.perf_counter()
+        try:
+            response = await groups[0][0].model.generate_content_async(prompt)
+            answers = parse_answers(response.text, len(groups))
+        except Exception as e:
+            self._split_failed(groups, e)
+            await asyncio.gather(*(self._asend_single(*same) for same in groups))
+            return
+        await self._adeliver(groups, answers, (time.perf_counter() - started) / len(groups))
+
+    def _send_single(self, *requests: _Request):
+        """Answer requests sharing one prompt with that prompt alone"""
+        first = requests[0]
+        self.llm_calls += 1
+        started = time.perf_counter()
+        try:
+            answer = first.model.generate_content(first.prompt).text
+        except Exception as e:
+            for request in requests:
+                _resolve(request, error=e)
+            return
+        self._deliver([list(requests)], [answer], time.perf_counter() - started)
+
+    async def _asend_single(self, *requests: _Request):
+        """_send_single() with generate_content_async"""
+        first = requests[0]
+        self.llm_calls += 1
+        started = time.perf_counter()
+        try:
+            answer = (await first.model.generate_content_async(first.prompt)).text
+        except Exception as e:
+            for request in requests:
+                _resolve(request, error=e)
+            return
+        await self._adeliver([list(requests)], [answer], time.perf_counter() - started)
+
+    def stats(self) -> Dict[str, Any]:
+        """Requests answered, Gemini calls made for them and the mean batch size"""
+        return {
+            "requests": self.requests,
+            "llm_calls": self.llm_calls,
+            "batches": self.batches,
+            "mean_batch_size": self.batched / self.batches if self.batches else 0.0,
+            "split_failures": self.split_failures,
+            "requests_per_call": self.requests / self.llm_calls if self.llm_calls else 0.0
+        }
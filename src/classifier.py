@@ -0,0 +1,177 @@
+"""Local text classifier used to skip LLM round trips when routing messages
+
+Messages are turned into hashed n-gram features (words, word pairs and
+character trigrams) and scored by a linear softmax model trained from a
+labeled example file at startup. Predicting one message takes tens of
+microseconds. FallbackClassifier consults the LLM only when the model is
+not confident enough, and counts how often that was avoided.
+"""
+import asyncio
+import inspect
+import logging
+import os
+import random
+import re
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+CLASSIFIER_BUCKETS = int(os.getenv("WELLNESS_CLASSIFIER_BUCKETS", str(2 ** 14)))
+CLASSIFIER_EPOCHS = int(os.getenv("WELLNESS_CLASSIFIER_EPOCHS", "30"))
+
+_WORD = re.compile(r"[a-z0-9']+")
+
+logger = logging.getLogger(__name__)
+
+
+def features(text: str, buckets: int = CLASSIFIER_BUCKETS) -> np.ndarray:
+    """Sorted distinct feature ids of a message"""
+    words = _WORD.findall(text.lower())
+    tokens = [f"w:{word}" for word in words]
+    tokens += [f"b:{first} {second}" for first, second in zip(words, words[1:])]
+    for word in words:
+        padded = f"<{word}>"
+        tokens += [f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2)]
+    return np.array(sorted({zlib.crc32(token.encode()) % buckets for token in tokens}), dtype=np.int64)
+
+
+def load_examples(path) -> List[Tuple[str, str]]:
+    """``(label, text)`` pairs from a tab-separated file; blank lines and # comments are skipped"""
+    examples = []
+    for line in Path(path).read_text(encoding="utf-8").splitlines():
+        if not line.strip() or line.startswith("#"):
+            continue
+        label, _, text = line.partition("\t")
+        examples.append((label.strip(), text.strip()))
+    return examples
+
+
+class HashedNgramClassifier:
+    """Multinomial logistic regression over hashed n-gram features"""
+
+    def __init__(self, labels: Sequence[str], buckets: int = CLASSIFIER_BUCKETS):
+        self.labels = list(labels)
+        self.buckets = buckets
+        self.weights = np.zeros((buckets, len(self.labels)), dtype=np.float32)
+        self.bias = np.zeros(len(self.labels), dtype=np.float32)
+
+    @classmethod
+    def train(cls, examples: Sequence[Tuple[str, str]], buckets: int = CLASSIFIER_BUCKETS,
+              epochs: int = CLASSIFIER_EPOCHS, rate: float = 0.1, l2: float = 1e-3, seed: int = 0):
+        """Fit a model to ``(label, text)`` pairs with stochastic gradient descent"""
+        model = cls(sorted({label for label, _ in examples}), buckets)
+        index = {label: i for i, label in enumerate(model.labels)}
+        rows = [(features(text, buckets), index[label]) for label, text in examples]
+        order = random.Random(seed)
+        for epoch in range(epochs):
+            order.shuffle(rows)
+            step = rate / (1 + epoch * 0.1)
+            for ids, target in rows:
+                probabilities = model._probabilities(ids)
+                probabilities[target] -= 1
+                model.weights[ids] -= step * (probabilities + l2 * model.weights[ids])
+                model.bias -= step * probabilities
+        return model
+
+    def _probabilities(self, ids: np.ndarray) -> np.ndarray:
+        scores = self.weights[ids].sum(axis=0) + self.bias
+        scores = np.exp(scores - scores.max())
+        return scores / scores.sum()
+
+    def predict(self, text: str) -> Tuple[str, float]:
+        """Most likely label of a message and its probability"""
+        probabilities = self._probabilities(features(text, self.buckets))
+        best = int(probabilities.argmax())
+        return self.labels[best], float(probabilities[best])
+
+
+class FallbackClassifier:
+    """Classifies locally and calls ``fallback`` only below ``threshold`` confidence
+
+    ``fallback`` may be a coroutine function, in which case only
+    aclassify() can use it.
+
+    The model is trained from ``examples_path`` on first use, off the event
+    loop when that is aclassify(). ``none_label`` is returned as None, like
+    an LLM answering that no label applies. The counters are plain numbers;
+    an occasional lost update under threads only blurs the statistics.
+    """
+
+    def __init__(self, examples_path, fallback: Callable[[str], Any], threshold: float,
+                 none_label: str = "none"):
+        self.examples_path = examples_path
+        self.fallback = fallback
+        self.threshold = threshold
+        self.none_label = none_label
+        self.model: Optional[HashedNgramClassifier] = None
+        self.lock = threading.Lock()
+        self.local = 0
+        self.fallbacks = 0
+        self.local_seconds = 0.0
+        self.fallback_seconds = 0.0
+
+    def classifier(self) -> HashedNgramClassifier:
+        if self.model is None:
+            with self.lock:
+                if self.model is None:
+                    started = time.perf_counter()
+                    self.model = HashedNgramClassifier.train(load_examples(self.examples_path))
+                    logger.info(f"Trained classifier from {self.examples_path} in {time.perf_counter() - started:.2f}s")
+        return self.model
+
+    def _predict(self, text: str) -> Tuple[bool, Optional[str]]:
+        """Whether the local model is confident, and its answer"""
+        classifier = self.classifier()
+        started = time.perf_counter()
+        label, confidence = classifier.predict(text)
+        self.local_seconds += time.perf_counter() - started
+        if confidence < self.threshold:
+            return False, None
+        self.local += 1
+        return True, None if label == self.none_label else label
+
+    def classify(self, text: str) -> Optional[str]:
+        confident, label = self._predict(text)
+        if confident:
+            return label
+        started = time.perf_counter()
+        try:
+            return self.fallback(text)
+        finally:
+            self.fallbacks += 1
+            self.fallback_seconds += time.perf_counter() - started
+
+    async def aclassify(self, text: str) -> Optional[str]:
+        """classify() for the event loop; training and a sync fallback run in a worker thread"""
+        if self.model is None:
+            await asyncio.to_thread(self.classifier)
+        confident, label = self._predict(text)
+        if confident:
+            return label
+        started = time.perf_counter()
+        try:
+            if inspect.iscoroutinefunction(self.fallback):
+                return await self.fallback(text)
+            return await asyncio.to_thread(self.fallback, text)
+        finally:
+            self.fallbacks += 1
+            self.fallback_seconds += time.perf_counter() - started
+
+    def stats(self) -> Dict[str, Optional[float]]:
+        """Hit rate and latency saved; the saving is estimated from the mean fallback latency seen so far"""
+        total = self.local + self.fallbacks
+        mean_fallback = self.fallback_seconds / self.fallbacks if self.fallbacks else None
+        return {
+            "requests": total,
+            "local": self.local,
+            "fallbacks": self.fallbacks,
+            "hit_rate": self.local / total if total else 0.0,
+            "mean_local_ms": self.local_seconds / total * 1000 if total else 0.0,
+            "mean_fallback_ms": None if mean_fallback is None else mean_fallback * 1000,
+            "latency_saved_seconds": None if mean_fallback is None
+            else self.local * mean_fallback - self.local_seconds
+        }
@@ -0,0 +1,260 @@
+"""Offline stand-in for Gemini, for benchmarks and load tests
+
+Selected with ``WELLNESS_LLM_PROVIDER=fake``. FakeModel answers the
+prompts the agents and tools send with outputs in the shape they parse:
+meal and workout plans, mood objects, specialist keywords, fused tool
+results with a reply, batched JSON arrays and conversational replies. The
+same prompt always gets the same answer. Timing is simulated:
+
+- ``WELLNESS_FAKE_LLM_LATENCY_MS``: delay before a response or before
+  the first streamed chunk. Either a fixed number of milliseconds or a
+  distribution: ``uniform:LOW-HIGH``, ``normal:MEAN,STDDEV``,
+  ``lognormal:MEDIAN,SIGMA`` or ``exponential:MEAN``. Default
+  ``lognormal:400,0.5``.
+- ``WELLNESS_FAKE_LLM_CHUNK_MS``: delay between streamed chunks of a few
+  words each (default 30).
+- ``WELLNESS_FAKE_LLM_ERROR_RATE``: share of calls that fail with
+  FakeLLMError after the delay (default 0).
+- ``WELLNESS_FAKE_LLM_SEED``: seed of the delay and error draws
+  (default 0).
+"""
+import asyncio
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+import zlib
+from typing import Any, Callable, Iterator, List, Union
+
+from src.intents import IntentMatcher
+
+FAKE_LLM_LATENCY_MS = os.getenv("WELLNESS_FAKE_LLM_LATENCY_MS", "lognormal:400,0.5")
+FAKE_LLM_CHUNK_MS = float(os.getenv("WELLNESS_FAKE_LLM_CHUNK_MS", "30"))
+FAKE_LLM_ERROR_RATE = float(os.getenv("WELLNESS_FAKE_LLM_ERROR_RATE", "0"))
+FAKE_LLM_SEED = int(os.getenv("WELLNESS_FAKE_LLM_SEED", "0"))
+# Words per streamed chunk
+CHUNK_WORDS = 3
+
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+MEALS = {
+    "breakfast": ["Oatmeal with berries", "Greek yogurt with granola", "Veggie omelette", "Chia pudding"],
+    "snack": ["Apple with almond butter", "Handful of walnuts", "Carrot sticks with hummus", "Banana"],
+    "lunch": ["Quinoa salad with chickpeas", "Grilled chicken wrap", "Lentil soup", "Tuna salad"],
+    "dinner": ["Baked salmon with vegetables", "Tofu stir fry with rice", "Turkey chili", "Bean tacos"],
+}
+VEGAN_MEALS = {
+    "breakfast": ["Oatmeal with berries", "Chia pudding", "Tofu scramble", "Smoothie bowl"],
+    "snack": ["Apple with almond butter", "Handful of walnuts", "Carrot sticks with hummus", "Banana"],
+    "lunch": ["Quinoa salad with chickpeas", "Lentil soup", "Falafel wrap", "Buddha bowl"],
+    "dinner": ["Tofu stir fry with rice", "Bean tacos", "Chickpea curry", "Vegetable lasagna"],
+}
+EXERCISES = ["30 min brisk walk", "3x12 squats", "3x10 push ups", "20 min cycling", "3x12 lunges",
+             "10 min stretching", "3x15 glute bridges", "20 min swim", "3x30s plank", "25 min jog"]
+REPLY_SENTENCES = [
+    "That's a great question and I'm glad you asked.",
+    "Small, consistent steps add up faster than you might expect.",
+    "Try to drink a glass of water with every meal today.",
+    "A short walk after lunch can lift both your energy and your mood.",
+    "Aim for seven to eight hours of sleep so your body can recover.",
+    "Protein at breakfast helps keep you full until lunch.",
+    "Remember to warm up for five minutes before any workout.",
+    "Let's check in again tomorrow and see how you're feeling.",
+    "Write down one thing that went well today, however small.",
+    "If anything hurts, ease off and give your body time to rest.",
+]
+MOOD_RESPONSES = {
+    "happy": "That's wonderful to hear, keep it going!",
+    "sad": "I'm sorry you're feeling down; I'm here for you.",
+    "anxious": "Let's take a few slow breaths together.",
+    "tired": "Rest is part of progress; be gentle with yourself.",
+    "excited": "I love that energy, let's put it to good use!",
+    "neutral": "Thanks for checking in with me today.",
+}
+MOOD_INTENTS = IntentMatcher([
+    ("excited", ["excit*", "thrilled", "pumped"]),
+    ("happy", ["happy", "great", "good", "joy*"]),
+    ("sad", ["sad", "down", "depress*", "lonely"]),
+    ("anxious", ["anxious", "stress*", "worr*", "nervous"]),
+    ("tired", ["tired", "exhaust*", "sleepy", "drained"])
+])
+SPECIALIST_INTENTS = IntentMatcher([
+    ("escalation", ["human", "person", "talk to someone", "real coach"]),
+    ("injury", ["pain", "painful", "hurt*", "injur*", "sprain*", "sore"]),
+    ("sleep", ["tired", "sleep*", "insomnia", "fatigue*", "exhaust*"]),
+    ("nutrition", ["diet*", "allerg*", "diabet*", "gluten", "vegan", "protein", "calorie*"])
+])
+_BATCH_ITEM = re.compile(r"^\s*\d+\. (\".*\")\s*$", re.MULTILINE)
+
+
+class FakeLLMError(RuntimeError):
+    """A simulated provider failure"""
+
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """Sampler of delays in seconds from a ``WELLNESS_FAKE_LLM_LATENCY_MS`` spec"""
+    kind, _, args = spec.partition(":")
+    try:
+        if not args:
+            fixed = float(kind) / 1000
+            return lambda rng: fixed
+        if kind == "uniform":
+            low, high = (float(value) / 1000 for value in args.split("-"))
+            return lambda rng: rng.uniform(low, high)
+        first, _, second = args.partition(",")
+        first = float(first) / 1000
+        if kind == "normal":
+            stddev = float(second) / 1000
+            return lambda rng: max(0.0, rng.gauss(first, stddev))
+        if kind == "lognormal":
+            mu, sigma = math.log(first), float(second)
+            return lambda rng: rng.lognormvariate(mu, sigma)
+        if kind == "exponential":
+            return lambda rng: rng.expovariate(1 / first)
+    except ValueError:
+        pass
+    raise ValueError(f"Invalid latency '{spec}'. Use milliseconds or uniform:LOW-HIGH, normal:MEAN,STDDEV, "
+                     f"lognormal:MEDIAN,SIGMA or exponential:MEAN")
+
+
+def _pick(options: List[Any], seed: int, salt: int = 0) -> Any:
+    return options[(seed + salt * 7919) % len(options)]
+
+
+def _user_text(prompt: str) -> str:
+    """The part of a prompt written by the user, without the instructions listing the options"""
+    for line in prompt.splitlines():
+        if line.strip().startswith("User message:"):
+            return line.split(":", 1)[1]
+    return "\n".join(line for line in prompt.splitlines() if not line.strip().startswith("-"))
+
+
+def _answer(task: str, text: str, seed: int) -> Any:
+    """Output for one task: a dict for plans and moods, a string otherwise
+
+    The task is recognised from the instructions only, so a user asking
+    for a meal plan in a chat message still gets a chat reply.
+    """
+    lower = "\n".join(line for line in task.lower().splitlines()
+                      if not line.strip().startswith(("user message:", "user question:")))
+    if "determine the user's mood" in lower:
+        mood = MOOD_INTENTS.match(text).intent or "neutral"
+        return {"mood": mood, "confidence": 0.6 + (seed % 35) / 100, "suggested_response": MOOD_RESPONSES[mood]}
+    if "specialized agent" in lower:
+        return SPECIALIST_INTENTS.match(text).intent or "None"
+    if "-day meal plan" in lower:
+        pools = VEGAN_MEALS if "vegan" in lower or "vegetarian" in lower else MEALS
+        return {day: [_pick(pools[slot], seed, i + j) for j, slot in
+                      enumerate(["breakfast", "snack", "lunch", "snack", "dinner"])]
+                for i, day in enumerate(DAYS)}
+    if "weekly workout plan" in lower:
+        return {day: [_pick(EXERCISES, seed, i * 3 + j) for j in range(3)] for i, day in enumerate(DAYS[:6])}
+    return " ".join(_pick(REPLY_SENTENCES, seed, i) for i in range(3 + seed % 3))
+
+
+def respond(prompt: str) -> str:
+    """Deterministic response text for a prompt"""
+    seed = zlib.crc32(" ".join(prompt.split()).encode())
+    items = _BATCH_ITEM.findall(prompt)
+    if items and "JSON array" in prompt:
+        instructions = prompt.split("Items", 1)[0]
+        return json.dumps([_answer(instructions, json.loads(item), zlib.crc32(item.encode())) for item in items])
+    text = _user_text(prompt)
+    if '"reply"' in prompt and '"result"' in prompt:
+        task, _, reply_prompt = prompt.partition("Then, as")
+        return json.dumps({"result": _answer(task, text, seed), "reply": _answer(reply_prompt, text, seed)})
+    answer = _answer(prompt, text, seed)
+    # The tools parse structured answers as Python literals
+    return answer if isinstance(answer, str) else repr(answer)
+
+
+class FakeResponse:
+    """Just the ``text`` of a GenerateContentResponse"""
+
+    def __init__(self, text: str):
+        self.text = text
+
+
+class FakeStreamResponse:
+    """Streamed GenerateContentResponse look-alike: iterating yields chunks of a few words
+
+    As with the SDK, the first chunk has already arrived when the call
+    returns; the rest follow ``chunk_ms`` apart. ``text`` is the whole
+    response once it has been iterated.
+    """
+
+    def __init__(self, text: str, chunk_seconds: float):
+        words = text.split(" ")
+        self.chunks = [" ".join(words[i:i + CHUNK_WORDS]) + (" " if i + CHUNK_WORDS < len(words) else "")
+                       for i in range(0, len(words), CHUNK_WORDS)]
+        self.chunk_seconds = chunk_seconds
+        self.received: List[str] = []
+
+    def __iter__(self) -> Iterator[FakeResponse]:
+        for i, chunk in enumerate(self.chunks):
+            if i:
+                time.sleep(self.chunk_seconds)
+            self.received.append(chunk)
+            yield FakeResponse(chunk)
+
+    @property
+    def text(self) -> str:
+        if len(self.received) < len(self.chunks):
+            raise ValueError("Iterate over the streamed response before reading its text")
+        return "".join(self.received)
+
+
+class FakeModel:
+    """GenerativeModel look-alike answering from respond() after simulated delays
+
+    Only the SDK's own call shapes are offered: ``generate_content`` (with
+    ``stream=True`` for chunks) and ``generate_content_async``.
+    """
+
+    def __init__(self, model_name: str, provider: "FakeProvider", **config):
+        self.model_name = f"models/{model_name}"
+        self.provider = provider
+        self.config = config
+
+    def generate_content(self, prompt: str, stream: bool = False,
+                         **params) -> Union[FakeResponse, FakeStreamResponse]:
+        time.sleep(self.provider.delay())
+        self.provider.maybe_fail()
+        if stream:
+            return FakeStreamResponse(respond(prompt), self.provider.chunk_seconds)
+        return FakeResponse(respond(prompt))
+
+    async def generate_content_async(self, prompt: str, **params) -> FakeResponse:
+        await asyncio.sleep(self.provider.delay())
+        self.provider.maybe_fail()
+        return FakeResponse(respond(prompt))
+
+
+class FakeProvider:
+    """Builds FakeModels sharing one seeded source of delays and errors"""
+
+    name = "fake"
+
+    def __init__(self, latency_ms: str = FAKE_LLM_LATENCY_MS, chunk_ms: float = FAKE_LLM_CHUNK_MS,
+                 error_rate: float = FAKE_LLM_ERROR_RATE, seed: int = FAKE_LLM_SEED):
+        self.sample = parse_latency(latency_ms)
+        self.chunk_seconds = chunk_ms / 1000
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def delay(self) -> float:
+        with self.lock:
+            return self.sample(self.rng)
+
+    def maybe_fail(self):
+        if self.error_rate:
+            with self.lock:
+                failed = self.rng.random() < self.error_rate
+            if failed:
+                raise FakeLLMError("Simulated provider error (503 Service Unavailable)")
+
+    def model(self, model_name: str, **config) -> FakeModel:
+        return FakeModel(model_name, self, **config)
@@ -7,6 +7,9 @@ from pathlib import Path
 # Add project root to path if needed
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
+# Longest chat message passed on to the agents
+MAX_INPUT_LENGTH = 2000
+
 class InputValidator:
     """Class for validating user inputs and sanitizing outputs"""
     
@@ -31,6 +34,11 @@ class InputValidator:
             'time_unit': time_unit
         }
     
+    @staticmethod
+    def validate_input(text: str) -> bool:
+        """Check that a chat message is non-empty and of reasonable length"""
+        return bool(text and text.strip()) and len(text) <= MAX_INPUT_LENGTH
+    
     @staticmethod
     def validate_diet_preferences(prefs: str) -> str:
         """Validate diet preferences input"""
@@ -1,4 +1,4 @@
-from typing import Callable, Any, Dict
+from typing import Callable, Any, Dict, Optional
 import logging
 import sys
 from pathlib import Path
@@ -34,10 +34,11 @@ class LifecycleHooks:
         user_context.handoff_logs.append(f"{from_tool} → {to_tool}")
     
     @staticmethod
-    def on_error(tool_name: str, error: Exception, user_context: UserSessionContext):
-        """Triggered when a tool encounters an error"""
+    def on_error(tool_name: str, error: Exception, user_context: Optional[UserSessionContext] = None):
+        """Triggered when a tool encounters an error; tools without a session pass no context"""
         logger.error(f"Error in {tool_name}: {str(error)}")
-        user_context.add_progress_log('error', f"Error in {tool_name}: {str(error)}")
+        if user_context is not None:
+            user_context.add_progress_log('error', f"Error in {tool_name}: {str(error)}")
     
     @staticmethod
     def on_goal_completed(user_context: UserSessionContext):
@@ -0,0 +1,42 @@
+import hashlib
+import json
+from typing import Any, Dict, Optional
+
+from fastapi import Request, Response
+
+DEFAULT_CACHE_CONTROL = "public, max-age=86400"
+
+
+class PrecomputedResponse:
+    """A JSON body serialized once, with a strong ETag derived from its bytes"""
+
+    def __init__(self, payload: Any, cache_control: str = DEFAULT_CACHE_CONTROL):
+        self.body = json.dumps(payload, separators=(",", ":")).encode()
+        self.etag = f'"{hashlib.sha256(self.body).hexdigest()[:32]}"'
+        self.headers = {"ETag": self.etag, "Cache-Control": cache_control}
+
+    def matches(self, if_none_match: Optional[str]) -> bool:
+        """True when an If-None-Match header already names this body"""
+        if not if_none_match:
+            return False
+        if if_none_match.strip() == "*":
+            return True
+        for tag in if_none_match.split(","):
+            tag = tag.strip()
+            # If-None-Match uses weak comparison, so W/"x" matches "x"
+            if tag.startswith("W/"):
+                tag = tag[2:]
+            if tag == self.etag:
+                return True
+        return False
+
+    def respond(self, request: Request) -> Response:
+        """Serve the cached body, or 304 Not Modified if the client already has it"""
+        if self.matches(request.headers.get("if-none-match")):
+            return Response(status_code=304, headers=self.headers)
+        return Response(content=self.body, media_type="application/json", headers=self.headers)
+
+
+def precompute(payloads: Dict[Any, Any], cache_control: str = DEFAULT_CACHE_CONTROL) -> Dict[Any, PrecomputedResponse]:
+    """Serialize a mapping of key -> payload once"""
+    return {key: PrecomputedResponse(payload, cache_control) for key, payload in payloads.items()}
@@ -0,0 +1,98 @@
+"""Keyword intent matching shared by the chat routers and goal analysis
+
+A router declares its intents in priority order, each with keywords.
+Keywords match whole words; a trailing ``*`` also matches longer words
+starting with it (``meal*`` matches "meals"), and a space in a phrase
+matches any run of whitespace. Matching ignores case.
+
+The keywords of every intent are merged into one character trie that is
+compiled into a single regular expression, with an empty capture group
+marking where each keyword ends. Text is lowercased and scanned once by
+the C regex engine; each trie branch starts with a literal character, so
+the engine skips straight to positions where some keyword could begin.
+"""
+import re
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+# Trie key marking the end of a keyword; maps to (intent rank, whether longer words match too)
+_END = ""
+
+
+class IntentMatch:
+    """Result of one scan: the highest-priority intent found and every match"""
+
+    __slots__ = ("intent", "spans")
+
+    def __init__(self, intent: Optional[str], spans: List[Tuple[str, int, int]]):
+        self.intent = intent
+        self.spans = spans
+
+    def __bool__(self) -> bool:
+        return self.intent is not None
+
+    @property
+    def intents(self) -> Set[str]:
+        return {intent for intent, _, _ in self.spans}
+
+
+class IntentMatcher:
+    """Keyword table compiled into one trie-shaped regular expression
+
+    ``table`` is a sequence of ``(intent, keywords)`` in priority order.
+    Each match is reported as ``(intent, start, end)`` in the original
+    text; when keywords of several intents start at the same position the
+    earlier intent wins.
+    """
+
+    def __init__(self, table: Sequence[Tuple[str, Sequence[str]]]):
+        self.intents = [intent for intent, _ in table]
+        trie: Dict[str, dict] = {}
+        for rank, (_, keywords) in enumerate(table):
+            for keyword in keywords:
+                node = trie
+                for char in keyword.lower().rstrip("*"):
+                    node = node.setdefault(char, {})
+                node.setdefault(_END, (rank, keyword.endswith("*")))
+        # Capture group number -> intent rank, in the order the groups are written
+        self.group_ranks: List[int] = [-1]
+        pattern = _node_pattern(trie, self.group_ranks, None, True) or "(?!)"
+        self.pattern = re.compile(pattern)
+        # Used when lowercasing would change the text length and so the offsets
+        self.casefold_pattern = re.compile(pattern, re.IGNORECASE)
+
+    def match(self, text: str) -> IntentMatch:
+        lowered = text.lower()
+        found = self.pattern.finditer(lowered) if len(lowered) == len(text) else self.casefold_pattern.finditer(text)
+        group_ranks = self.group_ranks
+        spans = [(group_ranks[match.lastindex], match.start(), match.end()) for match in found]
+        if not spans:
+            return IntentMatch(None, [])
+        intents = self.intents
+        return IntentMatch(intents[min(spans)[0]], [(intents[rank], start, end) for rank, start, end in spans])
+
+
+def _node_pattern(node: Dict[str, dict], group_ranks: List[int], ceiling: Optional[int], first: bool) -> str:
+    """Pattern for a trie node; empty when nothing below it can match
+
+    ``ceiling`` is the rank of the nearest prefix keyword above the node.
+    A keyword below it can only win for a higher-priority intent, so the
+    others are left out.
+    """
+    branches = []
+    end = node.get(_END)
+    below = ceiling
+    if end is not None and end[1] and (ceiling is None or end[0] < ceiling):
+        below = end[0]
+    # Longer keywords are tried before a keyword ending here
+    for char, child in sorted(item for item in node.items() if item[0] != _END):
+        rest = _node_pattern(child, group_ranks, below, False)
+        if rest:
+            # Checking the word boundary after the first character keeps it a literal prefix
+            branches.append((r"\s+" if char == " " else re.escape(char)) + (r"(?<!\w.)" if first else "") + rest)
+    if end is not None and (ceiling is None or end[0] < ceiling):
+        rank, prefix = end
+        group_ranks.append(rank)
+        branches.append((r"\w*" if prefix else r"(?!\w)") + "()")
+    if len(branches) <= 1:
+        return "".join(branches)
+    return "(?:" + "|".join(branches) + ")"
@@ -0,0 +1,347 @@
+"""Persistent cache of LLM responses shared by every agent and tool
+
+Responses are keyed by the normalized prompt (whitespace collapsed, so
+re-indented f-strings still match), the model name and the generation
+parameters. Lookups go to an in-memory LRU first and then to a SQLite
+file, so cached answers survive restarts and are shared between
+processes on the same host.
+
+Each call site has its own TTL: ``WELLNESS_LLM_CACHE_TTLS`` overrides the
+defaults below, e.g. ``mood_detector=10m,faq_responder=7d``, and a TTL of
+``0s`` disables caching for that site. The memory front holds at most
+``WELLNESS_LLM_CACHE_ENTRIES`` responses and the file is trimmed to
+``WELLNESS_LLM_CACHE_MAX_BYTES`` of response text, least recently used
+first. ``WELLNESS_LLM_CACHE=off`` keeps the cache in memory only.
+
+Free-form chat replies are not cached by default: a user who sends the
+same message twice should not get the same reply word for word.
+
+Coroutines reach the SQLite file through ``asyncio.to_thread`` so disk
+reads and writes never stall the event loop; the memory front is
+checked inline.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from src.timeseries import parse_duration
+
+LLM_CACHE_PATH = os.getenv("WELLNESS_LLM_CACHE", "llm-cache.db")
+LLM_CACHE_ENTRIES = int(os.getenv("WELLNESS_LLM_CACHE_ENTRIES", "1024"))
+LLM_CACHE_MAX_BYTES = int(os.getenv("WELLNESS_LLM_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+LLM_CACHE_TTLS = os.getenv("WELLNESS_LLM_CACHE_TTLS", "")
+# Used by call sites without an entry in CALL_SITE_TTLS
+LLM_CACHE_DEFAULT_TTL = os.getenv("WELLNESS_LLM_CACHE_DEFAULT_TTL", "1h")
+
+# Default TTLs; prompts that embed the user's context only repeat while that context is unchanged.
+# Conversational call sites (chat replies and mood check-ins answered with a reply) get 0s: not cached.
+CALL_SITE_TTLS = {
+    "specialist_router": "7d",
+    "faq_responder": "7d",
+    "meal_planner": "1d",
+    "workout_recommender": "1d",
+    "nutrition_expert": "1d",
+    "injury_support": "1d",
+    "sleep_advisor": "1d",
+    "mood_detector": "1h",
+    "daily_summary": "1h",
+    "reply": "0s",
+    "fused_meal_planner": "1d",
+    "fused_workout_recommender": "1d",
+    "fused_mood_detector": "0s",
+    "response_streamer": "0s"
+}
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_prompt(prompt: str) -> str:
+    return " ".join(prompt.split())
+
+
+def cache_key(model: str, prompt: str, params: Optional[Dict[str, Any]] = None) -> str:
+    """Hash of the model, generation parameters and normalized prompt"""
+    material = json.dumps([model, params or {}, normalize_prompt(prompt)], sort_keys=True, default=str)
+    return hashlib.sha256(material.encode()).hexdigest()
+
+
+def parse_ttls(text: str) -> Dict[str, float]:
+    """Parse ``call_site=duration`` pairs into call site -> seconds"""
+    ttls = {}
+    for item in text.split(","):
+        if not item.strip():
+            continue
+        site, _, duration = item.partition("=")
+        ttls[site.strip()] = parse_duration(duration) / 1_000_000
+    return ttls
+
+
+def model_name(model) -> str:
+    return getattr(model, "model_name", None) or type(model).__name__
+
+
+class LLMCache:
+    """Two-level response cache with per-call-site TTLs and hit/miss counters
+
+    ``path`` of None keeps responses in memory only. The SQLite file is
+    opened on first use so importing an agent does not create it.
+    ``lock`` guards the memory front and counters and ``disk_lock`` the
+    SQLite connection, so a slow disk operation never holds up memory hits.
+    """
+
+    def __init__(self, path: Optional[str] = LLM_CACHE_PATH, max_entries: int = LLM_CACHE_ENTRIES,
+                 max_bytes: int = LLM_CACHE_MAX_BYTES, ttls: Optional[Dict[str, float]] = None,
+                 default_ttl: float = parse_duration(LLM_CACHE_DEFAULT_TTL) / 1_000_000):
+        self.path = None if path in (None, "", "off") else path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttls = {site: parse_duration(ttl) / 1_000_000 for site, ttl in CALL_SITE_TTLS.items()}
+        self.ttls.update(parse_ttls(LLM_CACHE_TTLS) if ttls is None else ttls)
+        self.default_ttl = default_ttl
+        # key -> (text, expires_at, generation_seconds)
+        self.memory: "OrderedDict[str, Tuple[str, float, float]]" = OrderedDict()
+        self.lock = threading.RLock()
+        self.disk_lock = threading.Lock()
+        self.conn: Optional[sqlite3.Connection] = None
+        self.disk_bytes = 0
+        self.counters: Dict[str, Dict[str, float]] = {}
+
+    def ttl(self, call_site: str) -> float:
+        return self.ttls.get(call_site, self.default_ttl)
+
+    def _db(self) -> Optional[sqlite3.Connection]:
+        if self.conn is None and self.path is not None:
+            try:
+                conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, text TEXT NOT NULL, "
+                    "expires REAL NOT NULL, accessed REAL NOT NULL, seconds REAL NOT NULL, size INTEGER NOT NULL)"
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+                conn.execute("DELETE FROM responses WHERE expires <= ?", (time.time(),))
+                self.disk_bytes = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+                self.conn = conn
+            except sqlite3.Error:
+                logger.exception(f"LLM cache file {self.path} unavailable, caching in memory only")
+                self.path = None
+        return self.conn
+
+    def _count(self, call_site: str, name: str, amount: float = 1):
+        counters = self.counters.get(call_site)
+        if counters is None:
+            counters = self.counters[call_site] = {"memory_hits": 0, "disk_hits": 0, "misses": 0,
+                                                   "saved_seconds": 0.0, "generation_seconds": 0.0}
+        counters[name] += amount
+
+    def get(self, key: str, call_site: str = "default") -> Optional[str]:
+        """Cached text for ``key`` if present and not expired"""
+        now = time.time()
+        text = self._memory_get(key, call_site, now)
+        return text if text is not None else self._disk_get(key, call_site, now)
+
+    async def aget(self, key: str, call_site: str = "default") -> Optional[str]:
+        """get() for the event loop; the SQLite file is read on a worker thread"""
+        now = time.time()
+        text = self._memory_get(key, call_site, now)
+        if text is not None or self.path is None:
+            return text if text is not None else self._disk_get(key, call_site, now)
+        return await asyncio.to_thread(self._disk_get, key, call_site, now)
+
+    def _memory_get(self, key: str, call_site: str, now: float) -> Optional[str]:
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is not None and entry[1] > now:
+                self.memory.move_to_end(key)
+                self._count(call_site, "memory_hits")
+                self._count(call_site, "saved_seconds", entry[2])
+                return entry[0]
+            if entry is not None:
+                del self.memory[key]
+        return None
+
+    def _disk_get(self, key: str, call_site: str, now: float) -> Optional[str]:
+        """Look a memory miss up in the SQLite file, counting the hit or miss"""
+        row = None
+        with self.disk_lock:
+            conn = self._db()
+            if conn is not None:
+                row = conn.execute("SELECT text, expires, seconds FROM responses WHERE key = ? AND expires > ?",
+                                   (key, now)).fetchone()
+                if row is not None:
+                    conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+        with self.lock:
+            if row is None:
+                self._count(call_site, "misses")
+                return None
+            self._remember(key, row)
+            self._count(call_site, "disk_hits")
+            self._count(call_site, "saved_seconds", row[2])
+        return row[0]
+
+    def put(self, key: str, text: str, ttl: float, seconds: float = 0.0):
+        """Store a response for ``ttl`` seconds; ``seconds`` is what generating it took"""
+        if ttl <= 0:
+            return
+        now = time.time()
+        with self.lock:
+            self._remember(key, (text, now + ttl, seconds))
+        self._disk_put(key, text, now, now + ttl, seconds)
+
+    async def aput(self, key: str, text: str, ttl: float, seconds: float = 0.0):
+        """put() for the event loop; the SQLite file is written on a worker thread"""
+        if ttl <= 0:
+            return
+        now = time.time()
+        with self.lock:
+            self._remember(key, (text, now + ttl, seconds))
+        if self.path is not None:
+            await asyncio.to_thread(self._disk_put, key, text, now, now + ttl, seconds)
+
+    def _disk_put(self, key: str, text: str, now: float, expires: float, seconds: float):
+        with self.disk_lock:
+            conn = self._db()
+            if conn is None:
+                return
+            size = len(text.encode())
+            previous = conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            conn.execute("INSERT OR REPLACE INTO responses (key, text, expires, accessed, seconds, size) "
+                         "VALUES (?, ?, ?, ?, ?, ?)", (key, text, expires, now, seconds, size))
+            self.disk_bytes += size - (previous[0] if previous else 0)
+            if self.disk_bytes > self.max_bytes:
+                self._trim(conn)
+
+    def _remember(self, key: str, entry: Tuple[str, float, float]):
+        self.memory[key] = entry
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+
+    def _trim(self, conn: sqlite3.Connection):
+        """Drop expired responses, then least recently used ones until the file is 90% of its limit"""
+        conn.execute("DELETE FROM responses WHERE expires <= ?", (time.time(),))
+        self.disk_bytes = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        target = self.max_bytes * 0.9
+        while self.disk_bytes > target:
+            rows = conn.execute("SELECT key, size FROM responses ORDER BY accessed LIMIT 256").fetchall()
+            if not rows:
+                break
+            conn.executemany("DELETE FROM responses WHERE key = ?", [(key,) for key, _ in rows])
+            self.disk_bytes -= sum(size for _, size in rows)
+
+    def discard(self, model, prompt: str, **params):
+        """Forget a cached response, e.g. one the caller could not parse"""
+        key = cache_key(model_name(model), prompt, params)
+        with self.lock:
+            self.memory.pop(key, None)
+        with self.disk_lock:
+            conn = self._db()
+            if conn is not None:
+                row = conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self.disk_bytes -= row[0]
+
+    def lookup(self, model, prompt: str, call_site: str, params: Dict[str, Any]) -> Tuple[str, float, Optional[str]]:
+        """Key, TTL and cached text (None on a miss) of a call"""
+        ttl = self.ttl(call_site)
+        key = cache_key(model_name(model), prompt, params)
+        return key, ttl, self.get(key, call_site) if ttl > 0 else None
+
+    async def alookup(self, model, prompt: str, call_site: str,
+                      params: Dict[str, Any]) -> Tuple[str, float, Optional[str]]:
+        """lookup() for the event loop"""
+        ttl = self.ttl(call_site)
+        key = cache_key(model_name(model), prompt, params)
+        return key, ttl, await self.aget(key, call_site) if ttl > 0 else None
+
+    def store(self, call_site: str, key: str, text: str, ttl: float, seconds: float):
+        """Cache a response under a key from lookup() and count its generation time"""
+        with self.lock:
+            self._count(call_site, "generation_seconds", seconds)
+        self.put(key, text, ttl, seconds)
+
+    async def astore(self, call_site: str, key: str, text: str, ttl: float, seconds: float):
+        """store() for the event loop"""
+        with self.lock:
+            self._count(call_site, "generation_seconds", seconds)
+        await self.aput(key, text, ttl, seconds)
+
+    def generate(self, model, prompt: str, call_site: str, **params) -> str:
+        """Text of ``model.generate_content(prompt, **params)``, from the cache when possible"""
+        key, ttl, text = self.lookup(model, prompt, call_site, params)
+        if text is not None:
+            return text
+        started = time.perf_counter()
+        text = model.generate_content(prompt, **params).text
+        self.store(call_site, key, text, ttl, time.perf_counter() - started)
+        return text
+
+    async def agenerate(self, model, prompt: str, call_site: str, **params) -> str:
+        """generate() using ``model.generate_content_async``, with the disk tier on a worker thread"""
+        key, ttl, text = await self.alookup(model, prompt, call_site, params)
+        if text is not None:
+            return text
+        started = time.perf_counter()
+        text = (await model.generate_content_async(prompt, **params)).text
+        await self.astore(call_site, key, text, ttl, time.perf_counter() - started)
+        return text
+
+    def stream(self, model, prompt: str, call_site: str, **params) -> Iterator[str]:
+        """Chunks of ``model.generate_content(prompt, stream=True)``; a cached response is replayed as one chunk
+
+        The response is stored only once the stream has finished.
+        """
+        key, ttl, text = self.lookup(model, prompt, call_site, params)
+        if text is not None:
+            yield text
+            return
+        # Only time spent waiting on the model counts, not time the consumer holds each chunk
+        seconds = 0.0
+        chunks = []
+        upstream = iter(model.generate_content(prompt, stream=True, **params))
+        while True:
+            started = time.perf_counter()
+            chunk = next(upstream, None)
+            seconds += time.perf_counter() - started
+            if chunk is None:
+                break
+            chunks.append(chunk.text)
+            yield chunk.text
+        self.store(call_site, key, "".join(chunks), ttl, seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit and miss counts and seconds of generation saved, overall and per call site"""
+        with self.lock:
+            sites = {site: dict(counters) for site, counters in self.counters.items()}
+            memory_entries = len(self.memory)
+        totals = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "saved_seconds": 0.0, "generation_seconds": 0.0}
+        for counters in sites.values():
+            for name, value in counters.items():
+                totals[name] += value
+        lookups = totals["memory_hits"] + totals["disk_hits"] + totals["misses"]
+        return {
+            **totals,
+            "hit_rate": (totals["memory_hits"] + totals["disk_hits"]) / lookups if lookups else 0.0,
+            "memory_entries": memory_entries,
+            "disk_bytes": self.disk_bytes,
+            "call_sites": sites
+        }
+
+    def close(self):
+        with self.disk_lock:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
+
+
+# Process-wide cache used by every agent and tool
+llm_cache = LLMCache()
@@ -0,0 +1,166 @@
+"""Process-wide registry of Gemini clients
+
+Agents and tools ask the registry for a model instead of constructing
+``genai.GenerativeModel`` on every call. The API key is configured once,
+each distinct model name and configuration is built once, and every model
+shares the SDK's service client and so its HTTP/gRPC connections. The
+model name comes from ``WELLNESS_LLM_MODEL``.
+
+``WELLNESS_LLM_PROVIDER`` picks where models come from: ``gemini`` (the
+default) or ``fake``, the offline stand-in in src/fake_llm.py for
+benchmarks and load tests. The Gemini SDK is only imported when it is
+used.
+"""
+import os
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from src.fake_llm import FakeProvider
+
+LLM_PROVIDER = os.getenv("WELLNESS_LLM_PROVIDER", "gemini")
+LLM_MODEL = os.getenv("WELLNESS_LLM_MODEL", "gemini-pro")
+# grpc (the SDK default) or rest
+LLM_TRANSPORT = os.getenv("WELLNESS_LLM_TRANSPORT", "")
+
+
+class ModelStats:
+    """Call counters for one model name"""
+
+    __slots__ = ("calls", "streams", "errors", "seconds")
+
+    def __init__(self):
+        self.calls = 0
+        self.streams = 0
+        self.errors = 0
+        self.seconds = 0.0
+
+
+class TrackedModel:
+    """A GenerativeModel that records calls, errors and latency in its ModelStats
+
+    Anything other than the generate methods is passed through.
+    """
+
+    def __init__(self, model, stats: ModelStats):
+        self.model = model
+        self.stats = stats
+
+    def __getattr__(self, name: str):
+        return getattr(self.model, name)
+
+    def generate_content(self, *args, **kwargs):
+        if kwargs.get("stream"):
+            return self._stream(*args, **kwargs)
+        started = time.perf_counter()
+        self.stats.calls += 1
+        try:
+            return self.model.generate_content(*args, **kwargs)
+        except Exception:
+            self.stats.errors += 1
+            raise
+        finally:
+            self.stats.seconds += time.perf_counter() - started
+
+    async def generate_content_async(self, *args, **kwargs):
+        started = time.perf_counter()
+        self.stats.calls += 1
+        try:
+            return await self.model.generate_content_async(*args, **kwargs)
+        except Exception:
+            self.stats.errors += 1
+            raise
+        finally:
+            self.stats.seconds += time.perf_counter() - started
+
+    def _stream(self, *args, **kwargs):
+        """Chunks of ``generate_content(..., stream=True)``; seconds count only the waits on the model"""
+        self.stats.streams += 1
+        started = time.perf_counter()
+        try:
+            upstream = iter(self.model.generate_content(*args, **kwargs))
+            while True:
+                chunk = next(upstream, None)
+                self.stats.seconds += time.perf_counter() - started
+                if chunk is None:
+                    return
+                yield chunk
+                started = time.perf_counter()
+        except Exception:
+            self.stats.errors += 1
+            raise
+
+
+class GeminiProvider:
+    """Models from the google-generativeai SDK, configured with ``GEMINI_API_KEY``"""
+
+    name = "gemini"
+
+    def __init__(self):
+        import google.generativeai as genai
+
+        options: Dict[str, Any] = {"api_key": os.getenv("GEMINI_API_KEY")}
+        if LLM_TRANSPORT:
+            options["transport"] = LLM_TRANSPORT
+        genai.configure(**options)
+        self.genai = genai
+
+    def model(self, model_name: str, **config):
+        return self.genai.GenerativeModel(model_name, **config)
+
+
+PROVIDERS = {"gemini": GeminiProvider, "fake": FakeProvider}
+
+
+class ClientRegistry:
+    """Builds each model once per name and configuration and hands out the same instance"""
+
+    def __init__(self, default_model: str = LLM_MODEL, provider: str = LLM_PROVIDER):
+        if provider not in PROVIDERS:
+            raise ValueError(f"Unknown LLM provider '{provider}'. Use one of: {', '.join(PROVIDERS)}")
+        self.default_model = default_model
+        self.provider_name = provider
+        self.provider = None
+        self.models: Dict[Tuple[str, str], TrackedModel] = {}
+        self.stats: Dict[str, ModelStats] = {}
+        self.lock = threading.Lock()
+
+    def get(self, model_name: Optional[str] = None, **config) -> TrackedModel:
+        """Shared model for ``model_name`` (default ``WELLNESS_LLM_MODEL``) and GenerativeModel options"""
+        model_name = model_name or self.default_model
+        key = (model_name, repr(sorted(config.items())))
+        model = self.models.get(key)
+        if model is None:
+            with self.lock:
+                model = self.models.get(key)
+                if model is None:
+                    if self.provider is None:
+                        self.provider = PROVIDERS[self.provider_name]()
+                    stats = self.stats.setdefault(model_name, ModelStats())
+                    model = self.models[key] = TrackedModel(self.provider.model(model_name, **config), stats)
+        return model
+
+    def pool_size(self) -> int:
+        """Distinct SDK service clients (sync and async), each holding its own connection pool, behind the shared models"""
+        clients = {id(client) for model in self.models.values()
+                   for client in (getattr(model.model, "_client", None), getattr(model.model, "_async_client", None))
+                   if client is not None}
+        return len(clients)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "provider": self.provider_name,
+            "models": len(self.models),
+            "pool_size": self.pool_size(),
+            "calls": {name: {"calls": stats.calls, "streams": stats.streams, "errors": stats.errors,
+                             "seconds": stats.seconds}
+                      for name, stats in self.stats.items()}
+        }
+
+
+registry = ClientRegistry()
+
+
+def get_model(model_name: Optional[str] = None, **config) -> TrackedModel:
+    """Shared client for a model from the process-wide registry"""
+    return registry.get(model_name, **config)
@@ -1,10 +1,13 @@
 from agent import WellnessAgent
 from context import UserSessionContext
 from utils.streaming import ResponseStreamer
+from src.stream_metrics import StreamStats
 import os
-import time
 from dotenv import load_dotenv
 
+# Print time to first token and tokens/sec after each response
+SHOW_STREAM_STATS = os.getenv('WELLNESS_SHOW_STREAM_STATS', '0') not in ('0', 'false', 'no')
+
 def main():
     """Main CLI entry point"""
     load_dotenv()
@@ -33,11 +36,15 @@ def main():
         
         print("\nAssistant: ", end='', flush=True)
         
-        # Stream the response
-        for chunk in ResponseStreamer.stream_response(user_input, context):
+        # Stream the response as the model produces it
+        stats = StreamStats()
+        for chunk in ResponseStreamer.stream_response(user_input, context, stats):
             print(chunk, end='', flush=True)
-            time.sleep(0.05)  # Simulate typing
         
+        if SHOW_STREAM_STATS:
+            summary = stats.as_dict()
+            print(f"\n[first token {summary['ttft_ms']}ms, {summary['tokens']} tokens "
+                  f"at {summary['tokens_per_second']} tokens/s]", end='')
         print("\n")
 
 if __name__ == "__main__":
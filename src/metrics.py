@@ -0,0 +1,127 @@
+import os
+import time
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Upper bounds of the latency histogram buckets in seconds (+Inf is implicit)
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Label for requests that did not match an API route, so unknown paths cannot add series
+UNMATCHED_ROUTE = "unmatched"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class RouteStats:
+    """Counters for one method and route template"""
+
+    __slots__ = ("statuses", "buckets", "total", "count")
+
+    def __init__(self):
+        self.statuses: Dict[int, int] = {}
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+
+class MetricsRegistry:
+    """Request counts, status codes, in-flight requests and latency histograms
+
+    Updates come only from the ASGI middleware, which runs on the event loop
+    thread, so the counters are plain ints and lists with no locks on the
+    request path. render() copies them with single C-level calls that the
+    GIL keeps consistent.
+    """
+
+    def __init__(self):
+        self.routes: Dict[Tuple[str, str], RouteStats] = {}
+        self.in_flight = 0
+
+    def observe(self, method: str, route: str, status: int, seconds: float):
+        stats = self.routes.get((method, route))
+        if stats is None:
+            stats = self.routes[(method, route)] = RouteStats()
+        stats.statuses[status] = stats.statuses.get(status, 0) + 1
+        stats.buckets[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        stats.total += seconds
+        stats.count += 1
+
+    def render(self) -> List[str]:
+        """Prometheus text exposition lines for the HTTP metrics"""
+        lines = [
+            "# HELP wellness_http_requests_total Requests handled, by route and status code.",
+            "# TYPE wellness_http_requests_total counter"
+        ]
+        routes = sorted(self.routes.items())
+        for (method, route), stats in routes:
+            for status, count in sorted(stats.statuses.items()):
+                lines.append(f'wellness_http_requests_total{{method="{method}",route="{route}",status="{status}"}} {count}')
+        lines += [
+            "# HELP wellness_http_requests_in_flight Requests currently being handled.",
+            "# TYPE wellness_http_requests_in_flight gauge",
+            f"wellness_http_requests_in_flight {self.in_flight}",
+            "# HELP wellness_http_request_duration_seconds Time from request start to the last response byte.",
+            "# TYPE wellness_http_request_duration_seconds histogram"
+        ]
+        for (method, route), stats in routes:
+            labels = f'method="{method}",route="{route}"'
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS + ("+Inf",), stats.buckets):
+                cumulative += count
+                lines.append(f'wellness_http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f"wellness_http_request_duration_seconds_sum{{{labels}}} {stats.total:.6f}")
+            lines.append(f"wellness_http_request_duration_seconds_count{{{labels}}} {stats.count}")
+        return lines
+
+
+class MetricsMiddleware:
+    """ASGI middleware feeding a MetricsRegistry
+
+    Requests are labelled with the route template (``/users/{user_id}``)
+    that FastAPI stores in the scope, not the raw path.
+    """
+
+    def __init__(self, app, registry: MetricsRegistry):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        self.registry.in_flight += 1
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.registry.in_flight -= 1
+            route = scope.get("route")
+            self.registry.observe(scope["method"], getattr(route, "path", UNMATCHED_ROUTE),
+                                  status, time.perf_counter() - start)
+
+
+def metric(name: str, kind: str, help_text: str, values: Iterable[Tuple[Optional[str], float]]) -> List[str]:
+    """Exposition lines for a gauge or counter; each value is ``(labels or None, number)``"""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+    for labels, value in values:
+        lines.append(f"{name}{{{labels}}} {value}" if labels else f"{name} {value}")
+    return lines
+
+
+def resident_memory_bytes() -> int:
+    """Current RSS of this process (peak RSS where /proc is unavailable)"""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource
+
+        # ru_maxrss is kilobytes on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if os.uname().sysname == "Darwin" else peak * 1024
@@ -0,0 +1,54 @@
+import base64
+import json
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(position: Any) -> str:
+    """Wrap a storage position in an opaque URL-safe cursor"""
+    raw = json.dumps(position, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def is_position(position: Any) -> bool:
+    """Whether a decoded cursor has the shape of a storage position
+
+    Positions are an integer offset into a user's records or a
+    ``[timestamp, id]`` pair whose id is a string or an integer sequence.
+    """
+    if type(position) is int:
+        return True
+    return (type(position) is list and len(position) == 2 and type(position[0]) is int
+            and type(position[1]) in (int, str))
+
+
+def decode_cursor(cursor: Optional[str]) -> Any:
+    """Recover the storage position from a cursor; raises ValueError if malformed"""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        position = json.loads(raw)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if not is_position(position):
+        raise ValueError("Invalid cursor")
+    return position
+
+
+def parse_fields(fields: Optional[str]) -> Optional[Tuple[str, ...]]:
+    """Turn a ``fields=a,b`` parameter into a tuple of keys; the id is always kept"""
+    if not fields:
+        return None
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    return ("id",) + tuple(name for name in names if name != "id")
+
+
+def project(records: Iterable[Dict[str, Any]], fields: Optional[Tuple[str, ...]]) -> List[Dict[str, Any]]:
+    """Keep only the requested keys of each record"""
+    if fields is None:
+        return list(records)
+    return [{name: record[name] for name in fields if name in record} for record in records]
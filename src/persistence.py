@@ -0,0 +1,333 @@
+import json
+import mmap
+import os
+import re
+import struct
+import threading
+import zlib
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from src.timeseries import SERIES_FIELDS, BiofeedbackSeries, IdColumn
+
+try:
+    import orjson
+
+    def dumps(value: Any) -> bytes:
+        return orjson.dumps(value)
+
+    loads = orjson.loads
+except ImportError:  # orjson is optional; fall back to the stdlib encoder
+    def dumps(value: Any) -> bytes:
+        return json.dumps(value, separators=(",", ":"), default=str).encode()
+
+    loads = json.loads
+
+# WAL frame: payload length and CRC32, then [lsn, collection, [[id, record], ...]]
+FRAME_HEADER = struct.Struct("<II")
+SNAPSHOT_MAGIC = b"WLNSNAP1"
+SNAPSHOT_HEADER = struct.Struct("<Q")
+SEGMENT_PATTERN = re.compile(r"^wal-(\d{20})\.log$")
+SNAPSHOT_PATTERN = re.compile(r"^snapshot-(\d{20})\.snap$")
+
+
+def _fsync_dir(directory: str):
+    """Make renames and new files in a directory durable"""
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def list_files(directory: str, pattern: re.Pattern) -> List[Tuple[int, str]]:
+    """Return ``(lsn, path)`` for files named with an LSN, oldest first"""
+    found = []
+    for name in os.listdir(directory):
+        match = pattern.match(name)
+        if match:
+            found.append((int(match.group(1)), os.path.join(directory, name)))
+    return sorted(found)
+
+
+class WriteAheadLog:
+    """Append-only log of store mutations with group commit
+
+    Writers append a frame to an in-memory buffer and get back a log
+    sequence number (LSN). A background thread writes everything buffered
+    so far with one write and one fsync, so concurrent writers share the
+    cost of a sync. ``wait(lsn)`` blocks until that LSN is on disk.
+    The log is split into segments named after their first LSN so segments
+    covered by a snapshot can be deleted.
+    """
+
+    def __init__(self, directory: str, next_lsn: int = 1, commit_delay: float = 0.0):
+        self.directory = directory
+        self.commit_delay = commit_delay
+        self.next_lsn = next_lsn
+        self.durable_lsn = next_lsn - 1
+        self.segment_bytes = 0
+        self.buffer = bytearray()
+        self.cond = threading.Condition()
+        self.io_lock = threading.Lock()
+        self.file = self._open_segment(next_lsn)
+        self._closed = False
+        self._writer = threading.Thread(target=self._write_loop, name="wal-writer", daemon=True)
+        self._writer.start()
+
+    def _open_segment(self, first_lsn: int):
+        path = os.path.join(self.directory, f"wal-{first_lsn:020d}.log")
+        segment = open(path, "ab", buffering=0)
+        _fsync_dir(self.directory)
+        return segment
+
+    def append(self, collection: str, rows: List[Tuple[str, Dict[str, Any]]]) -> int:
+        """Buffer one mutation and return its LSN"""
+        with self.cond:
+            lsn = self.next_lsn
+            self.next_lsn += 1
+            payload = dumps([lsn, collection, rows])
+            self.buffer += FRAME_HEADER.pack(len(payload), zlib.crc32(payload))
+            self.buffer += payload
+            self.segment_bytes += FRAME_HEADER.size + len(payload)
+            self.cond.notify_all()
+        return lsn
+
+    def wait(self, lsn: int):
+        """Block until ``lsn`` has been written and synced"""
+        with self.cond:
+            while self.durable_lsn < lsn and not self._closed:
+                self.cond.wait()
+
+    def _write_pending(self):
+        """Write and sync whatever is buffered; callers hold io_lock"""
+        with self.cond:
+            if not self.buffer:
+                return
+            data = bytes(self.buffer)
+            self.buffer.clear()
+            last_lsn = self.next_lsn - 1
+        self.file.write(data)
+        os.fsync(self.file.fileno())
+        with self.cond:
+            self.durable_lsn = last_lsn
+            self.cond.notify_all()
+
+    def _write_loop(self):
+        while True:
+            with self.cond:
+                while not self.buffer and not self._closed:
+                    self.cond.wait()
+                if self._closed:
+                    return
+            if self.commit_delay:
+                # Let more writers join this group before syncing
+                threading.Event().wait(self.commit_delay)
+            with self.io_lock:
+                self._write_pending()
+
+    def rotate(self) -> int:
+        """Start a new segment and return the last LSN in the previous ones
+
+        Callers must stop appends while rotating so the returned LSN matches
+        the state they are about to snapshot.
+        """
+        with self.io_lock:
+            self._write_pending()
+            with self.cond:
+                last_lsn = self.next_lsn - 1
+                previous, self.file = self.file, self._open_segment(self.next_lsn)
+                self.segment_bytes = 0
+        previous.close()
+        return last_lsn
+
+    def prune(self, upto_lsn: int):
+        """Delete segments whose entries are all covered by a snapshot at ``upto_lsn``"""
+        segments = list_files(self.directory, SEGMENT_PATTERN)
+        for (first_lsn, path), following in zip(segments, segments[1:]):
+            if following[0] - 1 <= upto_lsn:
+                os.remove(path)
+
+    def close(self):
+        """Write outstanding frames and stop the writer thread"""
+        with self.io_lock:
+            self._write_pending()
+            with self.cond:
+                self._closed = True
+                self.cond.notify_all()
+        self._writer.join()
+        self.file.close()
+
+
+def _frames(data: bytes) -> Iterator[Tuple[int, bytes]]:
+    """Yield ``(end offset, payload)`` for each frame, stopping at the first torn or corrupt one"""
+    offset = 0
+    while offset + FRAME_HEADER.size <= len(data):
+        length, checksum = FRAME_HEADER.unpack_from(data, offset)
+        payload = data[offset + FRAME_HEADER.size:offset + FRAME_HEADER.size + length]
+        if len(payload) < length or zlib.crc32(payload) != checksum:
+            return
+        offset += FRAME_HEADER.size + length
+        yield offset, payload
+
+
+def read_log(directory: str, after_lsn: int = 0) -> Iterator[Tuple[int, str, List]]:
+    """Yield ``(lsn, collection, rows)`` for log entries newer than ``after_lsn``
+
+    Reading a segment stops at the first torn or corrupt frame, which can
+    only be the tail of a write interrupted by a crash.
+    """
+    for _, path in list_files(directory, SEGMENT_PATTERN):
+        with open(path, "rb") as segment:
+            data = segment.read()
+        for _, payload in _frames(data):
+            lsn, collection, rows = loads(payload)
+            if lsn > after_lsn:
+                yield lsn, collection, rows
+
+
+def repair_log(directory: str) -> int:
+    """Cut each segment back to its last intact frame and return the bytes dropped
+
+    Run before reopening the log after a crash: frames appended after a
+    torn tail would otherwise be unreadable, as read_log stops at the tear.
+    """
+    dropped = 0
+    for _, path in list_files(directory, SEGMENT_PATTERN):
+        with open(path, "r+b") as segment:
+            data = segment.read()
+            end = 0
+            for end, _ in _frames(data):
+                pass
+            if end < len(data):
+                segment.truncate(end)
+                os.fsync(segment.fileno())
+                dropped += len(data) - end
+    return dropped
+
+
+def capture_series(series: BiofeedbackSeries) -> Dict[str, Any]:
+    """Copy a series' arrays so it can be written while writers continue"""
+    return {
+        "user_id": series.user_id,
+        "timestamps": series.timestamps.tobytes(),
+        "count": len(series.ids),
+        "ids": series.ids.packed[:] if series.ids.strings is None else list(series.ids.strings),
+        "columns": {field: series.columns[field].tobytes() for field in SERIES_FIELDS},
+        "extras": dict(series.extras),
+        "rollups": {
+            name: {"starts": rollup.starts.tobytes(),
+                   "values": {key: column.tobytes() for key, column in rollup.values.items()}}
+            for name, rollup in series.rollups.items() if len(rollup)
+        }
+    }
+
+
+def write_snapshot(directory: str, lsn: int, documents: Dict[str, Dict[str, Dict]],
+                   series: List[Dict[str, Any]]) -> str:
+    """Write a snapshot of the store as of ``lsn`` and return its path
+
+    Layout: magic, header length, JSON header, then raw sections. Document
+    collections are one JSON section; each biofeedback series stores its
+    timestamp, field and rollup arrays as native binary so loading is a copy out of
+    the mapped file. The file is written under a temporary name and renamed
+    into place once synced, so a crash never leaves a partial snapshot.
+    """
+    sections: List[bytes] = []
+    offset = 0
+
+    def add(data: bytes) -> List[int]:
+        nonlocal offset
+        sections.append(data)
+        offset += len(data)
+        return [offset - len(data), len(data)]
+
+    header = {"lsn": lsn, "documents": add(dumps(documents)), "series": []}
+    for item in series:
+        entry = {
+            "user_id": item["user_id"],
+            "count": item["count"],
+            "timestamps": add(item["timestamps"]),
+            "columns": {field: add(data) for field, data in item["columns"].items()}
+        }
+        # Packed UUIDs are stored as is; other ids are newline-separated text
+        if isinstance(item["ids"], list):
+            entry["ids"] = add("\n".join(item["ids"]).encode())
+        else:
+            entry["packed_ids"] = add(bytes(item["ids"]))
+        if item["extras"]:
+            entry["extras"] = add(dumps(item["extras"]))
+        if item["rollups"]:
+            entry["rollups"] = {
+                name: {"starts": add(rollup["starts"]),
+                       "values": {key: add(data) for key, data in rollup["values"].items()}}
+                for name, rollup in item["rollups"].items()
+            }
+        header["series"].append(entry)
+
+    encoded = dumps(header)
+    path = os.path.join(directory, f"snapshot-{lsn:020d}.snap")
+    temp = path + ".tmp"
+    with open(temp, "wb") as out:
+        out.write(SNAPSHOT_MAGIC + SNAPSHOT_HEADER.pack(len(encoded)) + encoded)
+        for data in sections:
+            out.write(data)
+        out.flush()
+        os.fsync(out.fileno())
+    os.replace(temp, path)
+    _fsync_dir(directory)
+    return path
+
+
+def read_snapshot(path: str) -> Tuple[int, Dict[str, Dict[str, Dict]], List[BiofeedbackSeries]]:
+    """Load a snapshot through a memory map; returns ``(lsn, documents, series)``"""
+    with open(path, "rb") as snapshot:
+        mapped = mmap.mmap(snapshot.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        if mapped[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+            raise ValueError(f"{path} is not a snapshot file")
+        (header_length,) = SNAPSHOT_HEADER.unpack_from(mapped, len(SNAPSHOT_MAGIC))
+        start = len(SNAPSHOT_MAGIC) + SNAPSHOT_HEADER.size
+        header = loads(mapped[start:start + header_length])
+        base = start + header_length
+
+        with memoryview(mapped) as view:
+            def section(bounds: List[int]) -> memoryview:
+                return view[base + bounds[0]:base + bounds[0] + bounds[1]]
+
+            documents = loads(section(header["documents"]).tobytes())
+            loaded = []
+            for entry in header["series"]:
+                series = BiofeedbackSeries(entry["user_id"])
+                series.timestamps.frombytes(section(entry["timestamps"]))
+                for field in SERIES_FIELDS:
+                    series.columns[field].frombytes(section(entry["columns"][field]))
+                if "packed_ids" in entry:
+                    series.ids.packed[:] = section(entry["packed_ids"])
+                elif entry["count"]:
+                    series.ids = IdColumn(section(entry["ids"]).tobytes().decode().split("\n"))
+                if "extras" in entry:
+                    series.extras = loads(section(entry["extras"]).tobytes())
+                for name, rollup in entry.get("rollups", {}).items():
+                    series.rollups[name].starts.frombytes(section(rollup["starts"]))
+                    for key, bounds in rollup["values"].items():
+                        series.rollups[name].values[key].frombytes(section(bounds))
+                loaded.append(series)
+    finally:
+        mapped.close()
+    return header["lsn"], documents, loaded
+
+
+def latest_snapshot(directory: str) -> Optional[str]:
+    """Path of the newest snapshot in ``directory``, if any"""
+    snapshots = list_files(directory, SNAPSHOT_PATTERN)
+    return snapshots[-1][1] if snapshots else None
+
+
+def prune_snapshots(directory: str, keep_path: str):
+    """Delete snapshots older than ``keep_path`` and leftover temporary files"""
+    for _, path in list_files(directory, SNAPSHOT_PATTERN):
+        if path != keep_path:
+            os.remove(path)
+    for name in os.listdir(directory):
+        if name.endswith(".snap.tmp"):
+            os.remove(os.path.join(directory, name))
@@ -0,0 +1,112 @@
+import asyncio
+import os
+import threading
+from collections import deque
+from typing import Any, Dict, List, Optional, Set
+
+# Readings buffered per subscriber before the oldest are dropped
+STREAM_MAX_PENDING = int(os.getenv("WELLNESS_STREAM_MAX_PENDING", "1000"))
+
+
+class Subscription:
+    """One subscriber's buffer of readings not yet sent"""
+
+    def __init__(self, user_id: str, windows: str, max_pending: int):
+        self.user_id = user_id
+        self.windows = windows
+        self.pending = deque(maxlen=max_pending)
+        self.stats: Optional[Dict[str, Any]] = None
+        self.dropped = 0
+        self.ready = False
+        self.waiter: Optional[asyncio.Future] = None
+
+    def wake(self):
+        """Mark new data available and resume a waiting next_batch()"""
+        self.ready = True
+        if self.waiter is not None and not self.waiter.done():
+            self.waiter.set_result(True)
+
+    async def next_batch(self, timeout: float) -> Optional[Dict[str, Any]]:
+        """Wait for new readings and return everything buffered, or None on timeout"""
+        if not self.ready:
+            # A bare future with a timer avoids the task wait_for() creates per call
+            loop = asyncio.get_running_loop()
+            self.waiter = loop.create_future()
+            timer = loop.call_later(timeout, lambda waiter: waiter.done() or waiter.set_result(False), self.waiter)
+            try:
+                await self.waiter
+            finally:
+                timer.cancel()
+                self.waiter = None
+            if not self.ready:
+                return None
+        self.ready = False
+        batch = {"readings": list(self.pending), "stats": self.stats}
+        self.pending.clear()
+        if self.dropped:
+            batch["dropped"] = self.dropped
+            self.dropped = 0
+        return batch
+
+
+class Broker:
+    """In-process fan-out of new biofeedback to live subscribers
+
+    Publishing schedules one callback on the event loop per batch of
+    readings. That callback appends the batch to each subscriber's buffer
+    and wakes it, so the cost is a list extend per subscriber rather
+    than a task or queue put per reading. A subscriber that falls behind
+    keeps only the newest ``max_pending`` readings and is told how many it
+    missed.
+    """
+
+    def __init__(self, max_pending: int = STREAM_MAX_PENDING):
+        self.max_pending = max_pending
+        self.subscribers: Dict[str, Set[Subscription]] = {}
+        self.lock = threading.Lock()
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def bind(self, loop: asyncio.AbstractEventLoop):
+        """Deliver on ``loop``; call once from the app's startup"""
+        self.loop = loop
+
+    def subscribe(self, user_id: str, windows: str) -> Subscription:
+        subscription = Subscription(user_id, windows, self.max_pending)
+        with self.lock:
+            self.subscribers.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self.lock:
+            subscribers = self.subscribers.get(subscription.user_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self.subscribers[subscription.user_id]
+
+    def windows_for(self, user_id: str) -> Set[str]:
+        """Distinct stats windows requested by a user's subscribers; empty if nobody listens"""
+        with self.lock:
+            return {subscription.windows for subscription in self.subscribers.get(user_id, ())}
+
+    def publish(self, user_id: str, readings: List[Dict[str, Any]], stats: Dict[str, Any]):
+        """Hand readings and stats (keyed by windows) to a user's subscribers; safe from any thread"""
+        if self.loop is None or user_id not in self.subscribers:
+            return
+        self.loop.call_soon_threadsafe(self._deliver, user_id, readings, stats)
+
+    def _deliver(self, user_id: str, readings: List[Dict[str, Any]], stats: Dict[str, Any]):
+        with self.lock:
+            subscribers = list(self.subscribers.get(user_id, ()))
+        for subscription in subscribers:
+            overflow = len(subscription.pending) + len(readings) - self.max_pending
+            if overflow > 0:
+                subscription.dropped += overflow
+            subscription.pending.extend(readings)
+            subscription.stats = stats.get(subscription.windows, subscription.stats)
+            subscription.wake()
+
+    def count(self) -> int:
+        """Number of open subscriptions"""
+        with self.lock:
+            return sum(len(subscribers) for subscribers in self.subscribers.values())
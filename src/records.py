@@ -0,0 +1,134 @@
+"""Compact stored forms of user, goal, meal plan and workout documents
+
+The in-memory engines keep each document as a slotted object instead of a
+dict: no per-record hash table or repeated key strings, timestamps as
+epoch microseconds instead of ISO strings, and enum values and user ids
+interned so every record shares one string object. Documents are turned
+back into the exact dicts that were stored only when they are read.
+"""
+import sys
+from enum import Enum
+from functools import lru_cache
+from operator import attrgetter
+from typing import Any, Dict, Optional, Tuple, Union
+
+from src.timeseries import from_epoch_us, to_epoch_us
+
+
+@lru_cache(maxsize=4096)
+def _packed_timestamp(value: str) -> Optional[int]:
+    """Epoch microseconds of an ISO timestamp, or None if it would not format back identically
+
+    Cached because a batch of records usually shares one creation time.
+    """
+    try:
+        us = to_epoch_us(value)
+    except ValueError:
+        return None
+    return us if from_epoch_us(us) == value else None
+
+
+class Record:
+    """Base of the stored document types
+
+    ``FIELDS`` lists the keys in the order the API builds them. A document
+    with other keys, another key order or timestamps that would not
+    round-trip exactly is stored as the original dict instead.
+    """
+
+    __slots__ = ()
+    FIELDS: Tuple[str, ...] = ()
+    TIMESTAMPS: Tuple[str, ...] = ()
+    INTERNED: Tuple[str, ...] = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.values = attrgetter(*cls.FIELDS)
+        cls.timestamp_positions = [cls.FIELDS.index(name) for name in cls.TIMESTAMPS]
+        cls.interned_positions = [cls.FIELDS.index(name) for name in cls.INTERNED]
+
+    @classmethod
+    def pack(cls, record: Dict[str, Any]) -> Union["Record", Dict[str, Any]]:
+        if tuple(record) != cls.FIELDS:
+            return record
+        values = list(record.values())
+        for i in cls.timestamp_positions:
+            us = _packed_timestamp(values[i]) if type(values[i]) is str else None
+            if us is None:
+                return record
+            values[i] = us
+        for i in cls.interned_positions:
+            value = values[i]
+            if isinstance(value, Enum):
+                value = value.value
+            values[i] = sys.intern(value) if type(value) is str else value
+        packed = cls.__new__(cls)
+        for name, value in zip(cls.FIELDS, values):
+            setattr(packed, name, value)
+        return packed
+
+    def to_dict(self) -> Dict[str, Any]:
+        record = dict(zip(self.FIELDS, self.values(self)))
+        for name in self.TIMESTAMPS:
+            record[name] = from_epoch_us(record[name])
+        return record
+
+
+class UserRecord(Record):
+    __slots__ = FIELDS = ("name", "email", "is_premium", "coach_preference", "diet_preference",
+                          "id", "created_at", "updated_at")
+    TIMESTAMPS = ("created_at", "updated_at")
+    INTERNED = ("coach_preference", "diet_preference")
+
+
+class GoalRecord(Record):
+    __slots__ = FIELDS = ("user_id", "description", "target", "timeframe", "id", "created_at",
+                          "type", "recommendation", "plan")
+    TIMESTAMPS = ("created_at",)
+    INTERNED = ("user_id", "target", "timeframe", "type", "recommendation", "plan")
+
+
+class MealPlanRecord(Record):
+    __slots__ = FIELDS = ("user_id", "plan", "diet_type", "id", "created_at")
+    TIMESTAMPS = ("created_at",)
+    INTERNED = ("user_id", "diet_type")
+
+
+class WorkoutRecord(Record):
+    __slots__ = FIELDS = ("user_id", "exercises", "goal_type", "id", "created_at")
+    TIMESTAMPS = ("created_at",)
+    INTERNED = ("user_id", "goal_type")
+
+
+RECORD_TYPES = {
+    "users": UserRecord,
+    "goals": GoalRecord,
+    "meal_plans": MealPlanRecord,
+    "workouts": WorkoutRecord
+}
+
+
+def pack(collection: str, record: Dict[str, Any]) -> Union[Record, Dict[str, Any]]:
+    """Stored form of a document"""
+    return RECORD_TYPES[collection].pack(record)
+
+
+def unpack(record: Union[Record, Dict[str, Any]]) -> Dict[str, Any]:
+    """API dict of a stored document"""
+    return record if type(record) is dict else record.to_dict()
+
+
+def get_field(record: Union[Record, Dict[str, Any]], name: str) -> Any:
+    """One field of a stored document as it was given; None when absent"""
+    if type(record) is dict:
+        return record.get(name)
+    value = getattr(record, name)
+    return from_epoch_us(value) if name in record.TIMESTAMPS else value
+
+
+def epoch_us(record: Union[Record, Dict[str, Any]], name: str):
+    """A timestamp field of a stored document in epoch microseconds; None when absent"""
+    if type(record) is not dict and name in record.TIMESTAMPS:
+        return getattr(record, name)
+    value = get_field(record, name)
+    return None if value is None else to_epoch_us(value)
@@ -0,0 +1,26 @@
+import os
+from typing import Any, Dict, Optional
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the stdlib encoder
+    orjson = None
+
+# "orjson" (default when installed) or "json"
+JSON_ENCODER = os.getenv("WELLNESS_JSON_ENCODER", "orjson" if orjson else "json")
+
+if JSON_ENCODER == "orjson" and orjson is None:
+    raise RuntimeError("WELLNESS_JSON_ENCODER=orjson but the orjson package is not installed")
+
+JSON_RESPONSE_CLASS = ORJSONResponse if JSON_ENCODER == "orjson" else JSONResponse
+
+
+def json_response(content: Any, status_code: int = 200, headers: Optional[Dict[str, str]] = None) -> JSONResponse:
+    """Serialize trusted handler output straight to a response
+
+    Returning a Response skips FastAPI's response_model validation and
+    jsonable_encoder pass, so only use it for data the API built itself.
+    """
+    return JSON_RESPONSE_CLASS(content, status_code=status_code, headers=headers)
@@ -0,0 +1,150 @@
+"""Retention policies and background compaction
+
+``WELLNESS_RETENTION`` lists how long each collection keeps full-resolution
+records, e.g. ``biofeedback=30d,goals=365d``. Biofeedback readings older
+than that are rolled into hourly aggregates, hourly buckets older than
+``WELLNESS_HOURLY_RETENTION`` into daily ones, and daily buckets older than
+``WELLNESS_DAILY_RETENTION`` are dropped ("forever" keeps a tier). Other
+listed collections simply have their old records deleted. Nothing is
+compacted or deleted unless a retention is configured.
+"""
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from src.storage import check_evictable
+from src.timeseries import parse_duration, to_epoch_us
+
+RETENTION = os.getenv("WELLNESS_RETENTION", "")
+HOURLY_RETENTION = os.getenv("WELLNESS_HOURLY_RETENTION", "180d")
+DAILY_RETENTION = os.getenv("WELLNESS_DAILY_RETENTION", "730d")
+COMPACTION_INTERVAL = float(os.getenv("WELLNESS_COMPACTION_INTERVAL", "60"))
+# Work is done in small steps so writers and readers never wait long on the store lock
+COMPACTION_BATCH_USERS = int(os.getenv("WELLNESS_COMPACTION_BATCH_USERS", "64"))
+COMPACTION_MAX_ROWS = int(os.getenv("WELLNESS_COMPACTION_MAX_ROWS", "10000"))
+COMPACTION_PAUSE = float(os.getenv("WELLNESS_COMPACTION_PAUSE", "0.005"))
+
+logger = logging.getLogger(__name__)
+
+
+def parse_retention(text: str) -> Dict[str, int]:
+    """Parse ``collection=duration`` pairs into collection -> microseconds"""
+    retention = {}
+    for item in text.split(","):
+        if not item.strip():
+            continue
+        collection, _, duration = item.partition("=")
+        collection = collection.strip()
+        if collection != "biofeedback":
+            check_evictable(collection)
+        retention[collection] = parse_duration(duration)
+    return retention
+
+
+def parse_tier(text: str) -> Optional[int]:
+    """Retention of a rollup tier in microseconds; empty or 'forever' keeps it indefinitely"""
+    if not text.strip() or text.strip() == "forever":
+        return None
+    return parse_duration(text)
+
+
+class Compactor:
+    """Applies the retention policy from a background thread
+
+    Each pass walks the users with biofeedback in batches of
+    ``batch_users``, rolling up at most ``max_rows`` readings per user per
+    step and pausing between batches. Users with a larger backlog are
+    revisited until they are caught up, and expired documents are deleted
+    ``max_rows`` at a time. The event loop never runs compaction itself.
+    Without an explicit ``retention`` the policy comes from the environment.
+    """
+
+    def __init__(self, retention: Optional[Dict[str, int]] = None, hourly_us: Optional[int] = None,
+                 daily_us: Optional[int] = None, interval: float = COMPACTION_INTERVAL,
+                 batch_users: int = COMPACTION_BATCH_USERS, max_rows: int = COMPACTION_MAX_ROWS,
+                 pause: float = COMPACTION_PAUSE, on_compacted: Optional[Callable[[str], Any]] = None):
+        self.retention = retention if retention is not None else parse_retention(RETENTION)
+        self.raw_us = self.retention.get("biofeedback")
+        self.hourly_us = hourly_us if retention is not None else parse_tier(HOURLY_RETENTION)
+        self.daily_us = daily_us if retention is not None else parse_tier(DAILY_RETENTION)
+        tiers = [us for us in (self.raw_us, self.hourly_us, self.daily_us) if us is not None]
+        if tiers != sorted(tiers):
+            raise ValueError("Retention must grow from raw readings to hourly to daily rollups")
+        self.interval = interval
+        self.batch_users = batch_users
+        self.max_rows = max_rows
+        self.pause = pause
+        self.on_compacted = on_compacted
+        self.stopping = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+        self.totals = {"passes": 0, "rolled_up": 0, "merged_hours": 0, "evicted_buckets": 0, "evicted_records": 0}
+        self.last_pass_seconds = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.retention)
+
+    def start(self, store):
+        """Run a pass every ``interval`` seconds until stop(); does nothing without a policy"""
+        if not self.enabled or self.thread is not None:
+            return
+        self.stopping.clear()
+        self.thread = threading.Thread(target=self._loop, args=(store,), name="wellness-compactor", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopping.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def _loop(self, store):
+        while not self.stopping.is_set():
+            try:
+                self.run_once(store)
+            except Exception:
+                logger.exception("Compaction pass failed")
+            self.stopping.wait(self.interval)
+
+    def run_once(self, store, now_us: Optional[int] = None) -> Dict[str, int]:
+        """One full pass over the store; returns what it changed"""
+        started = time.perf_counter()
+        now_us = to_epoch_us(datetime.now()) if now_us is None else now_us
+        cutoffs = [None if us is None else now_us - us for us in (self.raw_us, self.hourly_us, self.daily_us)]
+        changes = {"rolled_up": 0, "merged_hours": 0, "evicted_buckets": 0, "evicted_records": 0}
+        if self.raw_us is not None:
+            self._compact_users(store, store.biofeedback_users(), cutoffs, changes)
+        for collection, retention_us in self.retention.items():
+            if collection != "biofeedback":
+                self._evict(store, collection, now_us - retention_us, changes)
+        for key, value in changes.items():
+            self.totals[key] += value
+        self.totals["passes"] += 1
+        self.last_pass_seconds = time.perf_counter() - started
+        return changes
+
+    def _compact_users(self, store, pending: List[str], cutoffs: List[Optional[int]], changes: Dict[str, int]):
+        while pending and not self.stopping.is_set():
+            backlog = []
+            for start in range(0, len(pending), self.batch_users):
+                for user_id in pending[start:start + self.batch_users]:
+                    result = store.compact_biofeedback(user_id, *cutoffs, max_rows=self.max_rows)
+                    for key, value in result.items():
+                        changes[key] += value
+                    if any(result.values()) and self.on_compacted is not None:
+                        self.on_compacted(user_id)
+                    if result["rolled_up"] >= self.max_rows:
+                        backlog.append(user_id)
+                if self.stopping.wait(self.pause):
+                    return
+            pending = backlog
+
+    def _evict(self, store, collection: str, cutoff_us: int, changes: Dict[str, int]):
+        while not self.stopping.is_set():
+            evicted = store.evict_before(collection, cutoff_us, self.max_rows)
+            changes["evicted_records"] += evicted
+            if evicted < self.max_rows or self.stopping.wait(self.pause):
+                return
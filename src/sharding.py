@@ -0,0 +1,430 @@
+"""User-sharded multi-process mode for the backend
+
+Run ``python -m src.sharding --workers 4 --port 8000`` to start one backend
+process per shard plus a dispatcher on the public port. Every user id is
+owned by exactly one shard (``shard_for``), so each worker keeps its own
+shared-nothing store and per-user reads and writes stay consistent. New
+users are routed by email, and the owning worker picks a user id that
+hashes back to itself, which also keeps email uniqueness shard-local.
+Changing the number of shards changes ownership, so keep it fixed for a
+given data directory. Each shard keeps its storage files apart by adding
+its index to ``WELLNESS_SQLITE_PATH`` or ``WELLNESS_DATA_DIR``
+(``store_options``). The dispatcher answers ``/metrics`` itself with every
+shard's metrics, each sample labelled with its ``shard``.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import sys
+import tempfile
+import uuid
+import zlib
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+# Add project root to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import httpx
+import uvicorn
+
+from src.persistence import dumps, loads
+from src.storage import DATA_DIR, SQLITE_PATH, STORAGE_ENGINE, generate_ids
+
+SHARD_COUNT = int(os.getenv("WELLNESS_SHARD_COUNT", "1"))
+SHARD_INDEX = int(os.getenv("WELLNESS_SHARD_INDEX", "0"))
+
+# Path prefixes whose next segment is the user id
+USER_PATH_PREFIXES = ("/users/", "/goals/user/", "/meal-plans/user/", "/workouts/user/", "/biofeedback/user/")
+# Create endpoints that carry the user id in the JSON body
+USER_BODY_PATHS = {"/goals/", "/meal-plans/", "/workouts/", "/biofeedback/"}
+# Bulk create endpoints taking a JSON array of items routed like their single-item create
+BULK_CREATE_PATHS = {"/users/bulk", "/goals/bulk", "/meal-plans/bulk", "/workouts/bulk"}
+HOP_BY_HOP_HEADERS = {b"host", b"content-length", b"connection", b"keep-alive", b"transfer-encoding", b"upgrade"}
+
+
+def shard_for(key: str, count: int = SHARD_COUNT) -> int:
+    """Owner shard of a user id or email; stable across processes"""
+    return zlib.crc32(key.encode()) % count if count > 1 else 0
+
+
+def new_user_id() -> str:
+    """A random user id owned by this process's shard"""
+    while True:
+        user_id = str(uuid.uuid4())
+        if shard_for(user_id) == SHARD_INDEX:
+            return user_id
+
+
+def new_user_ids(count: int) -> List[str]:
+    """``count`` random user ids owned by this process's shard"""
+    if SHARD_COUNT <= 1:
+        return generate_ids(count)
+    ids: List[str] = []
+    while len(ids) < count:
+        ids += [user_id for user_id in generate_ids((count - len(ids)) * SHARD_COUNT)
+                if shard_for(user_id) == SHARD_INDEX]
+    return ids[:count]
+
+
+def shard_path(path: str, index: int) -> str:
+    """Per-shard variant of a storage path, e.g. wellness.db -> wellness.shard2.db"""
+    root, ext = os.path.splitext(path)
+    return f"{root}.shard{index}{ext}"
+
+
+def store_options(engine: Optional[str] = None) -> Dict[str, str]:
+    """create_store() options giving this process's shard its own files; none when unsharded"""
+    if SHARD_COUNT <= 1:
+        return {}
+    engine = (engine or STORAGE_ENGINE).lower()
+    if engine == "sqlite":
+        return {"path": shard_path(SQLITE_PATH, SHARD_INDEX)}
+    if engine == "durable":
+        return {"path": shard_path(DATA_DIR, SHARD_INDEX)}
+    return {}
+
+
+def label_metrics(text: str, shard: int) -> Tuple[List[str], Dict[str, List[str]]]:
+    """Comment lines and labelled samples of one shard's /metrics, by metric name"""
+    comments: List[str] = []
+    samples: Dict[str, List[str]] = {}
+    for line in text.splitlines():
+        if not line:
+            continue
+        if line.startswith("#"):
+            comments.append(line)
+            continue
+        series, _, value = line.rpartition(" ")
+        name, brace, labels = series.partition("{")
+        labels = f'shard="{shard}",{labels}' if brace and labels != "}" else f'shard="{shard}"}}'
+        samples.setdefault(name, []).append(f"{name}{{{labels} {value}")
+    return comments, samples
+
+
+def merge_metrics(texts: List[str]) -> str:
+    """One exposition of every shard's metrics, keeping each metric's HELP and TYPE once"""
+    order: List[str] = []
+    comments: Dict[str, List[str]] = {}
+    samples: Dict[str, List[str]] = {}
+    for shard, text in enumerate(texts):
+        shard_comments, shard_samples = label_metrics(text, shard)
+        for line in shard_comments:
+            parts = line.split(" ", 3)
+            if len(parts) >= 3 and parts[1] in ("HELP", "TYPE"):
+                name = parts[2]
+                if name not in comments:
+                    order.append(name)
+                    comments[name] = []
+                if line not in comments[name]:
+                    comments[name].append(line)
+        for name, lines in shard_samples.items():
+            samples.setdefault(name, []).extend(lines)
+    lines: List[str] = []
+    for name in order:
+        lines += comments[name]
+        # Histograms expose _bucket, _sum and _count samples under one TYPE line
+        for suffix in ("", "_bucket", "_sum", "_count"):
+            lines += samples.pop(name + suffix, [])
+    for leftover in samples.values():
+        lines += leftover
+    return "\n".join(lines) + "\n"
+
+
+def body_key(path: str, body: bytes) -> Optional[str]:
+    """User id (or email for new users) that decides the shard of a create request"""
+    try:
+        payload = loads(body)
+    except ValueError:
+        return None
+    return item_key(path, payload)
+
+
+def item_key(path: str, payload: Any) -> Optional[str]:
+    """Shard key of one parsed create payload"""
+    if not isinstance(payload, dict):
+        return None
+    if path == "/users/":
+        email = payload.get("email")
+        return email.strip().lower() if isinstance(email, str) else None
+    user_id = payload.get("user_id")
+    return user_id if isinstance(user_id, str) else None
+
+
+def split_bulk(body: bytes, count: int) -> List[bytes]:
+    """Split a bulk biofeedback body into one NDJSON body per shard
+
+    Lines owned by other shards are replaced by blank lines, which the
+    ingest endpoint skips but still counts, so error line numbers stay
+    those of the uploaded file. Lines without a readable user id go to
+    shard 0, which reports them.
+    """
+    stripped = body.lstrip()
+    if stripped.startswith(b"["):
+        try:
+            items = loads(body)
+        except ValueError:
+            items = None
+        if not isinstance(items, list):
+            return [body] + [b""] * (count - 1)
+        lines = [dumps(item) for item in items]
+        keys = [item.get("user_id") if isinstance(item, dict) else None for item in items]
+    else:
+        lines = body.split(b"\n")
+        keys = []
+        for line in lines:
+            try:
+                item = loads(line) if line.strip() else None
+            except ValueError:
+                item = None
+            keys.append(item.get("user_id") if isinstance(item, dict) else None)
+    shards = [shard_for(key, count) if isinstance(key, str) else 0 for key in keys]
+    return [b"\n".join(line if owner == index else b"" for line, owner in zip(lines, shards))
+            for index in range(count)]
+
+
+def split_items(path: str, body: bytes, count: int) -> Optional[Tuple[List[bytes], List[List[int]]]]:
+    """Split a bulk create array into one array per shard, plus each item's request index
+
+    Returns None when the body is not a JSON array; items without a usable
+    key go to shard 0, which reports them.
+    """
+    try:
+        items = loads(body)
+    except ValueError:
+        return None
+    if not isinstance(items, list):
+        return None
+    parts: List[List[Any]] = [[] for _ in range(count)]
+    positions: List[List[int]] = [[] for _ in range(count)]
+    single_path = path[:-len("bulk")]
+    for index, item in enumerate(items):
+        key = item_key(single_path, item)
+        owner = shard_for(key, count) if key is not None else 0
+        parts[owner].append(item)
+        positions[owner].append(index)
+    return [dumps(part) for part in parts], positions
+
+
+def merge_created(results: List[Dict[str, Any]], positions: List[List[int]], total: int) -> Dict[str, Any]:
+    """Combine per-shard bulk create results, mapping ids and errors back to request order"""
+    ids: List[Optional[str]] = [None] * total
+    errors = []
+    for result, indexes in zip(results, positions):
+        for local, record_id in enumerate(result["ids"]):
+            ids[indexes[local]] = record_id
+        errors += [{"index": indexes[e["index"]], "error": e["error"]} for e in result["errors"]]
+    errors.sort(key=lambda e: e["index"])
+    return {
+        "status": "success" if not errors else "partial",
+        "created": total - len(errors),
+        "rejected": len(errors),
+        "ids": ids,
+        "errors": errors
+    }
+
+
+def merge_bulk(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Combine per-shard ingest results into one response"""
+    errors = sorted((e for result in results for e in result["errors"]), key=lambda e: e["line"])
+    return {
+        "status": "success" if not errors else "partial",
+        "accepted": sum(result["accepted"] for result in results),
+        "rejected": len(errors),
+        "errors": errors
+    }
+
+
+class Dispatcher:
+    """ASGI app that forwards each request to the shard owning its user
+
+    Requests without a user (health, plan templates, tips, docs) go to the
+    shards in turn. Bulk uploads are split per shard and the results merged,
+    and /metrics combines every shard's metrics.
+    """
+
+    def __init__(self, sockets: List[str]):
+        self.clients = [
+            httpx.AsyncClient(transport=httpx.AsyncHTTPTransport(uds=socket), base_url="http://shard", timeout=None)
+            for socket in sockets
+        ]
+        self.next_shard = 0
+
+    def route(self, method: str, path: str, body: bytes) -> int:
+        """Shard for one request"""
+        key = None
+        if method == "POST" and (path in USER_BODY_PATHS or path == "/users/"):
+            key = body_key(path, body)
+        else:
+            for prefix in USER_PATH_PREFIXES:
+                if path.startswith(prefix):
+                    key = path[len(prefix):].split("/", 1)[0] or None
+                    break
+        if key is None:
+            self.next_shard = (self.next_shard + 1) % len(self.clients)
+            return self.next_shard
+        return shard_for(key, len(self.clients))
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        body = b""
+        more = True
+        while more:
+            message = await receive()
+            body += message.get("body", b"")
+            more = message.get("more_body", False)
+
+        method, path = scope["method"], scope["path"]
+        url = path + ("?" + scope["query_string"].decode() if scope["query_string"] else "")
+        headers = [(k, v) for k, v in scope["headers"] if k not in HOP_BY_HOP_HEADERS]
+        if method == "POST" and path in BULK_CREATE_PATHS and len(self.clients) > 1:
+            split = split_items(path, body, len(self.clients))
+            if split is not None:
+                status, response_headers, content = await self._bulk_create(url, headers, *split)
+                response_headers.append((b"content-length", str(len(content)).encode()))
+                await send({"type": "http.response.start", "status": status, "headers": response_headers})
+                await send({"type": "http.response.body", "body": content})
+                return
+        if method == "GET" and path == "/metrics":
+            status, response_headers, content = await self._metrics(url, headers)
+            response_headers.append((b"content-length", str(len(content)).encode()))
+            await send({"type": "http.response.start", "status": status, "headers": response_headers})
+            await send({"type": "http.response.body", "body": content})
+            return
+        if method == "POST" and path == "/biofeedback/bulk" and len(self.clients) > 1:
+            status, response_headers, content = await self._bulk(url, headers, body)
+            response_headers.append((b"content-length", str(len(content)).encode()))
+            await send({"type": "http.response.start", "status": status, "headers": response_headers})
+            await send({"type": "http.response.body", "body": content})
+            return
+
+        # Relay the shard's response as it arrives so event streams pass through
+        shard = self.clients[self.route(method, path, body)]
+        response = await shard.send(shard.build_request(method, url, headers=headers, content=body), stream=True)
+        # A client leaving an event stream must close the upstream one too, or both stay open for good
+        relay = asyncio.ensure_future(self._relay(response, send))
+        disconnect = asyncio.ensure_future(self._disconnect(receive))
+        try:
+            await asyncio.wait([relay, disconnect], return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in (relay, disconnect):
+                task.cancel()
+            await asyncio.gather(relay, disconnect, return_exceptions=True)
+            await response.aclose()
+        if not relay.cancelled():
+            relay.result()
+
+    @staticmethod
+    async def _relay(response: httpx.Response, send):
+        """Send the shard's response to the client chunk by chunk"""
+        response_headers = [(k.lower(), v) for k, v in response.headers.raw
+                            if k.lower() not in HOP_BY_HOP_HEADERS or k.lower() == b"content-length"]
+        await send({"type": "http.response.start", "status": response.status_code, "headers": response_headers})
+        async for chunk in response.aiter_raw():
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
+
+    @staticmethod
+    async def _disconnect(receive):
+        """Return once the client has gone away"""
+        while (await receive())["type"] != "http.disconnect":
+            pass
+
+    async def _bulk(self, url: str, headers: List, body: bytes):
+        parts = split_bulk(body, len(self.clients))
+        requests = [client.post(url, headers=headers, content=part)
+                    for client, part in zip(self.clients, parts) if part.strip()]
+        responses = await asyncio.gather(*requests)
+        failed = next((r for r in responses if r.status_code != 200), None)
+        if failed is not None:
+            return failed.status_code, [(b"content-type", b"application/json")], failed.content
+        return 200, [(b"content-type", b"application/json")], dumps(merge_bulk([r.json() for r in responses]))
+
+    async def _bulk_create(self, url: str, headers: List, parts: List[bytes], positions: List[List[int]]):
+        shards = [i for i, indexes in enumerate(positions) if indexes]
+        responses = await asyncio.gather(*(self.clients[i].post(url, headers=headers, content=parts[i])
+                                           for i in shards))
+        failed = next((r for r in responses if r.status_code != 200), None)
+        if failed is not None:
+            return failed.status_code, [(b"content-type", b"application/json")], failed.content
+        total = sum(len(indexes) for indexes in positions)
+        merged = merge_created([r.json() for r in responses], [positions[i] for i in shards], total)
+        return 200, [(b"content-type", b"application/json")], dumps(merged)
+
+    async def _metrics(self, url: str, headers: List):
+        responses = await asyncio.gather(*(client.get(url, headers=headers) for client in self.clients))
+        failed = next((r for r in responses if r.status_code != 200), None)
+        if failed is not None:
+            return failed.status_code, [(b"content-type", b"application/json")], failed.content
+        content_type = responses[0].headers.get("content-type", "text/plain").encode()
+        return 200, [(b"content-type", content_type)], merge_metrics([r.text for r in responses]).encode()
+
+    async def wait_ready(self, timeout: float = 60.0):
+        """Wait until every shard answers its health check"""
+        deadline = asyncio.get_running_loop().time() + timeout
+        for client in self.clients:
+            while True:
+                try:
+                    if (await client.get("/health")).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    if asyncio.get_running_loop().time() > deadline:
+                        raise
+                await asyncio.sleep(0.1)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await self.wait_ready()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                for client in self.clients:
+                    await client.aclose()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+
+def configure_shard(index: int, count: int):
+    """Make this process serve shard ``index`` of ``count``; call before the backend is imported"""
+    os.environ["WELLNESS_SHARD_INDEX"] = str(index)
+    os.environ["WELLNESS_SHARD_COUNT"] = str(count)
+    # A spawned worker may already have imported this module with the parent's settings
+    module = sys.modules.get("src.sharding")
+    if module is not None:
+        module.SHARD_INDEX, module.SHARD_COUNT = index, count
+
+
+def run_shard(index: int, count: int, socket: str):
+    """Serve one shard of the backend on a Unix socket"""
+    configure_shard(index, count)
+    uvicorn.run("src.backend_main:app", uds=socket, log_level="warning")
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Run the backend as user-sharded worker processes")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    args = parser.parse_args(argv)
+
+    socket_dir = tempfile.mkdtemp(prefix="wellness-shards-")
+    sockets = [os.path.join(socket_dir, f"shard{i}.sock") for i in range(args.workers)]
+    context = multiprocessing.get_context("spawn")
+    workers = [context.Process(target=run_shard, args=(i, args.workers, socket), daemon=True)
+               for i, socket in enumerate(sockets)]
+    for worker in workers:
+        worker.start()
+    try:
+        uvicorn.run(Dispatcher(sockets), host=args.host, port=args.port, log_level="warning")
+    finally:
+        for worker in workers:
+            worker.terminate()
+            worker.join()
+
+
+if __name__ == "__main__":
+    main()
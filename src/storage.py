@@ -0,0 +1,796 @@
+import itertools
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+from src.pagination import project
+from src.records import epoch_us, get_field, pack, unpack
+from src.persistence import (WriteAheadLog, capture_series, latest_snapshot, prune_snapshots,
+                             read_log, read_snapshot, repair_log, write_snapshot)
+from src.timeseries import (ROLLUP_KEYS, ROLLUP_RESOLUTIONS, SERIES_FIELDS, BiofeedbackSeries, RollupSeries,
+                            aggregate, as_aggregates, deep_size, empty_columns, series_values, to_epoch_us)
+
+# Collections held by the backend and the ones that are scoped to a user
+COLLECTIONS = ("users", "goals", "meal_plans", "workouts", "biofeedback")
+USER_SCOPED_COLLECTIONS = ("goals", "meal_plans", "workouts", "biofeedback")
+
+# Field holding the record's time for each collection
+TIMESTAMP_FIELDS = {
+    "users": "created_at",
+    "goals": "created_at",
+    "meal_plans": "created_at",
+    "workouts": "created_at",
+    "biofeedback": "timestamp"
+}
+
+# Storage configuration
+STORAGE_ENGINE = os.getenv("WELLNESS_STORAGE_ENGINE", "memory")
+SQLITE_PATH = os.getenv("WELLNESS_SQLITE_PATH", "wellness.db")
+SQLITE_BATCH_SIZE = int(os.getenv("WELLNESS_SQLITE_BATCH_SIZE", "256"))
+SQLITE_COMMIT_INTERVAL = float(os.getenv("WELLNESS_SQLITE_COMMIT_INTERVAL", "0.05"))
+DATA_DIR = os.getenv("WELLNESS_DATA_DIR", "wellness-data")
+WAL_SYNC = os.getenv("WELLNESS_WAL_SYNC", "group")
+WAL_COMMIT_DELAY = float(os.getenv("WELLNESS_WAL_COMMIT_DELAY", "0"))
+SNAPSHOT_INTERVAL = float(os.getenv("WELLNESS_SNAPSHOT_INTERVAL", "300"))
+SNAPSHOT_WAL_BYTES = int(os.getenv("WELLNESS_SNAPSHOT_WAL_BYTES", str(64 * 1024 * 1024)))
+
+# Write-ahead log entries for maintenance operations use these in place of a collection name
+COMPACT_ENTRY = "!compact"
+EVICT_ENTRY = "!evict"
+
+
+def generate_ids(count: int) -> List[str]:
+    """Generate ``count`` random version-4 UUID strings in one call
+
+    Equivalent to ``str(uuid.uuid4())`` per id, but draws all the randomness
+    with a single urandom call, which is several times faster for bulk inserts.
+    """
+    digits = os.urandom(16 * count).hex()
+    return [
+        f"{digits[i:i + 8]}-{digits[i + 8:i + 12]}-4{digits[i + 13:i + 16]}-"
+        f"{'89ab'[int(digits[i + 16], 16) & 3]}{digits[i + 17:i + 20]}-{digits[i + 20:i + 32]}"
+        for i in range(0, 32 * count, 32)
+    ]
+
+
+class DuplicateEmailError(ValueError):
+    """Raised when a user is created with an email that is already registered"""
+
+
+def normalize_email(email: str) -> str:
+    """Normalize an email address for the unique email index"""
+    return email.strip().lower()
+
+
+def no_compaction() -> Dict[str, int]:
+    return {"rolled_up": 0, "merged_hours": 0, "evicted_buckets": 0}
+
+
+def check_evictable(collection: str):
+    """Retention applies to user-scoped documents; users are never evicted and
+    biofeedback is compacted instead"""
+    if collection not in USER_SCOPED_COLLECTIONS or collection == "biofeedback":
+        raise ValueError(f"Records in '{collection}' cannot be evicted")
+
+
+class IndexedStore:
+    """In-memory record store with per-user and email secondary indexes
+
+    Records live in one dict per collection keyed by record id. Every insert
+    also appends the id to ``user_index[collection][user_id]`` so user-scoped
+    reads cost O(k) in the size of that user's history instead of scanning
+    the whole collection. Biofeedback readings are kept in one columnar
+    BiofeedbackSeries per user instead of a dict per reading.
+    """
+
+    def __init__(self):
+        self.collections: Dict[str, Dict[str, Dict]] = {
+            name: {} for name in COLLECTIONS if name != "biofeedback"
+        }
+        self.user_index: Dict[str, Dict[str, List[str]]] = {
+            name: {} for name in USER_SCOPED_COLLECTIONS if name != "biofeedback"
+        }
+        self.email_index: Dict[str, str] = {}
+        self.series: Dict[str, BiofeedbackSeries] = {}
+        self.biofeedback_count = 0
+        # Serializes writers, the background compactor and memory_usage(); reads stay lock-free
+        self.lock = threading.RLock()
+
+    def __getitem__(self, collection: str) -> Dict[str, Dict]:
+        """Allow ``db["users"]`` style read access to a copy of a collection"""
+        return {record_id: unpack(record) for record_id, record in self.collections[collection].items()}
+
+    def insert(self, collection: str, record_id: str, record: Dict[str, Any]) -> Dict[str, Any]:
+        """Insert a record and update the secondary indexes"""
+        if collection == "biofeedback":
+            user_id = record["user_id"]
+            with self.lock:
+                series = self.series.get(user_id)
+                if series is None:
+                    series = self.series[user_id] = BiofeedbackSeries(user_id)
+                series.append(record_id, record)
+                self.biofeedback_count += 1
+            return record
+        packed = pack(collection, record)
+        with self.lock:
+            if collection == "users":
+                email = normalize_email(record["email"])
+                owner = self.email_index.get(email)
+                if owner is not None and owner != record_id:
+                    raise DuplicateEmailError(f"Email {record['email']} is already registered")
+                self.email_index[email] = record_id
+            self.collections[collection][record_id] = packed
+            if collection in self.user_index:
+                self.user_index[collection].setdefault(record["user_id"], []).append(record_id)
+        return record
+
+    def insert_many(self, collection: str, records: Iterable[Tuple[str, Dict[str, Any]]]) -> int:
+        """Insert ``(record_id, record)`` pairs and return how many were stored"""
+        if collection == "biofeedback":
+            by_user: Dict[str, List[Tuple[str, Dict[str, Any]]]] = {}
+            for record_id, record in records:
+                by_user.setdefault(record["user_id"], []).append((record_id, record))
+            with self.lock:
+                for user_id, rows in by_user.items():
+                    series = self.series.get(user_id)
+                    if series is None:
+                        series = self.series[user_id] = BiofeedbackSeries(user_id)
+                    series.extend(rows)
+                    self.biofeedback_count += len(rows)
+            return sum(len(rows) for rows in by_user.values())
+        count = 0
+        for record_id, record in records:
+            self.insert(collection, record_id, record)
+            count += 1
+        return count
+
+    def get(self, collection: str, record_id: str) -> Optional[Dict[str, Any]]:
+        """Return a single record or None"""
+        if collection == "biofeedback":
+            for series in self.series.values():
+                record = series.find(record_id)
+                if record is not None:
+                    return record
+            return None
+        record = self.collections[collection].get(record_id)
+        return None if record is None else unpack(record)
+
+    def list_for_user(self, collection: str, user_id: str) -> List[Dict[str, Any]]:
+        """Return a user's records in insertion order (biofeedback in time order)"""
+        if collection == "biofeedback":
+            return self.biofeedback_range(user_id)
+        return [unpack(record) for record in self._records(collection, self.user_index[collection].get(user_id, ()))]
+
+    def _records(self, collection: str, ids: Iterable[str]) -> Iterator[Any]:
+        """Stored records for ``ids``, skipping any evicted since the ids were read"""
+        records = self.collections[collection]
+        for record_id in ids:
+            record = records.get(record_id)
+            if record is not None:
+                yield record
+
+    def page_for_user(self, collection: str, user_id: str, after: Any = None, limit: Optional[int] = None,
+                      fields: Optional[Tuple[str, ...]] = None) -> Tuple[List[Dict[str, Any]], Any]:
+        """Return one page of a user's records and the position to continue after
+
+        Positions index the user's append-only id list, so they stay valid as
+        new records arrive.
+        """
+        if collection == "biofeedback":
+            return self.biofeedback_page(user_id, after=after, limit=limit, fields=fields)
+        ids = self.user_index[collection].get(user_id, [])
+        start = 0 if after is None else int(after) + 1
+        if start < 0:
+            raise ValueError("Invalid position")
+        stop = len(ids) if limit is None else min(len(ids), start + limit)
+        page = project((unpack(record) for record in self._records(collection, ids[start:stop])), fields)
+        return page, (stop - 1 if stop < len(ids) else None)
+
+    def find_user_by_email(self, email: str) -> Optional[str]:
+        """Return the user id registered for an email, if any"""
+        return self.email_index.get(normalize_email(email))
+
+    def count(self, collection: str) -> int:
+        """Return the number of records in a collection"""
+        if collection == "biofeedback":
+            return self.biofeedback_count
+        return len(self.collections[collection])
+
+    def biofeedback_range(self, user_id: str, start_us: Optional[int] = None,
+                          end_us: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Return a user's readings with start <= timestamp < end in time order"""
+        series = self.series.get(user_id)
+        return series.records(start_us, end_us) if series is not None else []
+
+    def biofeedback_page(self, user_id: str, start_us: Optional[int] = None, end_us: Optional[int] = None,
+                         after: Any = None, limit: Optional[int] = None,
+                         fields: Optional[Tuple[str, ...]] = None) -> Tuple[List[Dict[str, Any]], Any]:
+        """Return one page of a user's readings in time order"""
+        series = self.series.get(user_id)
+        if series is None:
+            return [], None
+        return series.page(start_us, end_us, after, limit, fields)
+
+    def biofeedback_columns(self, user_id: str, start_us: Optional[int] = None,
+                            end_us: Optional[int] = None) -> Dict[str, Sequence]:
+        """Return a user's readings with start <= timestamp < end as columns"""
+        series = self.series.get(user_id)
+        if series is None:
+            return empty_columns()
+        return series.columns_between(start_us, end_us)
+
+    def biofeedback_users(self) -> List[str]:
+        """Ids of users with biofeedback or rollups"""
+        return list(self.series)
+
+    def compact_biofeedback(self, user_id: str, raw_cutoff_us: Optional[int], hourly_cutoff_us: Optional[int] = None,
+                            daily_cutoff_us: Optional[int] = None, max_rows: Optional[int] = None) -> Dict[str, int]:
+        """Roll a user's old readings into hourly/daily rollups; see BiofeedbackSeries.compact"""
+        with self.lock:
+            series = self.series.get(user_id)
+            if series is None:
+                return no_compaction()
+            result = series.compact(raw_cutoff_us, hourly_cutoff_us, daily_cutoff_us, max_rows)
+            self.biofeedback_count -= result["rolled_up"]
+            return result
+
+    def biofeedback_rollups(self, user_id: str, resolution: str, start_us: Optional[int] = None,
+                            end_us: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Return a user's hourly or daily rollup buckets with start <= bucket_start < end"""
+        series = self.series.get(user_id)
+        return series.rollup_records(resolution, start_us, end_us) if series is not None else []
+
+    def evict_before(self, collection: str, cutoff_us: int, max_rows: Optional[int] = None) -> int:
+        """Delete up to ``max_rows`` of the oldest records created before ``cutoff_us``
+
+        Records are scanned in insertion order, which is creation order.
+        Page cursors index a user's record list, so a cursor handed out
+        before an eviction may skip as many records as were evicted.
+        """
+        check_evictable(collection)
+        timestamp_field = TIMESTAMP_FIELDS[collection]
+        with self.lock:
+            records = self.collections[collection]
+            expired = []
+            for record_id, record in records.items():
+                created = epoch_us(record, timestamp_field)
+                if created is None or created >= cutoff_us:
+                    break
+                expired.append(record_id)
+                if max_rows is not None and len(expired) >= max_rows:
+                    break
+            by_user: Dict[str, Set[str]] = {}
+            for record_id in expired:
+                by_user.setdefault(get_field(records.pop(record_id), "user_id"), set()).add(record_id)
+            # Each affected user's id list is rebuilt once per pass
+            user_index = self.user_index[collection]
+            for user_id, evicted in by_user.items():
+                ids = user_index.get(user_id)
+                if ids is None:
+                    continue
+                kept = [record_id for record_id in ids if record_id not in evicted]
+                if kept:
+                    user_index[user_id] = kept
+                else:
+                    del user_index[user_id]
+            return len(expired)
+
+    def memory_usage(self) -> Dict[str, int]:
+        """Approximate bytes held per collection, including indexes and rollups
+
+        Document sizes are extrapolated from a sample of records. Holds the
+        write lock, since the indexes cannot be walked while they change.
+        """
+        with self.lock:
+            return self._memory_usage()
+
+    def _memory_usage(self) -> Dict[str, int]:
+        usage = {}
+        for name, records in self.collections.items():
+            sample = list(itertools.islice(records.values(), 100))
+            size = sys.getsizeof(records)
+            if sample:
+                size += sum(deep_size(record) for record in sample) * len(records) // len(sample)
+            if name in self.user_index:
+                size += sum(sys.getsizeof(ids) for ids in self.user_index[name].values())
+            usage[name] = size
+        usage["users"] += sys.getsizeof(self.email_index) + sum(sys.getsizeof(email) for email in self.email_index)
+        usage["biofeedback"] = sys.getsizeof(self.series) + sum(series.nbytes() for series in list(self.series.values()))
+        return usage
+
+    def close(self):
+        """Nothing to release for the in-memory engine"""
+
+
+def _ts_bounds(start_us: Optional[int], end_us: Optional[int]) -> Tuple[int, int]:
+    """Replace open range ends with the extremes of a 64-bit integer"""
+    return (-(2 ** 63) if start_us is None else start_us,
+            2 ** 63 - 1 if end_us is None else end_us)
+
+
+class SQLiteStore:
+    """Durable store backed by SQLite with the same interface as IndexedStore
+
+    The database runs in WAL mode so several uvicorn workers can read while
+    one writes. Writes join an open transaction that is committed once
+    ``batch_size`` writes are pending or ``commit_interval`` seconds have
+    passed, whichever comes first. Statements are fixed strings so the
+    sqlite3 statement cache keeps them prepared on the connection.
+    """
+
+    def __init__(self, path: str = SQLITE_PATH, batch_size: int = SQLITE_BATCH_SIZE,
+                 commit_interval: float = SQLITE_COMMIT_INTERVAL):
+        self.path = path
+        self.batch_size = batch_size
+        self.commit_interval = commit_interval
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None,
+                                    cached_statements=256)
+        self.lock = threading.RLock()
+        self.pending = 0
+        self._closed = threading.Event()
+        self._create_schema()
+        self._insert_sql = {
+            name: f"INSERT INTO {name} (id, user_id, ts, data) VALUES (?, ?, ?, ?)"
+            for name in USER_SCOPED_COLLECTIONS
+        }
+        self._insert_sql["users"] = "INSERT INTO users (id, email, ts, data) VALUES (?, ?, ?, ?)"
+        self._insert_sql["biofeedback"] = (
+            f"INSERT INTO biofeedback (id, user_id, ts, data, {', '.join(SERIES_FIELDS)}) "
+            f"VALUES (?, ?, ?, ?{', ?' * len(SERIES_FIELDS)})"
+        )
+        self._columns_sql = (
+            f"SELECT id, ts, {', '.join(SERIES_FIELDS)} FROM biofeedback "
+            "WHERE user_id = ? AND ts >= ? AND ts < ? ORDER BY ts, seq"
+        )
+        self._range_sql = "SELECT data FROM biofeedback WHERE user_id = ? AND ts >= ? AND ts < ? ORDER BY ts, seq"
+        self._page_sql = (
+            "SELECT ts, seq, data FROM biofeedback WHERE user_id = ? AND ts >= ? AND ts < ? "
+            "AND (ts > ? OR (ts = ? AND seq > ?)) ORDER BY ts, seq LIMIT ?"
+        )
+        merges = ", ".join(
+            f"{key} = {'MIN' if key.endswith('_min') else 'MAX'}({key}, excluded.{key})"
+            if key.endswith(("_min", "_max")) else f"{key} = {key} + excluded.{key}"
+            for key in ROLLUP_KEYS
+        )
+        self._rollup_upsert_sql = (
+            f"INSERT INTO biofeedback_rollups (user_id, resolution, bucket, {', '.join(ROLLUP_KEYS)}) "
+            f"VALUES (?, ?, ?{', ?' * len(ROLLUP_KEYS)}) "
+            f"ON CONFLICT (user_id, resolution, bucket) DO UPDATE SET {merges}"
+        )
+        self._rollup_select_sql = (
+            f"SELECT bucket, {', '.join(ROLLUP_KEYS)} FROM biofeedback_rollups "
+            "WHERE user_id = ? AND resolution = ? AND bucket >= ? AND bucket < ? ORDER BY bucket"
+        )
+        self._flusher = threading.Thread(target=self._flush_loop, name="sqlite-flusher", daemon=True)
+        self._flusher.start()
+
+    def _create_schema(self):
+        """Create tables and indexes if they do not exist yet"""
+        with self.lock:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS users ("
+                "seq INTEGER PRIMARY KEY, id TEXT UNIQUE NOT NULL, "
+                "email TEXT UNIQUE NOT NULL, ts INTEGER, data TEXT NOT NULL)"
+            )
+            series_columns = "".join(f", {field} REAL" for field in SERIES_FIELDS)
+            for name in USER_SCOPED_COLLECTIONS:
+                extra_columns = series_columns if name == "biofeedback" else ""
+                self.conn.execute(
+                    f"CREATE TABLE IF NOT EXISTS {name} ("
+                    "seq INTEGER PRIMARY KEY, id TEXT UNIQUE NOT NULL, "
+                    f"user_id TEXT NOT NULL, ts INTEGER, data TEXT NOT NULL{extra_columns})"
+                )
+                self.conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{name}_user_ts ON {name} (user_id, ts)")
+                self.conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{name}_ts ON {name} (ts)")
+            rollup_columns = "".join(
+                f", {key} {'INTEGER' if key == 'count' or key.endswith('_n') else 'REAL'} NOT NULL" for key in ROLLUP_KEYS
+            )
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS biofeedback_rollups ("
+                f"user_id TEXT NOT NULL, resolution TEXT NOT NULL, bucket INTEGER NOT NULL{rollup_columns}, "
+                "PRIMARY KEY (user_id, resolution, bucket)) WITHOUT ROWID"
+            )
+
+    def _row(self, collection: str, record_id: str, record: Dict[str, Any]) -> Tuple:
+        """Build the parameter tuple for an insert"""
+        key = normalize_email(record["email"]) if collection == "users" else record["user_id"]
+        ts = record.get(TIMESTAMP_FIELDS[collection])
+        row = (record_id, key, None if ts is None else to_epoch_us(ts), json.dumps(record, default=str))
+        if collection == "biofeedback":
+            row += tuple(None if v != v else v for v in series_values(record))
+        return row
+
+    def _begin(self):
+        if not self.conn.in_transaction:
+            self.conn.execute("BEGIN")
+
+    def _wrote(self, count: int):
+        """Account for pending writes and commit once the batch is full"""
+        self.pending += count
+        if self.pending >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Commit pending writes"""
+        with self.lock:
+            if self.conn.in_transaction:
+                self.conn.execute("COMMIT")
+            self.pending = 0
+
+    def _flush_loop(self):
+        while not self._closed.wait(self.commit_interval):
+            if self.pending:
+                self.flush()
+
+    def close(self):
+        """Commit outstanding writes and close the connection"""
+        self._closed.set()
+        self.flush()
+        self.conn.close()
+
+    def insert(self, collection: str, record_id: str, record: Dict[str, Any]) -> Dict[str, Any]:
+        """Insert a record, raising DuplicateEmailError for a taken email"""
+        self.insert_many(collection, [(record_id, record)])
+        return record
+
+    def insert_many(self, collection: str, records: Iterable[Tuple[str, Dict[str, Any]]]) -> int:
+        """Insert ``(record_id, record)`` pairs in one statement batch"""
+        rows = [self._row(collection, record_id, record) for record_id, record in records]
+        with self.lock:
+            self._begin()
+            self.conn.execute("SAVEPOINT insert_many")
+            try:
+                self.conn.executemany(self._insert_sql[collection], rows)
+            except sqlite3.IntegrityError as e:
+                self.conn.execute("ROLLBACK TO insert_many")
+                self.conn.execute("RELEASE insert_many")
+                if collection == "users" and "email" in str(e):
+                    raise DuplicateEmailError("Email is already registered") from e
+                raise
+            self.conn.execute("RELEASE insert_many")
+            self._wrote(len(rows))
+        return len(rows)
+
+    def get(self, collection: str, record_id: str) -> Optional[Dict[str, Any]]:
+        """Return a single record or None"""
+        with self.lock:
+            row = self.conn.execute(f"SELECT data FROM {collection} WHERE id = ?", (record_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def list_for_user(self, collection: str, user_id: str) -> List[Dict[str, Any]]:
+        """Return a user's records in insertion order (biofeedback in time order)"""
+        if collection == "biofeedback":
+            return self.biofeedback_range(user_id)
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT data FROM {collection} WHERE user_id = ? ORDER BY seq", (user_id,)
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def page_for_user(self, collection: str, user_id: str, after: Any = None, limit: Optional[int] = None,
+                      fields: Optional[Tuple[str, ...]] = None) -> Tuple[List[Dict[str, Any]], Any]:
+        """Return one page of a user's records and the row sequence to continue after"""
+        if collection == "biofeedback":
+            return self.biofeedback_page(user_id, after=after, limit=limit, fields=fields)
+        fetch = -1 if limit is None else limit + 1
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT seq, data FROM {collection} WHERE user_id = ? AND seq > ? ORDER BY seq LIMIT ?",
+                (user_id, -1 if after is None else int(after), fetch)
+            ).fetchall()
+        more = limit is not None and len(rows) > limit
+        rows = rows[:limit] if more else rows
+        page = project((json.loads(data) for _, data in rows), fields)
+        return page, (rows[-1][0] if more else None)
+
+    def biofeedback_page(self, user_id: str, start_us: Optional[int] = None, end_us: Optional[int] = None,
+                         after: Any = None, limit: Optional[int] = None,
+                         fields: Optional[Tuple[str, ...]] = None) -> Tuple[List[Dict[str, Any]], Any]:
+        """Return one page of a user's readings in time order"""
+        after_ts, after_seq = (-(2 ** 63), -1) if after is None else (int(after[0]), int(after[1]))
+        fetch = -1 if limit is None else limit + 1
+        with self.lock:
+            rows = self.conn.execute(
+                self._page_sql,
+                (user_id, *_ts_bounds(start_us, end_us), after_ts, after_ts, after_seq, fetch)
+            ).fetchall()
+        more = limit is not None and len(rows) > limit
+        rows = rows[:limit] if more else rows
+        page = project((json.loads(data) for _, _, data in rows), fields)
+        return page, ([rows[-1][0], rows[-1][1]] if more else None)
+
+    def find_user_by_email(self, email: str) -> Optional[str]:
+        """Return the user id registered for an email, if any"""
+        with self.lock:
+            row = self.conn.execute("SELECT id FROM users WHERE email = ?", (normalize_email(email),)).fetchone()
+        return row[0] if row else None
+
+    def count(self, collection: str) -> int:
+        """Return the number of records in a collection"""
+        with self.lock:
+            return self.conn.execute(f"SELECT COUNT(*) FROM {collection}").fetchone()[0]
+
+    def biofeedback_range(self, user_id: str, start_us: Optional[int] = None,
+                          end_us: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Return a user's readings with start <= timestamp < end in time order"""
+        with self.lock:
+            rows = self.conn.execute(self._range_sql, (user_id, *_ts_bounds(start_us, end_us))).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def biofeedback_columns(self, user_id: str, start_us: Optional[int] = None,
+                            end_us: Optional[int] = None) -> Dict[str, Sequence]:
+        """Return a user's readings with start <= timestamp < end as columns"""
+        with self.lock:
+            rows = self.conn.execute(self._columns_sql, (user_id, *_ts_bounds(start_us, end_us))).fetchall()
+        columns = empty_columns()
+        names = ("id", "timestamp") + SERIES_FIELDS
+        for name, values in zip(names, zip(*rows)):
+            columns[name] = values if name in ("id", "timestamp") else [
+                float("nan") if v is None else v for v in values
+            ]
+        return columns
+
+    def biofeedback_users(self) -> List[str]:
+        """Ids of users with biofeedback or rollups"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT DISTINCT user_id FROM biofeedback UNION SELECT DISTINCT user_id FROM biofeedback_rollups"
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def _rollups(self, user_id: str, resolution: str, start_us: Optional[int], end_us: Optional[int]) -> RollupSeries:
+        rollup = RollupSeries(ROLLUP_RESOLUTIONS[resolution])
+        rows = self.conn.execute(self._rollup_select_sql, (user_id, resolution, *_ts_bounds(start_us, end_us))).fetchall()
+        for row in rows:
+            rollup.starts.append(row[0])
+            for key, value in zip(ROLLUP_KEYS, row[1:]):
+                rollup.values[key].append(value)
+        return rollup
+
+    def _merge_rollups(self, user_id: str, resolution: str, buckets: Dict[str, Any]):
+        columns = [buckets["start"].tolist()] + [buckets[key].tolist() for key in ROLLUP_KEYS]
+        self.conn.executemany(self._rollup_upsert_sql, ((user_id, resolution, *row) for row in zip(*columns)))
+
+    def compact_biofeedback(self, user_id: str, raw_cutoff_us: Optional[int], hourly_cutoff_us: Optional[int] = None,
+                            daily_cutoff_us: Optional[int] = None, max_rows: Optional[int] = None) -> Dict[str, int]:
+        """Roll a user's old readings into hourly/daily rollups; see BiofeedbackSeries.compact"""
+        result = no_compaction()
+        with self.lock:
+            self._begin()
+            if raw_cutoff_us is not None:
+                rows = self.conn.execute(
+                    f"SELECT seq, ts, {', '.join(SERIES_FIELDS)} FROM biofeedback "
+                    "WHERE user_id = ? AND ts < ? ORDER BY ts, seq LIMIT ?",
+                    (user_id, raw_cutoff_us, -1 if max_rows is None else max_rows)
+                ).fetchall()
+                if rows:
+                    columns = {"timestamp": [row[1] for row in rows]}
+                    for i, field in enumerate(SERIES_FIELDS, 2):
+                        columns[field] = [float("nan") if row[i] is None else row[i] for row in rows]
+                    self._merge_rollups(user_id, "hourly",
+                                        aggregate(as_aggregates(columns), ROLLUP_RESOLUTIONS["hourly"]))
+                    self.conn.executemany("DELETE FROM biofeedback WHERE seq = ?", ((row[0],) for row in rows))
+                    result["rolled_up"] = len(rows)
+            if hourly_cutoff_us is not None:
+                hours = self._rollups(user_id, "hourly", None, hourly_cutoff_us).drop_before(hourly_cutoff_us)
+                if len(hours["start"]):
+                    self._merge_rollups(user_id, "daily", aggregate(hours, ROLLUP_RESOLUTIONS["daily"]))
+                    self.conn.execute(
+                        "DELETE FROM biofeedback_rollups WHERE user_id = ? AND resolution = 'hourly' AND bucket < ?",
+                        (user_id, hourly_cutoff_us)
+                    )
+                    result["merged_hours"] = len(hours["start"])
+            if daily_cutoff_us is not None:
+                result["evicted_buckets"] = self.conn.execute(
+                    "DELETE FROM biofeedback_rollups WHERE user_id = ? AND resolution = 'daily' AND bucket < ?",
+                    (user_id, daily_cutoff_us)
+                ).rowcount
+            self._wrote(sum(result.values()))
+        return result
+
+    def biofeedback_rollups(self, user_id: str, resolution: str, start_us: Optional[int] = None,
+                            end_us: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Return a user's hourly or daily rollup buckets with start <= bucket_start < end"""
+        with self.lock:
+            return self._rollups(user_id, resolution, start_us, end_us).records()
+
+    def evict_before(self, collection: str, cutoff_us: int, max_rows: Optional[int] = None) -> int:
+        """Delete up to ``max_rows`` of the oldest records created before ``cutoff_us``"""
+        check_evictable(collection)
+        with self.lock:
+            self._begin()
+            deleted = self.conn.execute(
+                f"DELETE FROM {collection} WHERE seq IN "
+                f"(SELECT seq FROM {collection} WHERE ts < ? ORDER BY ts LIMIT ?)",
+                (cutoff_us, -1 if max_rows is None else max_rows)
+            ).rowcount
+            self._wrote(deleted)
+        return deleted
+
+    def memory_usage(self) -> Dict[str, int]:
+        """Bytes on disk per collection (tables plus indexes), where SQLite provides dbstat"""
+        with self.lock:
+            try:
+                rows = self.conn.execute(
+                    "SELECT m.tbl_name, SUM(s.pgsize) FROM dbstat s JOIN sqlite_master m ON s.name = m.name "
+                    "GROUP BY m.tbl_name"
+                ).fetchall()
+            except sqlite3.OperationalError:
+                page_size = self.conn.execute("PRAGMA page_size").fetchone()[0]
+                return {"database": page_size * self.conn.execute("PRAGMA page_count").fetchone()[0]}
+        usage = dict(rows)
+        usage["biofeedback"] = usage.get("biofeedback", 0) + usage.pop("biofeedback_rollups", 0)
+        return usage
+
+
+class DurableStore(IndexedStore):
+    """In-memory store that survives restarts through a write-ahead log and snapshots
+
+    Reads are served from memory exactly as in IndexedStore. Every insert is
+    applied in memory and appended to the WAL; with ``sync="group"`` the
+    call returns once its entry is fsynced, sharing each sync with other
+    concurrent writers, while ``sync="none"`` leaves syncing to the
+    background writer. A snapshot thread writes a compact snapshot every
+    ``snapshot_interval`` seconds or after ``snapshot_wal_bytes`` of log,
+    then drops the log segments it covers. Startup loads the newest
+    snapshot and replays only the log written after it.
+    """
+
+    def __init__(self, path: str = DATA_DIR, sync: str = WAL_SYNC, commit_delay: float = WAL_COMMIT_DELAY,
+                 snapshot_interval: float = SNAPSHOT_INTERVAL, snapshot_wal_bytes: int = SNAPSHOT_WAL_BYTES):
+        super().__init__()
+        if sync not in ("group", "none"):
+            raise ValueError(f"Unknown WAL sync mode '{sync}'. Must be 'group' or 'none'")
+        self.path = path
+        self.sync = sync
+        self.snapshot_interval = snapshot_interval
+        self.snapshot_wal_bytes = snapshot_wal_bytes
+        self.snapshot_lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+        self.recovery = self._recover()
+        self.wal = WriteAheadLog(path, self.recovery["lsn"] + 1, commit_delay)
+        self.last_snapshot = time.monotonic()
+        self._closed = threading.Event()
+        self._snapshotter = threading.Thread(target=self._snapshot_loop, name="snapshotter", daemon=True)
+        self._snapshotter.start()
+
+    def _recover(self) -> Dict[str, Any]:
+        """Load the newest snapshot and replay the log written after it"""
+        started = time.perf_counter()
+        snapshot = latest_snapshot(self.path)
+        lsn = 0
+        if snapshot:
+            lsn, documents, series = read_snapshot(snapshot)
+            for collection, records in documents.items():
+                for record_id, record in records.items():
+                    IndexedStore.insert(self, collection, record_id, record)
+            for item in series:
+                self.series[item.user_id] = item
+                self.biofeedback_count += len(item)
+        loaded = time.perf_counter()
+        snapshot_lsn = lsn
+        # New entries go after the last intact frame, never after a torn one
+        truncated = repair_log(self.path)
+        replayed = 0
+        for lsn, collection, rows in read_log(self.path, after_lsn=snapshot_lsn):
+            self._apply(collection, rows)
+            replayed += 1
+        return {
+            "snapshot": snapshot,
+            "snapshot_lsn": snapshot_lsn,
+            "lsn": lsn,
+            "replayed_entries": replayed,
+            "truncated_bytes": truncated,
+            "snapshot_seconds": loaded - started,
+            "replay_seconds": time.perf_counter() - loaded
+        }
+
+    def _apply(self, collection: str, rows: List) -> int:
+        """Apply logged rows in memory during recovery"""
+        if collection == COMPACT_ENTRY:
+            IndexedStore.compact_biofeedback(self, *rows)
+            return 0
+        if collection == EVICT_ENTRY:
+            return IndexedStore.evict_before(self, *rows)
+        if collection == "biofeedback":
+            return IndexedStore.insert_many(self, collection, rows)
+        applied = 0
+        for record_id, record in rows:
+            IndexedStore.insert(self, collection, record_id, record)
+            applied += 1
+        return applied
+
+    def insert(self, collection: str, record_id: str, record: Dict[str, Any]) -> Dict[str, Any]:
+        """Insert a record and log it, raising DuplicateEmailError for a taken email"""
+        self.insert_many(collection, [(record_id, record)])
+        return record
+
+    def insert_many(self, collection: str, records: Iterable[Tuple[str, Dict[str, Any]]]) -> int:
+        """Insert ``(record_id, record)`` pairs as one log entry and return how many were stored"""
+        rows = list(records)
+        with self.lock:
+            applied = 0
+            try:
+                if collection == "biofeedback":
+                    applied = IndexedStore.insert_many(self, collection, rows)
+                else:
+                    for record_id, record in rows:
+                        IndexedStore.insert(self, collection, record_id, record)
+                        applied += 1
+            finally:
+                # Records applied before a duplicate email stay in memory, so they are logged too
+                lsn = self.wal.append(collection, rows[:applied]) if applied else None
+        if lsn is not None and self.sync == "group":
+            self.wal.wait(lsn)
+        return applied
+
+    def compact_biofeedback(self, user_id: str, raw_cutoff_us: Optional[int], hourly_cutoff_us: Optional[int] = None,
+                            daily_cutoff_us: Optional[int] = None, max_rows: Optional[int] = None) -> Dict[str, int]:
+        """Compact in memory and log the operation so recovery repeats it"""
+        with self.lock:
+            result = IndexedStore.compact_biofeedback(self, user_id, raw_cutoff_us, hourly_cutoff_us,
+                                                      daily_cutoff_us, max_rows)
+            if any(result.values()):
+                self.wal.append(COMPACT_ENTRY, [user_id, raw_cutoff_us, hourly_cutoff_us, daily_cutoff_us, max_rows])
+        return result
+
+    def evict_before(self, collection: str, cutoff_us: int, max_rows: Optional[int] = None) -> int:
+        """Evict in memory and log the operation so recovery repeats it"""
+        with self.lock:
+            evicted = IndexedStore.evict_before(self, collection, cutoff_us, max_rows)
+            if evicted:
+                self.wal.append(EVICT_ENTRY, [collection, cutoff_us, max_rows])
+        return evicted
+
+    def snapshot(self) -> Optional[str]:
+        """Write a snapshot of the current state and drop the log it covers"""
+        with self.snapshot_lock:
+            with self.lock:
+                lsn = self.wal.rotate()
+                if lsn == self.recovery["snapshot_lsn"]:
+                    return None
+                documents = {name: dict(records) for name, records in self.collections.items()}
+                series = [capture_series(item) for item in self.series.values()]
+            # Stored documents are never modified in place, so they can be unpacked outside the lock
+            documents = {name: {record_id: unpack(record) for record_id, record in records.items()}
+                         for name, records in documents.items()}
+            path = write_snapshot(self.path, lsn, documents, series)
+            prune_snapshots(self.path, path)
+            self.wal.prune(lsn)
+            self.recovery["snapshot_lsn"] = lsn
+            self.last_snapshot = time.monotonic()
+            return path
+
+    def _snapshot_loop(self):
+        while not self._closed.wait(1.0):
+            due = time.monotonic() - self.last_snapshot >= self.snapshot_interval
+            if self.wal.segment_bytes >= self.snapshot_wal_bytes or (due and self.wal.segment_bytes):
+                self.snapshot()
+
+    def close(self):
+        """Sync the log and write a final snapshot so the next start replays nothing"""
+        self._closed.set()
+        self._snapshotter.join()
+        self.snapshot()
+        self.wal.close()
+
+
+STORAGE_ENGINES = {
+    "memory": IndexedStore,
+    "sqlite": SQLiteStore,
+    "durable": DurableStore
+}
+
+
+def create_store(engine: str = None, **options):
+    """Build the storage engine named by ``engine`` or WELLNESS_STORAGE_ENGINE"""
+    engine = (engine or STORAGE_ENGINE).lower()
+    if engine not in STORAGE_ENGINES:
+        raise ValueError(f"Unknown storage engine '{engine}'. Must be one of: {list(STORAGE_ENGINES)}")
+    return STORAGE_ENGINES[engine](**options)
@@ -0,0 +1,95 @@
+"""Time to first token and token throughput of streamed LLM responses
+
+Token counts are approximate: words and punctuation marks, which track
+the model's own tokens closely enough to compare responses and spot
+regressions without a tokenizer.
+"""
+import logging
+import re
+import threading
+import time
+from typing import Dict, Iterable, Iterator, Optional
+
+_TOKEN = re.compile(r"\w+|[^\w\s]")
+
+logger = logging.getLogger(__name__)
+
+
+def count_tokens(text: str) -> int:
+    """Approximate token count of a piece of text"""
+    return len(_TOKEN.findall(text))
+
+
+class StreamStats:
+    """Timing of one streamed response, measured from when the request was made"""
+
+    __slots__ = ("started", "first_token", "finished", "tokens", "chunks")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.first_token: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.tokens = 0
+        self.chunks = 0
+
+    @property
+    def ttft(self) -> Optional[float]:
+        """Seconds until the first chunk arrived"""
+        return None if self.first_token is None else self.first_token - self.started
+
+    @property
+    def tokens_per_second(self) -> Optional[float]:
+        """Tokens per second after the first chunk, i.e. the generation rate seen by the reader"""
+        if self.first_token is None or self.finished is None or self.finished <= self.first_token:
+            return None
+        return self.tokens / (self.finished - self.first_token)
+
+    def as_dict(self) -> Dict[str, Optional[float]]:
+        ttft, rate = self.ttft, self.tokens_per_second
+        return {
+            "ttft_ms": None if ttft is None else round(ttft * 1000, 1),
+            "tokens": self.tokens,
+            "chunks": self.chunks,
+            "tokens_per_second": None if rate is None else round(rate, 1),
+            "seconds": None if self.finished is None else round(self.finished - self.started, 3)
+        }
+
+
+def measure_stream(chunks: Iterable[str], stats: StreamStats, label: str = "response") -> Iterator[str]:
+    """Pass chunks through, recording their timing in ``stats``; the totals are logged at the end"""
+    try:
+        for chunk in chunks:
+            if stats.first_token is None:
+                stats.first_token = time.perf_counter()
+            stats.chunks += 1
+            stats.tokens += count_tokens(chunk)
+            yield chunk
+    finally:
+        stats.finished = time.perf_counter()
+        summary = stats.as_dict()
+        logger.info(f"{label}: first token {summary['ttft_ms']}ms, {stats.tokens} tokens "
+                    f"at {summary['tokens_per_second']} tokens/s")
+
+
+class StreamTotals:
+    """Running sums over many streamed responses, for /metrics"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.responses = 0
+        self.ttft_seconds = 0.0
+        self.tokens = 0
+        self.generation_seconds = 0.0
+        self.errors = 0
+
+    def add(self, stats: StreamStats):
+        with self.lock:
+            self.responses += 1
+            self.tokens += stats.tokens
+            if stats.first_token is not None:
+                self.ttft_seconds += stats.ttft
+                self.generation_seconds += stats.finished - stats.first_token
+
+    def add_error(self):
+        with self.lock:
+            self.errors += 1
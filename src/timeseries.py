@@ -0,0 +1,551 @@
+import re
+import sys
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+# Numeric biofeedback fields stored as columns; anything else is kept as an extra
+SERIES_FIELDS = ("heart_rate", "stress_level", "sleep_quality", "steps")
+MISSING = float("nan")
+RECORD_KEYS = frozenset(SERIES_FIELDS + ("id", "user_id", "timestamp"))
+
+# Bucket widths of the aggregates older readings are rolled up into
+ROLLUP_RESOLUTIONS = {"hourly": 3_600_000_000, "daily": 86_400_000_000}
+# Per-bucket aggregate columns: reading count, then present count/sum/min/max per field
+ROLLUP_KEYS = ("count",) + tuple(f"{field}_{stat}" for field in SERIES_FIELDS for stat in ("n", "sum", "min", "max"))
+
+DURATION_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+DURATION_PATTERN = re.compile(r"^\s*(\d+)\s*([smhdw])\s*$")
+
+
+def to_epoch_us(value: Union[datetime, str, int, float]) -> int:
+    """Convert a datetime, ISO string or epoch seconds to epoch microseconds"""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if isinstance(value, datetime):
+        return int(value.replace(microsecond=0).timestamp()) * 1_000_000 + value.microsecond
+    return int(value * 1_000_000)
+
+
+def from_epoch_us(us: int) -> str:
+    """Convert epoch microseconds back to the ISO format used by the API"""
+    return datetime.fromtimestamp(us // 1_000_000).replace(microsecond=us % 1_000_000).isoformat()
+
+
+def parse_duration(text: str) -> int:
+    """Parse durations like '90s', '15m', '24h' or '7d' into microseconds"""
+    match = DURATION_PATTERN.match(text)
+    if not match:
+        raise ValueError(f"Invalid duration '{text}'. Use a number followed by one of: {', '.join(DURATION_UNITS)}")
+    amount, unit = match.groups()
+    return int(amount) * DURATION_UNITS[unit] * 1_000_000
+
+
+def series_values(record: Dict[str, Any]) -> List[float]:
+    """Numeric field values of a reading, NaN where missing; raises ValueError if not numeric"""
+    values = []
+    for field in SERIES_FIELDS:
+        value = record.get(field)
+        values.append(MISSING if value is None else float(value))
+    return values
+
+
+def _clean(value: float):
+    """Render a stored float the way the client sent it"""
+    return int(value) if value.is_integer() else value
+
+
+def pack_ids(ids: List[str]) -> Optional[bytes]:
+    """16 bytes per id if every id is a lowercase canonical UUID string, else None"""
+    joined = "".join(ids)
+    if len(joined) != 36 * len(ids):
+        return None
+    dashes = "-" * len(ids)
+    if any(joined[offset::36] != dashes for offset in (8, 13, 18, 23)):
+        return None
+    digits = joined.replace("-", "")
+    try:
+        packed = bytes.fromhex(digits)
+    except ValueError:
+        return None
+    return packed if len(packed) == 16 * len(ids) and packed.hex() == digits else None
+
+
+def unpack_ids(packed: bytes) -> List[str]:
+    """UUID strings of ids packed by pack_ids"""
+    digits = packed.hex()
+    return [
+        f"{digits[i:i + 8]}-{digits[i + 8:i + 12]}-{digits[i + 12:i + 16]}-{digits[i + 16:i + 20]}-{digits[i + 20:i + 32]}"
+        for i in range(0, len(digits), 32)
+    ]
+
+
+class IdColumn:
+    """Reading ids of a series in order
+
+    UUID ids, which is what the API assigns, are packed into one bytearray
+    at 16 bytes each instead of a 36-character string object per reading.
+    The first id that is not a UUID switches the column to a plain list.
+    Slicing copies bytes and ids are only decoded when iterated or indexed.
+    """
+
+    __slots__ = ("packed", "strings")
+
+    def __init__(self, ids: Iterable[str] = ()):
+        self.packed = bytearray()
+        self.strings: Optional[List[str]] = None
+        self.extend(list(ids))
+
+    def __len__(self) -> int:
+        return len(self.strings) if self.strings is not None else len(self.packed) // 16
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.strings if self.strings is not None else unpack_ids(self.packed))
+
+    def __getitem__(self, index: Union[int, slice]):
+        if isinstance(index, slice):
+            column = IdColumn()
+            if self.strings is not None:
+                column.strings = self.strings[index]
+            else:
+                start, stop, _ = index.indices(len(self))
+                column.packed = self.packed[start * 16:max(start, stop) * 16]
+            return column
+        if self.strings is not None:
+            return self.strings[index]
+        index = range(len(self))[index]
+        return unpack_ids(self.packed[index * 16:index * 16 + 16])[0]
+
+    def __delitem__(self, index: slice):
+        if self.strings is not None:
+            del self.strings[index]
+        else:
+            start, stop, _ = index.indices(len(self))
+            del self.packed[start * 16:max(start, stop) * 16]
+
+    def _unpack_all(self):
+        self.strings = list(self)
+        self.packed = bytearray()
+
+    def append(self, record_id: str):
+        self.insert(len(self), record_id)
+
+    def insert(self, position: int, record_id: str):
+        if self.strings is None:
+            packed = pack_ids([record_id])
+            if packed is not None:
+                self.packed[position * 16:position * 16] = packed
+                return
+            self._unpack_all()
+        self.strings.insert(position, record_id)
+
+    def extend(self, ids: List[str]):
+        if self.strings is None:
+            packed = pack_ids(ids)
+            if packed is not None:
+                self.packed += packed
+                return
+            self._unpack_all()
+        self.strings.extend(ids)
+
+    def index(self, record_id: str, start: int = 0, stop: Optional[int] = None) -> int:
+        stop = len(self) if stop is None else stop
+        if self.strings is not None:
+            return self.strings.index(record_id, start, stop)
+        packed = pack_ids([record_id])
+        offset = -1 if packed is None else self.packed.find(packed, start * 16, stop * 16)
+        # A match must start on an id boundary
+        while offset != -1 and offset % 16:
+            offset = self.packed.find(packed, offset + 1, stop * 16)
+        if offset == -1:
+            raise ValueError(f"{record_id} is not in the series")
+        return offset // 16
+
+    def nbytes(self) -> int:
+        if self.strings is not None:
+            return sys.getsizeof(self.strings) + sum(sys.getsizeof(record_id) for record_id in self.strings)
+        return sys.getsizeof(self.packed)
+
+
+class BiofeedbackSeries:
+    """One user's biofeedback readings held as parallel arrays sorted by time
+
+    Timestamps are epoch microseconds in an ``array('q')`` and each numeric
+    field is an ``array('d')`` with NaN for missing values. Readings arriving
+    in time order are appended in amortized O(1); late readings are inserted
+    at their sorted position so range queries can use binary search.
+
+    The arrays are changed one after another, so writers hold ``lock``
+    while changing them and readers while copying rows out; records are
+    built from the copies after the lock is released.
+    """
+
+    def __init__(self, user_id: str):
+        self.user_id = user_id
+        self.timestamps = array("q")
+        self.ids = IdColumn()
+        self.columns = {field: array("d") for field in SERIES_FIELDS}
+        self.extras: Dict[str, Dict[str, Any]] = {}
+        self.rollups = {name: RollupSeries(bucket_us) for name, bucket_us in ROLLUP_RESOLUTIONS.items()}
+        self.version = 0
+        self.lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def append(self, record_id: str, record: Dict[str, Any]):
+        """Add a reading, keeping the arrays sorted by timestamp"""
+        ts = to_epoch_us(record["timestamp"])
+        values = series_values(record)
+        extra = {k: v for k, v in record.items() if k not in RECORD_KEYS}
+        with self.lock:
+            position = len(self.timestamps)
+            if position and ts < self.timestamps[-1]:
+                position = bisect_right(self.timestamps, ts)
+            if position == len(self.timestamps):
+                self.timestamps.append(ts)
+                self.ids.append(record_id)
+                for field, value in zip(SERIES_FIELDS, values):
+                    self.columns[field].append(value)
+            else:
+                self.timestamps.insert(position, ts)
+                self.ids.insert(position, record_id)
+                for field, value in zip(SERIES_FIELDS, values):
+                    self.columns[field].insert(position, value)
+            if extra:
+                self.extras[record_id] = extra
+            self.version += 1
+
+    def extend(self, rows: List[Tuple[str, Dict[str, Any]]]):
+        """Add many readings; in-order batches are appended column by column"""
+        timestamps = [to_epoch_us(record["timestamp"]) for _, record in rows]
+        in_order = all(a <= b for a, b in zip(timestamps, timestamps[1:]))
+        values = [series_values(record) for _, record in rows] if in_order else None
+        with self.lock:
+            if not in_order or (len(self.timestamps) and timestamps and timestamps[0] < self.timestamps[-1]):
+                for record_id, record in rows:
+                    self.append(record_id, record)
+                return
+            self.timestamps.extend(timestamps)
+            for i, field in enumerate(SERIES_FIELDS):
+                self.columns[field].extend([v[i] for v in values])
+            self.ids.extend([record_id for record_id, _ in rows])
+            for record_id, record in rows:
+                if len(record) > len(RECORD_KEYS) or not record.keys() <= RECORD_KEYS:
+                    extra = {k: v for k, v in record.items() if k not in RECORD_KEYS}
+                    if extra:
+                        self.extras[record_id] = extra
+            self.version += 1
+
+    def bounds(self, start_us: Optional[int] = None, end_us: Optional[int] = None) -> Tuple[int, int]:
+        """Return the index range of readings with start <= timestamp < end"""
+        lo = 0 if start_us is None else bisect_left(self.timestamps, start_us)
+        hi = len(self.timestamps) if end_us is None else bisect_left(self.timestamps, end_us)
+        return lo, max(lo, hi)
+
+    def columns_between(self, start_us: Optional[int] = None, end_us: Optional[int] = None) -> Dict[str, Sequence]:
+        """Return the ids, timestamps and field columns inside a time range"""
+        with self.lock:
+            return self._slice(*self.bounds(start_us, end_us))
+
+    def _slice(self, lo: int, hi: int) -> Dict[str, Sequence]:
+        columns = {field: self.columns[field][lo:hi] for field in SERIES_FIELDS}
+        columns["id"] = self.ids[lo:hi]
+        columns["timestamp"] = self.timestamps[lo:hi]
+        return columns
+
+    def records(self, start_us: Optional[int] = None, end_us: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Return readings inside a time range as API dicts"""
+        return columns_to_records(self.user_id, self.columns_between(start_us, end_us), self.extras)
+
+    def page(self, start_us: Optional[int] = None, end_us: Optional[int] = None,
+             after: Optional[Tuple[int, str]] = None, limit: Optional[int] = None,
+             fields: Optional[Tuple[str, ...]] = None) -> Tuple[List[Dict[str, Any]], Optional[List]]:
+        """Return up to ``limit`` readings after the ``(timestamp, id)`` position
+
+        The next position is None once the range is exhausted.
+        """
+        if after is not None:
+            ts, record_id = int(after[0]), str(after[1])
+        with self.lock:
+            lo, hi = self.bounds(start_us, end_us)
+            if after is not None:
+                first = bisect_left(self.timestamps, ts)
+                last = bisect_right(self.timestamps, ts)
+                try:
+                    lo = max(lo, self.ids.index(record_id, first, last) + 1)
+                except ValueError:
+                    lo = max(lo, last)
+            stop = hi if limit is None else min(hi, lo + limit)
+            columns = self._slice(lo, stop)
+            position = None if stop >= hi else [self.timestamps[stop - 1], self.ids[stop - 1]]
+        return columns_to_records(self.user_id, columns, self.extras, fields), position
+
+    def drop_before(self, cutoff_us: int, limit: Optional[int] = None) -> Dict[str, Sequence]:
+        """Remove up to ``limit`` of the oldest readings before ``cutoff_us`` and return them as columns"""
+        with self.lock:
+            stop = bisect_left(self.timestamps, cutoff_us)
+            if limit is not None:
+                stop = min(stop, limit)
+            removed = self._slice(0, stop)
+            if stop:
+                del self.timestamps[:stop]
+                for column in self.columns.values():
+                    del column[:stop]
+                del self.ids[:stop]
+                if self.extras:
+                    for record_id in removed["id"]:
+                        self.extras.pop(record_id, None)
+                self.version += 1
+            return removed
+
+    def compact(self, raw_cutoff_us: Optional[int], hourly_cutoff_us: Optional[int] = None,
+                daily_cutoff_us: Optional[int] = None, max_rows: Optional[int] = None) -> Dict[str, int]:
+        """Roll readings before ``raw_cutoff_us`` into hourly buckets, hourly buckets
+        before ``hourly_cutoff_us`` into daily ones, and drop daily buckets before
+        ``daily_cutoff_us``; a None cutoff keeps that tier forever
+
+        At most ``max_rows`` raw readings are rolled up per call so a large
+        backlog is worked off over several calls.
+        """
+        with self.lock:
+            return self._compact(raw_cutoff_us, hourly_cutoff_us, daily_cutoff_us, max_rows)
+
+    def _compact(self, raw_cutoff_us: Optional[int], hourly_cutoff_us: Optional[int],
+                 daily_cutoff_us: Optional[int], max_rows: Optional[int]) -> Dict[str, int]:
+        rolled = merged = evicted = 0
+        if raw_cutoff_us is not None:
+            removed = self.drop_before(raw_cutoff_us, max_rows)
+            rolled = len(removed["id"])
+            if rolled:
+                self.rollups["hourly"].merge(aggregate(as_aggregates(removed), ROLLUP_RESOLUTIONS["hourly"]))
+        if hourly_cutoff_us is not None:
+            hours = self.rollups["hourly"].drop_before(hourly_cutoff_us)
+            merged = len(hours["start"])
+            if merged:
+                self.rollups["daily"].merge(aggregate(hours, ROLLUP_RESOLUTIONS["daily"]))
+        if daily_cutoff_us is not None:
+            evicted = len(self.rollups["daily"].drop_before(daily_cutoff_us)["start"])
+        return {"rolled_up": rolled, "merged_hours": merged, "evicted_buckets": evicted}
+
+    def nbytes(self) -> int:
+        """Approximate memory held by this series, including its rollups"""
+        with self.lock:
+            size = self.timestamps.buffer_info()[1] * self.timestamps.itemsize
+            size += sum(column.buffer_info()[1] * column.itemsize for column in self.columns.values())
+            size += self.ids.nbytes()
+            if self.extras:
+                size += deep_size(self.extras)
+            return size + sum(rollup.nbytes() for rollup in self.rollups.values())
+
+    def find(self, record_id: str) -> Optional[Dict[str, Any]]:
+        """Return a single reading by id"""
+        with self.lock:
+            try:
+                i = self.ids.index(record_id)
+            except ValueError:
+                return None
+            columns = self._slice(i, i + 1)
+        return columns_to_records(self.user_id, columns, self.extras)[0]
+
+    def rollup_records(self, resolution: str, start_us: Optional[int] = None,
+                       end_us: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Hourly or daily rollup buckets with start <= bucket_start < end"""
+        with self.lock:
+            return self.rollups[resolution].records(start_us, end_us)
+
+
+class RollupSeries:
+    """One user's aggregates in fixed-width buckets, as parallel arrays sorted by bucket start
+
+    Each bucket keeps the reading count and, per field, the number of
+    present values with their sum, min and max, so buckets can be merged
+    exactly and means recovered later.
+    """
+
+    def __init__(self, bucket_us: int):
+        self.bucket_us = bucket_us
+        self.starts = array("q")
+        self.values = {key: array("q" if key == "count" or key.endswith("_n") else "d") for key in ROLLUP_KEYS}
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def merge(self, buckets: Dict[str, np.ndarray]):
+        """Add aggregates already bucketed at this width, combining with existing buckets"""
+        starts = buckets["start"].tolist()
+        rows = {key: buckets[key].tolist() for key in ROLLUP_KEYS}
+        first = 0
+        # Buckets at or before the current end are merged one by one; the rest are appended in bulk
+        while first < len(starts) and len(self.starts) and starts[first] <= self.starts[-1]:
+            position = bisect_left(self.starts, starts[first])
+            if position < len(self.starts) and self.starts[position] == starts[first]:
+                for key, column in self.values.items():
+                    value = rows[key][first]
+                    if key.endswith("_min"):
+                        column[position] = min(column[position], value)
+                    elif key.endswith("_max"):
+                        column[position] = max(column[position], value)
+                    else:
+                        column[position] += value
+            else:
+                self.starts.insert(position, starts[first])
+                for key, column in self.values.items():
+                    column.insert(position, rows[key][first])
+            first += 1
+        self.starts.extend(starts[first:])
+        for key, column in self.values.items():
+            column.extend(rows[key][first:])
+
+    def drop_before(self, cutoff_us: int) -> Dict[str, np.ndarray]:
+        """Remove buckets starting before ``cutoff_us`` and return them"""
+        stop = bisect_left(self.starts, cutoff_us)
+        removed = {"start": np.array(self.starts[:stop], dtype=np.int64)}
+        for key, column in self.values.items():
+            removed[key] = np.array(column[:stop], dtype=np.int64 if column.typecode == "q" else np.float64)
+        if stop:
+            del self.starts[:stop]
+            for column in self.values.values():
+                del column[:stop]
+        return removed
+
+    def records(self, start_us: Optional[int] = None, end_us: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Buckets with start <= bucket_start < end in the downsample response format"""
+        lo = 0 if start_us is None else bisect_left(self.starts, start_us)
+        hi = len(self.starts) if end_us is None else bisect_left(self.starts, end_us)
+        buckets = []
+        for i in range(lo, max(lo, hi)):
+            bucket = {"bucket_start": from_epoch_us(self.starts[i]), "count": self.values["count"][i]}
+            for field in SERIES_FIELDS:
+                n = self.values[f"{field}_n"][i]
+                if n:
+                    bucket[field] = {
+                        "mean": round(self.values[f"{field}_sum"][i] / n, 3),
+                        "min": _clean(self.values[f"{field}_min"][i]),
+                        "max": _clean(self.values[f"{field}_max"][i])
+                    }
+            buckets.append(bucket)
+        return buckets
+
+    def nbytes(self) -> int:
+        return sum(column.buffer_info()[1] * column.itemsize for column in (self.starts, *self.values.values()))
+
+
+def as_aggregates(columns: Dict[str, Sequence]) -> Dict[str, np.ndarray]:
+    """Treat raw readings as one-reading buckets so they combine like rollups"""
+    aggregates = {"start": np.asarray(columns["timestamp"], dtype=np.int64)}
+    aggregates["count"] = np.ones(len(aggregates["start"]), dtype=np.int64)
+    for field in SERIES_FIELDS:
+        values = np.asarray(columns[field], dtype=np.float64)
+        present = ~np.isnan(values)
+        aggregates[f"{field}_n"] = present.astype(np.int64)
+        aggregates[f"{field}_sum"] = np.where(present, values, 0.0)
+        aggregates[f"{field}_min"] = np.where(present, values, np.inf)
+        aggregates[f"{field}_max"] = np.where(present, values, -np.inf)
+    return aggregates
+
+
+def aggregate(aggregates: Dict[str, np.ndarray], bucket_us: int) -> Dict[str, np.ndarray]:
+    """Combine aggregates sorted by start into epoch-aligned buckets of ``bucket_us``"""
+    starts = aggregates["start"] // bucket_us * bucket_us
+    if not len(starts):
+        return {key: values[:0] for key, values in aggregates.items()}
+    edges = np.flatnonzero(np.diff(starts, prepend=starts[0] - 1))
+    combined = {"start": starts[edges]}
+    for key in ROLLUP_KEYS:
+        reduce = np.minimum if key.endswith("_min") else np.maximum if key.endswith("_max") else np.add
+        combined[key] = reduce.reduceat(aggregates[key], edges)
+    return combined
+
+
+def deep_size(value: Any) -> int:
+    """Approximate memory of nested dicts, lists and scalars"""
+    size = sys.getsizeof(value)
+    slots = getattr(type(value), "__slots__", None)
+    if isinstance(slots, tuple) and slots:
+        size += sum(deep_size(getattr(value, name)) for name in slots if hasattr(value, name))
+    elif isinstance(value, dict):
+        size += sum(deep_size(k) + deep_size(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple)):
+        size += sum(deep_size(item) for item in value)
+    return size
+
+
+def empty_columns() -> Dict[str, Sequence]:
+    """Columns for a user without readings"""
+    columns = {field: [] for field in SERIES_FIELDS}
+    columns["id"] = []
+    columns["timestamp"] = []
+    return columns
+
+
+def columns_to_records(user_id: str, columns: Dict[str, Sequence],
+                       extras: Optional[Dict[str, Dict[str, Any]]] = None,
+                       fields: Optional[Tuple[str, ...]] = None) -> List[Dict[str, Any]]:
+    """Turn columnar readings back into one dict per reading
+
+    With ``fields`` only those keys are built, so unrequested columns are
+    never converted.
+    """
+    records = []
+    wanted = [(field, columns[field]) for field in SERIES_FIELDS if fields is None or field in fields]
+    with_user = fields is None or "user_id" in fields
+    with_timestamp = fields is None or "timestamp" in fields
+    with_extras = extras and (fields is None or any(name not in RECORD_KEYS for name in fields))
+    for i, record_id in enumerate(columns["id"]):
+        record = {"id": record_id}
+        if with_user:
+            record["user_id"] = user_id
+        if with_timestamp:
+            record["timestamp"] = from_epoch_us(columns["timestamp"][i])
+        for field, values in wanted:
+            value = values[i]
+            if value == value:  # skip NaN
+                record[field] = _clean(value)
+        if with_extras and record_id in extras:
+            extra = extras[record_id]
+            record.update(extra if fields is None else {k: v for k, v in extra.items() if k in fields})
+        records.append(record)
+    return records
+
+
+def downsample(columns: Dict[str, Sequence], bucket_us: int, origin_us: int = 0) -> List[Dict[str, Any]]:
+    """Aggregate readings into fixed-width time buckets with mean/min/max per field
+
+    Readings must be sorted by timestamp. Buckets are aligned to ``origin_us``
+    and only buckets that contain readings are returned.
+    """
+    timestamps = np.asarray(columns["timestamp"], dtype=np.int64)
+    if not len(timestamps):
+        return []
+    bucket_index = (timestamps - origin_us) // bucket_us
+    starts = np.flatnonzero(np.diff(bucket_index, prepend=bucket_index[0] - 1))
+    counts = np.diff(np.append(starts, len(timestamps)))
+    buckets = [{
+        "bucket_start": from_epoch_us(int(origin_us + b * bucket_us)),
+        "count": int(c)
+    } for b, c in zip(bucket_index[starts], counts)]
+
+    for field in SERIES_FIELDS:
+        values = np.asarray(columns[field], dtype=np.float64)
+        present = ~np.isnan(values)
+        if not present.any():
+            continue
+        n = np.add.reduceat(present.astype(np.int64), starts)
+        total = np.add.reduceat(np.where(present, values, 0.0), starts)
+        low = np.minimum.reduceat(np.where(present, values, np.inf), starts)
+        high = np.maximum.reduceat(np.where(present, values, -np.inf), starts)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = total / n
+        for i, bucket in enumerate(buckets):
+            if n[i]:
+                bucket[field] = {
+                    "mean": round(float(mean[i]), 3),
+                    "min": _clean(float(low[i])),
+                    "max": _clean(float(high[i]))
+                }
+    return buckets
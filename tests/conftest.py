@@ -0,0 +1,15 @@
+import pytest
+
+from src import llm_clients
+from src.fake_llm import FakeProvider
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    """Answer every model call from the offline fake provider, quickly and without caching"""
+    registry = llm_clients.ClientRegistry(provider="fake")
+    registry.provider = FakeProvider(latency_ms="5", chunk_ms=1)
+    monkeypatch.setattr(llm_clients, "registry", registry)
+    monkeypatch.setattr("src.llm_cache.llm_cache.default_ttl", 0.0)
+    monkeypatch.setattr("src.llm_cache.llm_cache.ttls", {})
+    return registry
@@ -0,0 +1,68 @@
+import asyncio
+import time
+
+import pytest
+
+from src import agent as agent_module
+from src.agent import WellnessAgent
+from src.context import UserSessionContext
+
+
+@pytest.fixture(params=[False, True], ids=["separate", "fused"])
+def fused(request, monkeypatch, fake_llm):
+    monkeypatch.setattr(agent_module, "FUSED_TOOLS", request.param)
+    return request.param
+
+
+def make_agent(monkeypatch, specialist):
+    """Agent whose routing waits on a slow "model" before picking ``specialist``"""
+    agent = WellnessAgent(UserSessionContext(name="Sam", uid=1))
+    routed = []
+
+    async def detect(input_text):
+        await asyncio.sleep(0.05)
+        routed.append(specialist)
+        return specialist
+
+    reply = agent.agenerate_response
+    drafts = []
+
+    async def draft(input_text, tool_result=None):
+        drafts.append(bool(routed))
+        return await reply(input_text, tool_result)
+
+    monkeypatch.setattr(agent, "_detect_specialized_agent_needed", detect)
+    monkeypatch.setattr(agent, "agenerate_response", draft)
+    for specialized in agent.specialized_agents.values():
+        monkeypatch.setattr(specialized, "process", lambda text, context: {"response": "specialist reply"})
+    return agent, drafts
+
+
+def test_losing_speculative_tool_leaves_context_alone(monkeypatch, fused):
+    agent, drafts = make_agent(monkeypatch, "sleep")
+
+    result = asyncio.run(agent.aprocess_user_input("I feel sad and tired all the time"))
+    # Let a tool thread that lost the race finish
+    time.sleep(0.1)
+
+    assert result["agent_type"] == "sleep"
+    assert result["response"] == "specialist reply"
+    assert agent.context.mood is None
+    assert not [log for log in agent.context.progress_logs if log["type"].startswith("tool")]
+    if fused:
+        # The fused tool turn brings its own reply, so no draft is made while routing is pending
+        assert all(drafts)
+
+
+def test_winning_tool_updates_context(monkeypatch, fused):
+    agent, drafts = make_agent(monkeypatch, None)
+
+    result = asyncio.run(agent.aprocess_user_input("I feel sad today"))
+
+    assert result["status"] == "success"
+    assert result["tool"] == "mood_detector"
+    assert result["response"]
+    assert agent.context.mood == "sad"
+    assert [log["type"] for log in agent.context.progress_logs] == ["tool_start", "tool_end"]
+    if fused:
+        assert drafts == []
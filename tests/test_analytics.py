@@ -0,0 +1,56 @@
+import numpy as np
+
+from src.analytics import StatsCache, window_stats
+
+
+def test_min_and_max_match_downsampled_types():
+    timestamps = np.array([0, 1_000_000, 2_000_000], dtype=np.int64)
+    values = np.array([[60.0, 72.0, 65.0], [3.5, 4.0, np.nan], [np.nan, np.nan, np.nan]])
+    stats = window_stats(timestamps, values, 2_000_000)
+    assert stats["heart_rate"]["min"] == 60 and type(stats["heart_rate"]["min"]) is int
+    assert stats["heart_rate"]["max"] == 72 and type(stats["heart_rate"]["max"]) is int
+    assert stats["stress_level"]["min"] == 3.5 and type(stats["stress_level"]["min"]) is float
+    assert "sleep_quality" not in stats
+
+
+def test_put_is_dropped_when_invalidated_during_compute():
+    cache = StatsCache(max_age=60)
+    generation = cache.generation()
+    cache.invalidate("u1")
+    cache.put("u1", "1h", "stale", generation)
+    assert cache.get("u1", "1h") is None
+    cache.put("u1", "1h", "fresh", cache.generation())
+    assert cache.get("u1", "1h") == "fresh"
+
+
+def test_other_users_writes_keep_stats():
+    cache = StatsCache(max_age=60)
+    cache.put("u1", "1h", "cached", cache.generation())
+    generation = cache.generation()
+    cache.invalidate("u2")
+    cache.put("u1", "24h", "computed", generation)
+    assert cache.get("u1", "1h") == "cached"
+    assert cache.get("u1", "24h") == "computed"
+
+
+def test_inactive_users_are_evicted():
+    cache = StatsCache(max_age=0)
+    for i in range(100):
+        user = f"u{i}"
+        generation = cache.generation()
+        cache.invalidate(user)
+        cache.put(user, "1h", {"count": i}, generation)
+    cache.invalidate("last")
+    assert len(cache.entries) == 0
+    assert len(cache.generations) <= 1
+
+
+def test_eviction_keeps_stale_results_out():
+    cache = StatsCache(max_age=0)
+    generation = cache.generation()
+    cache.invalidate("u1")
+    cache.invalidate("u2")
+    assert "u1" not in cache.generations
+    cache.max_age = 60
+    cache.put("u1", "1h", "stale", generation)
+    assert cache.get("u1", "1h") is None
@@ -0,0 +1,93 @@
+import asyncio
+import json
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src.batching import MicroBatcher, parse_answers
+from src.llm_cache import LLMCache
+
+ITEM = re.compile(r"^\d+\. (\".*\")$", re.MULTILINE)
+
+
+class Response:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class EchoModel:
+    """Answers each item (or a lone prompt's input) with its text upper-cased"""
+
+    model_name = "models/echo"
+
+    def __init__(self, garbled: bool = False):
+        self.garbled = garbled
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def answer(self, prompt: str) -> Response:
+        with self.lock:
+            self.calls.append(prompt)
+        items = [json.loads(item) for item in ITEM.findall(prompt)]
+        if items:
+            return Response("not json" if self.garbled else json.dumps([item.upper() for item in items]))
+        return Response(prompt.rsplit("Input: ", 1)[1].upper())
+
+
+class SyncModel(EchoModel):
+    def generate_content(self, prompt: str) -> Response:
+        return self.answer(prompt)
+
+
+class AsyncModel(EchoModel):
+    async def generate_content_async(self, prompt: str) -> Response:
+        await asyncio.sleep(0.01)
+        return self.answer(prompt)
+
+
+def batcher(**options) -> MicroBatcher:
+    return MicroBatcher("test", "Upper-case each text.", cache=LLMCache(path=None, ttls={"test": 0.0}), **options)
+
+
+def test_parse_answers():
+    assert parse_answers('```json\n["a", {"b": 1}]\n```', 2) == ["a", "{'b': 1}"]
+    with pytest.raises(ValueError):
+        parse_answers('["a"]', 2)
+
+
+def test_coroutines_are_batched_without_blocking_calls():
+    model, micro = AsyncModel(), batcher(max_size=16, max_wait_ms=20)
+
+    async def ask_all():
+        return await asyncio.gather(*(micro.agenerate(model, f"Upper-case.\nInput: msg{i}", f"msg{i}")
+                                      for i in range(20)))
+
+    assert asyncio.run(ask_all()) == [f"MSG{i}" for i in range(20)]
+    assert len(model.calls) < 20
+    assert micro.stats()["batches"] >= 1
+
+
+def test_async_batch_that_cannot_be_split_falls_back_to_single_prompts():
+    model, micro = AsyncModel(garbled=True), batcher(max_size=8, max_wait_ms=20)
+
+    async def ask_all():
+        return await asyncio.gather(*(micro.agenerate(model, f"Upper-case.\nInput: m{i}", f"m{i}") for i in range(4)))
+
+    assert asyncio.run(ask_all()) == ["M0", "M1", "M2", "M3"]
+    assert micro.stats()["split_failures"] == 1
+
+
+def test_threads_are_batched_with_generate_content():
+    model, micro = SyncModel(), batcher(max_size=16, max_wait_ms=20)
+    with ThreadPoolExecutor(max_workers=10) as pool:
+        answers = list(pool.map(lambda i: micro.generate(model, f"Upper-case.\nInput: t{i}", f"t{i}"), range(10)))
+    assert answers == [f"T{i}" for i in range(10)]
+    assert len(model.calls) < 10
+
+
+def test_batch_size_one_sends_each_prompt_alone():
+    model, micro = AsyncModel(), batcher(max_size=1)
+    assert asyncio.run(micro.agenerate(model, "Upper-case.\nInput: solo", "solo")) == "SOLO"
+    assert len(model.calls) == 1
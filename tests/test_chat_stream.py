@@ -0,0 +1,76 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.backend_main import app
+from src.llm_cache import LLMCache
+from src.llm_clients import ModelStats, TrackedModel
+
+
+class Chunk:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class SDKModel:
+    """Streams the way google-generativeai does: ``generate_content(prompt, stream=True)``"""
+
+    def __init__(self, chunks=("Hello ", "there"), error=None):
+        self.chunks = chunks
+        self.error = error
+
+    def generate_content(self, prompt, stream=False, **params):
+        if self.error is not None:
+            raise self.error
+        if stream:
+            return iter([Chunk(text) for text in self.chunks])
+        return Chunk("".join(self.chunks))
+
+
+def events(body: str):
+    """(event, data) pairs of a server-sent event stream"""
+    parsed = []
+    for block in body.split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines() if ": " in line)
+        if "event" in lines:
+            parsed.append((lines["event"], json.loads(lines["data"])))
+    return parsed
+
+
+@pytest.fixture
+def client():
+    with TestClient(app) as client:
+        yield client
+
+
+def test_tracked_model_streams_with_generate_content():
+    stats = ModelStats()
+    model = TrackedModel(SDKModel(), stats)
+    cache = LLMCache(path=None)
+
+    assert list(cache.stream(model, "hi", "test")) == ["Hello ", "there"]
+    assert stats.streams == 1
+    # The finished stream is cached and replayed as one chunk
+    assert list(cache.stream(model, "hi", "test")) == ["Hello there"]
+
+
+def test_chat_stream_relays_chunks(client, monkeypatch):
+    monkeypatch.setattr("utils.streaming.get_model", lambda: TrackedModel(SDKModel(), ModelStats()))
+    monkeypatch.setattr("src.llm_cache.llm_cache.ttls", {"response_streamer": 0.0})
+
+    response = client.post("/chat/stream", json={"message": "How do I sleep better?"})
+
+    parsed = events(response.text)
+    assert [data["text"] for event, data in parsed if event == "chunk"] == ["Hello ", "there"]
+    assert parsed[-1][0] == "done"
+
+
+def test_chat_stream_reports_model_errors_as_error_event(client, monkeypatch):
+    failing = TrackedModel(SDKModel(error=RuntimeError("quota exceeded")), ModelStats())
+    monkeypatch.setattr("utils.streaming.get_model", lambda: failing)
+
+    response = client.post("/chat/stream", json={"message": "How do I sleep better?"})
+
+    assert response.status_code == 200
+    assert [event for event, _ in events(response.text)] == ["error"]
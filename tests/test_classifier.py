@@ -0,0 +1,37 @@
+import asyncio
+import time
+from pathlib import Path
+
+from src import classifier
+from src.classifier import FallbackClassifier, HashedNgramClassifier
+
+EXAMPLES = Path(__file__).parent.parent / "src" / "specialist_examples.tsv"
+
+
+def test_first_aclassify_trains_off_the_event_loop(monkeypatch):
+    train = HashedNgramClassifier.train
+
+    def slow_train(*args, **kwargs):
+        time.sleep(0.3)
+        return train(*args, **kwargs)
+
+    monkeypatch.setattr(classifier.HashedNgramClassifier, "train", slow_train)
+    model = FallbackClassifier(EXAMPLES, lambda text: None, threshold=0.0)
+
+    async def scenario():
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        ticker = asyncio.ensure_future(tick())
+        await asyncio.sleep(0)
+        await model.aclassify("My knee hurts after running")
+        ticker.cancel()
+        return ticks
+
+    assert asyncio.run(scenario()) > 10
+    assert model.model is not None
@@ -0,0 +1,50 @@
+import asyncio
+import random
+
+import pytest
+
+from src.fake_llm import FakeProvider, parse_latency, respond
+from src.llm_cache import LLMCache
+from src.llm_clients import get_model
+
+
+def test_fake_model_offers_only_sdk_methods():
+    model = FakeProvider(latency_ms="0").model("gemini-pro")
+    assert not hasattr(model, "generate_content_stream")
+
+
+def test_stream_true_yields_chunks_of_the_full_response():
+    model = FakeProvider(latency_ms="0", chunk_ms=0).model("gemini-pro")
+    prompt = "Respond to the user.\nUser message: hi"
+
+    response = model.generate_content(prompt, stream=True)
+    with pytest.raises(ValueError):
+        response.text
+    chunks = [chunk.text for chunk in response]
+
+    assert len(chunks) > 1
+    assert "".join(chunks) == response.text == respond(prompt)
+    assert model.generate_content(prompt).text == respond(prompt)
+
+
+def test_cache_stream_through_registry(fake_llm):
+    chunks = list(LLMCache(path=None, ttls={"chat": 0.0}).stream(get_model(), "Say hello", "chat"))
+    assert "".join(chunks) == respond("Say hello")
+    assert fake_llm.summary()["calls"]["gemini-pro"]["streams"] == 1
+
+
+def test_async_and_sync_answers_match():
+    model = FakeProvider(latency_ms="0").model("gemini-pro")
+    prompt = "Determine the user's mood.\nUser message: I'm so happy"
+    assert asyncio.run(model.generate_content_async(prompt)).text == model.generate_content(prompt).text
+
+
+@pytest.mark.parametrize("spec", ["250", "uniform:100-200", "normal:300,50", "lognormal:400,0.5", "exponential:100"])
+def test_parse_latency(spec):
+    delay = parse_latency(spec)(random.Random(0))
+    assert delay >= 0
+
+
+def test_parse_latency_rejects_unknown_spec():
+    with pytest.raises(ValueError):
+        parse_latency("poisson:3")
@@ -0,0 +1,79 @@
+import asyncio
+import threading
+
+from src.llm_cache import LLMCache, cache_key
+
+
+class Response:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class CountingModel:
+    model_name = "models/counting"
+
+    def __init__(self):
+        self.calls = 0
+
+    def generate_content(self, prompt: str, **params) -> Response:
+        self.calls += 1
+        return Response(f"answer {self.calls}")
+
+    async def generate_content_async(self, prompt: str, **params) -> Response:
+        return self.generate_content(prompt, **params)
+
+
+def test_prompts_differing_only_in_whitespace_share_a_key():
+    assert cache_key("m", "Hello\n    world") == cache_key("m", "Hello world")
+    assert cache_key("m", "Hello world") != cache_key("m", "Hello world", {"temperature": 0.5})
+
+
+def test_disk_tier_survives_a_restart(tmp_path):
+    path = str(tmp_path / "llm.db")
+    model = CountingModel()
+    first = LLMCache(path=path, ttls={"faq": 3600.0})
+    assert first.generate(model, "What is a calorie?", "faq") == "answer 1"
+    first.close()
+
+    second = LLMCache(path=path, ttls={"faq": 3600.0})
+    assert second.generate(model, "What is a calorie?", "faq") == "answer 1"
+    assert model.calls == 1
+    assert second.stats()["disk_hits"] == 1
+
+
+def test_async_disk_access_runs_off_the_event_loop(tmp_path, monkeypatch):
+    cache = LLMCache(path=str(tmp_path / "llm.db"), ttls={"faq": 3600.0})
+    threads = []
+    for name in ("_disk_get", "_disk_put"):
+        method = getattr(cache, name)
+
+        def record(*args, method=method):
+            threads.append(threading.get_ident())
+            return method(*args)
+
+        monkeypatch.setattr(cache, name, record)
+
+    async def ask():
+        loop_thread = threading.get_ident()
+        text = await cache.agenerate(CountingModel(), "What is a calorie?", "faq")
+        return loop_thread, text
+
+    loop_thread, text = asyncio.run(ask())
+    assert text == "answer 1"
+    assert len(threads) == 2 and loop_thread not in threads
+
+
+def test_chat_replies_are_not_cached_by_default():
+    cache = LLMCache(path=None, ttls={})
+    model = CountingModel()
+    for call_site in ("reply", "response_streamer"):
+        assert cache.generate(model, "I had a rough day", call_site) != cache.generate(model, "I had a rough day",
+                                                                                     call_site)
+
+
+def test_zero_ttl_disables_a_call_site():
+    cache = LLMCache(path=None, ttls={"faq": 0.0})
+    model = CountingModel()
+    cache.generate(model, "Hi", "faq")
+    cache.generate(model, "Hi", "faq")
+    assert model.calls == 2
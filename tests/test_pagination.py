@@ -0,0 +1,77 @@
+import base64
+import json
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.backend_main import app
+from src.pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
+
+
+def raw_cursor(value) -> str:
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).rstrip(b"=").decode()
+
+
+@pytest.mark.parametrize("position", [0, 41, [1700000000000000, "a1b2"], [1700000000000000, 17]])
+def test_cursor_round_trip(position):
+    assert decode_cursor(encode_cursor(position)) == position
+
+
+@pytest.mark.parametrize("cursor", [
+    "e30",  # {}
+    raw_cursor([]),
+    raw_cursor([1]),
+    raw_cursor([1, 2, 3]),
+    raw_cursor(["1", "a"]),
+    raw_cursor([1, None]),
+    raw_cursor(1.5),
+    raw_cursor(True),
+    raw_cursor("abc"),
+    raw_cursor(None),
+    "not base64!",
+    "bm90IGpzb24",  # "not json"
+])
+def test_malformed_cursor_is_rejected(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+def test_no_cursor_starts_at_the_beginning():
+    assert decode_cursor(None) is None
+    assert decode_cursor("") is None
+
+
+@pytest.fixture
+def client():
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def user_id(client):
+    response = client.post("/users/", json={"name": "Page", "email": f"{uuid.uuid4()}@example.com"})
+    user_id = response.json()["user_id"]
+    for heart_rate in range(60, 65):
+        client.post("/biofeedback/", json={"user_id": user_id, "heart_rate": heart_rate,
+                                           "stress_level": 3, "sleep_quality": 7})
+    return user_id
+
+
+def test_biofeedback_pages_follow_the_cursor(client, user_id):
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        response = client.get(f"/biofeedback/user/{user_id}", params=params)
+        assert response.status_code == 200
+        seen += [reading["heart_rate"] for reading in response.json()]
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if cursor is None:
+            break
+    assert seen == [60, 61, 62, 63, 64]
+
+
+@pytest.mark.parametrize("cursor", ["e30", raw_cursor([1]), raw_cursor(7), raw_cursor(["x", "y"])])
+def test_malformed_cursor_is_a_bad_request(client, user_id, cursor):
+    response = client.get(f"/biofeedback/user/{user_id}", params={"cursor": cursor})
+    assert response.status_code == 400
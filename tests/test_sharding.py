@@ -0,0 +1,118 @@
+import asyncio
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import httpx
+import pytest
+
+from src import sharding
+from src.sharding import Dispatcher, merge_metrics, shard_for, shard_path
+
+ROOT = Path(__file__).parent.parent
+
+
+def test_shard_path_adds_index_before_extension():
+    assert shard_path("wellness.db", 2) == "wellness.shard2.db"
+    assert shard_path("data/wellness-data", 0) == "data/wellness-data.shard0"
+
+
+def test_shard_for_is_stable_and_in_range():
+    keys = [f"user{i}" for i in range(100)]
+    owners = [shard_for(key, 4) for key in keys]
+    assert owners == [shard_for(key, 4) for key in keys]
+    assert set(owners) == {0, 1, 2, 3}
+    assert shard_for("user1", 1) == 0
+
+
+@pytest.mark.parametrize("engine, option", [("sqlite", "SQLITE_PATH"), ("durable", "DATA_DIR")])
+def test_store_options_give_each_shard_its_own_path(monkeypatch, engine, option):
+    monkeypatch.setattr(sharding, option, "store")
+    monkeypatch.setattr(sharding, "SHARD_COUNT", 2)
+    paths = set()
+    for index in range(2):
+        monkeypatch.setattr(sharding, "SHARD_INDEX", index)
+        paths.add(sharding.store_options(engine)["path"])
+    assert paths == {"store.shard0", "store.shard1"}
+
+
+def test_store_options_unsharded_or_in_memory(monkeypatch):
+    assert sharding.store_options("sqlite") == {}
+    monkeypatch.setattr(sharding, "SHARD_COUNT", 2)
+    assert sharding.store_options("memory") == {}
+
+
+@pytest.mark.parametrize("engine, variable, name", [
+    ("sqlite", "WELLNESS_SQLITE_PATH", "wellness.db"),
+    ("durable", "WELLNESS_DATA_DIR", "wellness-data"),
+])
+def test_shard_worker_opens_its_own_files(tmp_path, engine, variable, name):
+    # Like a spawned worker: storage is imported before the shard is configured
+    script = (
+        "import src.storage\n"
+        "from src.sharding import configure_shard\n"
+        "configure_shard(1, 2)\n"
+        "from src.backend_main import db\n"
+        "print(db.path)\n"
+    )
+    env = dict(os.environ, WELLNESS_STORAGE_ENGINE=engine, **{variable: str(tmp_path / name)})
+    env.pop("WELLNESS_SHARD_INDEX", None)
+    env.pop("WELLNESS_SHARD_COUNT", None)
+    result = subprocess.run([sys.executable, "-c", script], cwd=ROOT, env=env,
+                            capture_output=True, text=True, timeout=60, check=True)
+    assert result.stdout.strip().splitlines()[-1] == shard_path(str(tmp_path / name), 1)
+
+
+def test_merge_metrics_labels_each_shard():
+    shard = "\n".join([
+        "# HELP requests_total Requests",
+        "# TYPE requests_total counter",
+        'requests_total{route="/health"} 3',
+        "# HELP in_flight Requests in flight",
+        "# TYPE in_flight gauge",
+        "in_flight 1",
+    ])
+    merged = merge_metrics([shard, shard.replace(" 3", " 5")]).splitlines()
+    assert merged.count("# TYPE requests_total counter") == 1
+    assert 'requests_total{shard="0",route="/health"} 3' in merged
+    assert 'requests_total{shard="1",route="/health"} 5' in merged
+    assert 'in_flight{shard="0"} 1' in merged and 'in_flight{shard="1"} 1' in merged
+
+
+def test_dispatcher_closes_stream_when_client_leaves():
+    closed = asyncio.Event()
+
+    async def events():
+        try:
+            while True:
+                yield b": keepalive\n\n"
+                await asyncio.sleep(0.01)
+        finally:
+            closed.set()
+
+    async def scenario():
+        dispatcher = Dispatcher([])
+        dispatcher.clients = [httpx.AsyncClient(base_url="http://shard", transport=httpx.MockTransport(
+            lambda request: httpx.Response(200, headers={"content-type": "text/event-stream"}, content=events())))]
+        left = asyncio.Event()
+        sent, requests = [], iter([{"type": "http.request", "body": b"", "more_body": False}])
+
+        async def receive():
+            for message in requests:
+                return message
+            await left.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            sent.append(message)
+            if len(sent) == 3:
+                left.set()
+
+        scope = {"type": "http", "method": "GET", "path": "/biofeedback/user/u1/stream", "query_string": b"",
+                 "headers": []}
+        await asyncio.wait_for(dispatcher(scope, receive, send), timeout=5)
+        await asyncio.wait_for(closed.wait(), timeout=5)
+        assert sent[0]["status"] == 200
+
+    asyncio.run(scenario())
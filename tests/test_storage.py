@@ -0,0 +1,229 @@
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.storage import DuplicateEmailError, DurableStore, IndexedStore, SQLiteStore, create_store
+
+
+def goal(user_id: str, created_at: datetime) -> dict:
+    return {"user_id": user_id, "description": "Walk more", "target": "10k steps",
+            "timeframe": "1 month", "created_at": created_at.isoformat()}
+
+
+def reading(user_id: str, second: int) -> dict:
+    return {"user_id": user_id, "timestamp": (datetime(2024, 1, 1) + timedelta(seconds=second)).isoformat(),
+            "heart_rate": 60 + second, "stress_level": 3, "sleep_quality": 7}
+
+
+def epoch(value: datetime) -> int:
+    return int(value.timestamp() * 1_000_000)
+
+
+@pytest.fixture(params=["memory", "sqlite", "durable"])
+def store(request, tmp_path):
+    """Each storage engine, which must all pass the same contract tests"""
+    options = {"memory": {}, "sqlite": {"path": str(tmp_path / "wellness.db")},
+               "durable": {"path": str(tmp_path / "data"), "snapshot_interval": 3600}}[request.param]
+    store = create_store(request.param, **options)
+    yield store
+    store.close()
+
+
+def test_insert_and_get(store):
+    store.insert("users", "u0", {"name": "n", "email": "a@example.com"})
+    store.insert("goals", "g0", goal("u0", datetime(2024, 1, 1)))
+    store.insert("biofeedback", "b0", reading("u0", 0))
+    assert store.get("users", "u0") == {"name": "n", "email": "a@example.com"}
+    assert store.get("goals", "g0") == goal("u0", datetime(2024, 1, 1))
+    assert store.get("biofeedback", "b0")["heart_rate"] == 60
+    assert store.get("goals", "missing") is None
+    assert store.count("goals") == 1 and store.count("biofeedback") == 1
+
+
+def test_list_for_user_in_insertion_order(store):
+    for i in range(6):
+        store.insert("goals", f"g{i}", goal(f"u{i % 2}", datetime(2024, 1, 6 - i)))
+    assert [g["created_at"] for g in store.list_for_user("goals", "u0")] == \
+        [datetime(2024, 1, d).isoformat() for d in (6, 4, 2)]
+    assert store.list_for_user("goals", "nobody") == []
+
+
+def test_page_for_user_walks_every_record_once(store):
+    for i in range(7):
+        store.insert("goals", f"g{i}", goal("u0", datetime(2024, 1, 1 + i)))
+    seen, after = [], None
+    while True:
+        page, after = store.page_for_user("goals", "u0", after=after, limit=3, fields=("created_at",))
+        seen += [g["created_at"] for g in page]
+        if after is None:
+            break
+    assert seen == [datetime(2024, 1, 1 + i).isoformat() for i in range(7)]
+
+
+def test_biofeedback_range_and_page(store):
+    store.insert_many("biofeedback", [(f"b{i}", reading("u0", i)) for i in (4, 0, 3, 1, 2)])
+    store.insert("biofeedback", "other", reading("u1", 2))
+    start = datetime(2024, 1, 1)
+    in_range = store.biofeedback_range("u0", epoch(start + timedelta(seconds=1)), epoch(start + timedelta(seconds=4)))
+    assert [r["heart_rate"] for r in in_range] == [61, 62, 63]
+    page, after = store.biofeedback_page("u0", limit=2)
+    rest, end = store.biofeedback_page("u0", after=after)
+    assert [r["heart_rate"] for r in page + rest] == [60, 61, 62, 63, 64] and end is None
+    assert list(store.biofeedback_columns("u0")["heart_rate"]) == [60, 61, 62, 63, 64]
+
+
+def test_duplicate_email_is_rejected(store):
+    store.insert("users", "u0", {"name": "n", "email": "Someone@Example.com"})
+    with pytest.raises(DuplicateEmailError):
+        store.insert("users", "u1", {"name": "m", "email": "someone@example.com "})
+    assert store.find_user_by_email("SOMEONE@example.com") == "u0"
+    assert store.count("users") == 1
+
+
+def test_evict_before(store):
+    start = datetime(2024, 1, 1)
+    for i in range(10):
+        store.insert("goals", f"g{i}", goal(f"u{i % 2}", start + timedelta(days=i)))
+    cutoff = epoch(start + timedelta(days=5))
+    assert store.evict_before("goals", cutoff, max_rows=3) == 3
+    assert store.evict_before("goals", cutoff) == 2
+    assert store.count("goals") == 5
+    assert [g["created_at"] for g in store.list_for_user("goals", "u1")] == \
+        [(start + timedelta(days=d)).isoformat() for d in (5, 7, 9)]
+    with pytest.raises(ValueError):
+        store.evict_before("users", cutoff)
+
+
+def test_memory_usage_during_concurrent_inserts():
+    store = IndexedStore()
+
+    def write(worker: int):
+        for i in range(2000):
+            store.insert("users", f"u{worker}-{i}", {"name": "n", "email": f"{worker}-{i}@example.com"})
+            store.insert("goals", f"g{worker}-{i}", goal(f"u{worker}-{i}", datetime.now()))
+
+    writers = [threading.Thread(target=write, args=(n,)) for n in range(4)]
+    for writer in writers:
+        writer.start()
+    try:
+        while any(writer.is_alive() for writer in writers):
+            store.memory_usage()
+    finally:
+        for writer in writers:
+            writer.join()
+    assert store.memory_usage()["goals"] > 0
+
+
+def test_evict_before_keeps_user_index_in_order():
+    store = IndexedStore()
+    start = datetime(2024, 1, 1)
+    for i in range(10):
+        store.insert("goals", f"g{i}", goal(f"u{i % 2}", start + timedelta(days=i)))
+
+    cutoff = int((start + timedelta(days=5)).timestamp() * 1_000_000)
+    assert store.evict_before("goals", cutoff, max_rows=3) == 3
+    assert store.evict_before("goals", cutoff) == 2
+    assert store.count("goals") == 5
+    assert [g["created_at"] for g in store.list_for_user("goals", "u0")] == \
+        [(start + timedelta(days=d)).isoformat() for d in (6, 8)]
+    assert [g["created_at"] for g in store.list_for_user("goals", "u1")] == \
+        [(start + timedelta(days=d)).isoformat() for d in (5, 7, 9)]
+
+
+def test_evict_before_drops_users_without_records():
+    store = IndexedStore()
+    store.insert("goals", "g0", goal("u0", datetime(2024, 1, 1)))
+    assert store.evict_before("goals", int(datetime(2025, 1, 1).timestamp() * 1_000_000)) == 1
+    assert "u0" not in store.user_index["goals"]
+    assert store.list_for_user("goals", "u0") == []
+
+
+def test_page_skips_records_evicted_while_reading():
+    store = IndexedStore()
+    for i in range(3):
+        store.insert("goals", f"g{i}", goal("u0", datetime(2024, 1, 1 + i)))
+    # The compactor has removed the record but not yet rebuilt the user's id list
+    del store.collections["goals"]["g0"]
+    page, _ = store.page_for_user("goals", "u0", limit=2)
+    assert [g["created_at"] for g in page] == [datetime(2024, 1, 2).isoformat()]
+    assert len(store.list_for_user("goals", "u0")) == 2
+
+def test_sqlite_store_round_trip(tmp_path):
+    path = str(tmp_path / "wellness.db")
+    store = SQLiteStore(path=path)
+    store.insert("users", "u0", {"name": "n", "email": "Someone@Example.com", "created_at": "2024-01-01T00:00:00"})
+    store.insert("goals", "g0", goal("u0", datetime(2024, 1, 1)))
+    store.insert_many("biofeedback", [(f"b{i}", reading("u0", i)) for i in range(5)])
+    store.close()
+
+    store = SQLiteStore(path=path)
+    try:
+        assert store.get("goals", "g0") == goal("u0", datetime(2024, 1, 1))
+        assert store.find_user_by_email("someone@example.com") == "u0"
+        assert store.count("biofeedback") == 5
+        assert [r["heart_rate"] for r in store.biofeedback_range("u0")] == [60, 61, 62, 63, 64]
+        with pytest.raises(DuplicateEmailError):
+            store.insert("users", "u1", {"name": "m", "email": "someone@example.com"})
+    finally:
+        store.close()
+
+
+def test_durable_store_replays_log(tmp_path):
+    store = DurableStore(path=str(tmp_path), snapshot_interval=3600)
+    store.insert("users", "u0", {"name": "n", "email": "a@example.com"})
+    store.insert_many("biofeedback", [(f"b{i}", reading("u0", i)) for i in range(5)])
+    store.wal.close()
+
+    store = DurableStore(path=str(tmp_path), snapshot_interval=3600)
+    try:
+        assert store.recovery["replayed_entries"] == 2
+        assert store.find_user_by_email("a@example.com") == "u0"
+        assert [r["heart_rate"] for r in store.biofeedback_range("u0")] == [60, 61, 62, 63, 64]
+    finally:
+        store.close()
+
+
+def test_durable_store_replays_only_log_after_snapshot(tmp_path):
+    store = DurableStore(path=str(tmp_path), snapshot_interval=3600)
+    store.insert_many("goals", [(f"g{i}", goal("u0", datetime(2024, 1, 1 + i))) for i in range(4)])
+    assert store.snapshot() is not None
+    store.insert("goals", "g4", goal("u0", datetime(2024, 1, 5)))
+    store.evict_before("goals", int(datetime(2024, 1, 3).timestamp() * 1_000_000))
+    store.wal.close()
+
+    store = DurableStore(path=str(tmp_path), snapshot_interval=3600)
+    try:
+        assert store.recovery["snapshot"] is not None
+        assert store.recovery["replayed_entries"] == 2
+        assert sorted(g["created_at"] for g in store.list_for_user("goals", "u0")) == \
+            [datetime(2024, 1, d).isoformat() for d in (3, 4, 5)]
+    finally:
+        store.close()
+
+    store = DurableStore(path=str(tmp_path), snapshot_interval=3600)
+    try:
+        assert store.recovery["replayed_entries"] == 0
+        assert store.count("goals") == 3
+    finally:
+        store.close()
+
+
+def test_durable_store_appends_after_torn_tail(tmp_path):
+    store = DurableStore(path=str(tmp_path), snapshot_interval=3600)
+    store.insert("goals", "a", goal("u0", datetime(2024, 1, 1)))
+    store.wal.close()
+    # A crash while writing the first frame of the next segment
+    (tmp_path / f"wal-{2:020d}.log").write_bytes(b"\x40\x00\x00\x00\x12\x34")
+
+    store = DurableStore(path=str(tmp_path), snapshot_interval=3600)
+    assert store.recovery["truncated_bytes"] == 6
+    store.insert("goals", "b", goal("u0", datetime(2024, 1, 2)))
+    store.wal.close()
+
+    store = DurableStore(path=str(tmp_path), snapshot_interval=3600)
+    try:
+        assert store.recovery["replayed_entries"] == 2
+        assert store.get("goals", "b") == goal("u0", datetime(2024, 1, 2))
+    finally:
+        store.close()
@@ -0,0 +1,71 @@
+import random
+import threading
+from datetime import datetime, timedelta
+
+from src.timeseries import BiofeedbackSeries, to_epoch_us
+
+START = datetime(2024, 1, 1)
+
+
+def reading(i: int, second: int = None) -> dict:
+    """Reading number ``i``, taken ``second`` (default ``i``) seconds after START"""
+    second = i if second is None else second
+    return {"timestamp": START + timedelta(seconds=second), "heart_rate": 60 + i % 50, "stress_level": i % 10,
+            "sleep_quality": 5}
+
+
+def test_append_keeps_readings_sorted():
+    series = BiofeedbackSeries("u1")
+    for i in (3, 1, 2, 0, 4):
+        series.append(f"r{i}", reading(i))
+    assert [record["id"] for record in series.records()] == ["r0", "r1", "r2", "r3", "r4"]
+
+
+def test_page_walks_every_reading_once():
+    series = BiofeedbackSeries("u1")
+    series.extend([(f"r{i}", reading(i)) for i in range(25)])
+    seen, after = [], None
+    while True:
+        page, after = series.page(after=after, limit=10)
+        seen += [record["id"] for record in page]
+        if after is None:
+            break
+    assert seen == [f"r{i}" for i in range(25)]
+
+
+def test_readers_never_see_torn_rows():
+    series = BiofeedbackSeries("u1")
+    stop = threading.Event()
+    errors = []
+
+    def write():
+        rng = random.Random(0)
+        i = 0
+        while not stop.is_set():
+            # Mostly in order, some late readings, and the oldest dropped now and then
+            series.append(f"r{i}", reading(i, i if rng.random() < 0.8 else max(0, i - rng.randint(1, 50))))
+            if i % 200 == 199:
+                series.drop_before(to_epoch_us(START + timedelta(seconds=i - 100)), limit=150)
+            i += 1
+
+    def read():
+        while not stop.is_set():
+            try:
+                page, _ = series.page(limit=50)
+                columns = series.columns_between()
+                assert len({len(values) for values in columns.values()}) == 1
+                for record in page + series.records()[-50:]:
+                    i = int(record["id"][1:])
+                    assert record["heart_rate"] == 60 + i % 50
+            except Exception as e:
+                errors.append(e)
+                stop.set()
+
+    threads = [threading.Thread(target=write)] + [threading.Thread(target=read) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    stop.wait(1.0)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    assert not errors, errors[0]
@@ -1,7 +1,8 @@
 from typing import Dict, List, Any
 from src.guardrails import OutputModel
 from src.hooks import LifecycleHooks
-import google.generativeai as genai
+from src.llm_cache import llm_cache
+from src.llm_clients import get_model
 
 class FAQResponder:
     """Handles frequently asked questions with canned responses"""
@@ -40,13 +41,13 @@ class FAQResponder:
             Respond in 1-2 sentences maximum.
             """
             
-            model = genai.GenerativeModel('gemini-pro')
-            response = model.generate_content(prompt)
+            model = get_model()
+            text = llm_cache.generate(model, prompt, 'faq_responder')
             
             return OutputModel(
                 success=True,
                 message="Generated FAQ response",
-                data={"response": response.text, "is_faq": False}
+                data={"response": text, "is_faq": False}
             ).model_dump()
             
         except Exception as e:
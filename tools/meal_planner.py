@@ -1,40 +1,54 @@
 from typing import Dict, Any, List
 from src.guardrails import OutputModel
 from src.hooks import LifecycleHooks
-import google.generativeai as genai
+from src.llm_cache import llm_cache
+from src.llm_clients import get_model
 
 class MealPlanner:
     """Tool for generating personalized meal plans"""
     
+    def build_prompt(self, goal: Dict[str, Any], diet_prefs: str = None) -> str:
+        """Prompt asking Gemini for this tool's output"""
+        return f"""
+        Create a 7-day meal plan for someone with these goals:
+        {goal['description']}
+        
+        Dietary preferences: {diet_prefs or 'none'}
+        
+        Include:
+        - 3 meals and 2 snacks per day
+        - Calorie targets based on goal
+        - Macronutrient breakdown
+        - Shopping list
+        
+        Format as JSON with days as keys and meals as arrays.
+        """
+    
+    def result(self, plan: Dict[str, Any]) -> Dict[str, Any]:
+        """Tool output for a successfully parsed response"""
+        return OutputModel(
+            success=True,
+            message="Meal plan generated successfully",
+            data={'plan': plan}
+        ).model_dump()
+    
     def generate_plan(self, goal: Dict[str, Any], diet_prefs: str = None) -> Dict[str, Any]:
         """Generate a meal plan based on user's goal and preferences"""
         try:
-            prompt = f"""
-            Create a 7-day meal plan for someone with these goals:
-            {goal['description']}
+            prompt = self.build_prompt(goal, diet_prefs)
             
-            Dietary preferences: {diet_prefs or 'none'}
-            
-            Include:
-            - 3 meals and 2 snacks per day
-            - Calorie targets based on goal
-            - Macronutrient breakdown
-            - Shopping list
-            
-            Format as JSON with days as keys and meals as arrays.
-            """
-            
-            model = genai.GenerativeModel('gemini-pro')
-            response = model.generate_content(prompt)
+            model = get_model()
+            text = llm_cache.generate(model, prompt, 'meal_planner')
             
             # Parse the response (Gemini should return properly formatted JSON)
-            plan = eval(response.text)  # In production, use proper JSON parsing
+            try:
+                plan = eval(text)  # In production, use proper JSON parsing
+            except Exception:
+                # Don't keep serving a response that cannot be parsed
+                llm_cache.discard(model, prompt)
+                raise
             
-            return OutputModel(
-                success=True,
-                message="Meal plan generated successfully",
-                data={'plan': plan}
-            ).model_dump()
+            return self.result(plan)
         
         except Exception as e:
             LifecycleHooks.on_error('MealPlanner', e)
@@ -1,35 +1,58 @@
 from typing import Dict, Any
+from src.batching import MicroBatcher
 from src.guardrails import OutputModel
 from src.hooks import LifecycleHooks
-import google.generativeai as genai
+from src.llm_cache import llm_cache
+from src.llm_clients import get_model
+
+# Mood checks from concurrent sessions share one Gemini request
+mood_batcher = MicroBatcher('mood_detector', """
+For each text, determine the user's mood. Answer each with a JSON object with:
+- mood (one of: happy, sad, anxious, tired, excited, neutral)
+- confidence (0-1)
+- suggested_response (a short empathetic response)
+""")
 
 class MoodDetector:
     """Tool for detecting and analyzing user mood from text"""
     
+    def build_prompt(self, text: str) -> str:
+        """Prompt asking Gemini for this tool's output"""
+        return f"""
+        Analyze this text and determine the user's mood:
+        {text}
+        
+        Return a JSON object with:
+        - mood (one of: happy, sad, anxious, tired, excited, neutral)
+        - confidence (0-1)
+        - suggested_response (a short empathetic response)
+        """
+    
+    def result(self, mood_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Tool output for a successfully parsed response"""
+        return OutputModel(
+            success=True,
+            message="Mood detected successfully",
+            data=mood_data
+        ).model_dump()
+    
     def detect(self, text: str) -> Dict[str, Any]:
         """Detect mood from user's text input"""
         try:
-            prompt = f"""
-            Analyze this text and determine the user's mood:
-            {text}
+            prompt = self.build_prompt(text)
             
-            Return a JSON object with:
-            - mood (one of: happy, sad, anxious, tired, excited, neutral)
-            - confidence (0-1)
-            - suggested_response (a short empathetic response)
-            """
-            
-            model = genai.GenerativeModel('gemini-pro')
-            response = model.generate_content(prompt)
+            model = get_model()
+            response_text = mood_batcher.generate(model, prompt, text)
             
             # Parse the response
-            mood_data = eval(response.text)  # In production, use proper JSON parsing
+            try:
+                mood_data = eval(response_text)  # In production, use proper JSON parsing
+            except Exception:
+                # Don't keep serving a response that cannot be parsed
+                llm_cache.discard(model, prompt)
+                raise
             
-            return OutputModel(
-                success=True,
-                message="Mood detected successfully",
-                data=mood_data
-            ).model_dump()
+            return self.result(mood_data)
         
         except Exception as e:
             LifecycleHooks.on_error('MoodDetector', e)
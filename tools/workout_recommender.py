@@ -1,41 +1,55 @@
 from typing import Dict, Any
 from src.guardrails import OutputModel
 from src.hooks import LifecycleHooks
-import google.generativeai as genai
+from src.llm_cache import llm_cache
+from src.llm_clients import get_model
 
 class WorkoutRecommender:
     """Tool for generating personalized workout plans"""
     
+    def build_prompt(self, goal: Dict[str, Any], injury_notes: str = None) -> str:
+        """Prompt asking Gemini for this tool's output"""
+        return f"""
+        Create a weekly workout plan for someone with these goals:
+        {goal['description']}
+        
+        Injury notes: {injury_notes or 'none'}
+        
+        Include:
+        - 5-6 days of workouts
+        - Mix of cardio and strength
+        - Duration and intensity based on goal
+        - Modifications for any injuries
+        - Progressive overload plan
+        
+        Format as JSON with days as keys and exercises as arrays.
+        """
+    
+    def result(self, plan: Dict[str, Any]) -> Dict[str, Any]:
+        """Tool output for a successfully parsed response"""
+        return OutputModel(
+            success=True,
+            message="Workout plan generated successfully",
+            data={'plan': plan}
+        ).model_dump()
+    
     def generate_plan(self, goal: Dict[str, Any], injury_notes: str = None) -> Dict[str, Any]:
         """Generate a workout plan based on user's goal and any injuries"""
         try:
-            prompt = f"""
-            Create a weekly workout plan for someone with these goals:
-            {goal['description']}
+            prompt = self.build_prompt(goal, injury_notes)
             
-            Injury notes: {injury_notes or 'none'}
-            
-            Include:
-            - 5-6 days of workouts
-            - Mix of cardio and strength
-            - Duration and intensity based on goal
-            - Modifications for any injuries
-            - Progressive overload plan
-            
-            Format as JSON with days as keys and exercises as arrays.
-            """
-            
-            model = genai.GenerativeModel('gemini-pro')
-            response = model.generate_content(prompt)
+            model = get_model()
+            text = llm_cache.generate(model, prompt, 'workout_recommender')
             
             # Parse the response
-            plan = eval(response.text)  # In production, use proper JSON parsing
+            try:
+                plan = eval(text)  # In production, use proper JSON parsing
+            except Exception:
+                # Don't keep serving a response that cannot be parsed
+                llm_cache.discard(model, prompt)
+                raise
             
-            return OutputModel(
-                success=True,
-                message="Workout plan generated successfully",
-                data={'plan': plan}
-            ).model_dump()
+            return self.result(plan)
         
         except Exception as e:
             LifecycleHooks.on_error('WorkoutRecommender', e)
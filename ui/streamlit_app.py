@@ -5,6 +5,7 @@ import requests
 from enum import Enum
 from typing import Dict, List, Optional
 import uuid
+import json
 import sys
 import os
 from pathlib import Path
@@ -22,11 +23,27 @@ logger = logging.getLogger(__name__)
 # Add project root to path
 sys.path.append(str(Path(__file__).parent.parent))
 
+from src.intents import IntentMatcher
+
 # --- Constants ---
 API_BASE_URL = os.getenv("API_BASE_URL","https://fastapi-backend-production-7f8e.up.railway.app")
 MAX_RETRIES = 3
 RETRY_DELAY = 2  # seconds
 
+# Chat intents by keyword, in priority order
+CHAT_INTENTS = IntentMatcher([
+    ("meal", ["meal*", "diet*", "food*", "eat*"]),
+    ("workout", ["workout*", "exercis*", "train*"]),
+    ("goal", ["goal*", "target*", "objective*"]),
+    ("tip", ["tip", "tips", "advice", "suggestion*"]),
+    ("mood", ["mood*", "happy", "sad", "angry"])
+])
+MOOD_INTENTS = IntentMatcher([
+    ("happy", ["happy", "joy*", "good"]),
+    ("sad", ["sad", "depress*", "down"]),
+    ("angry", ["angry", "mad", "frustrat*"])
+])
+
 # --- Enums ---
 class DietPreference(str, Enum):
     VEGETARIAN = "vegetarian"
@@ -75,6 +92,9 @@ class UserSessionContext:
         }
 
 # --- API Client ---
+class ChatStreamError(Exception):
+    """The backend could not get a chat reply from the model"""
+
 class WellnessAPI:
     @staticmethod
     def _make_request(method, endpoint, **kwargs):
@@ -128,6 +148,33 @@ class WellnessAPI:
                     data[field] = 0
         return WellnessAPI._make_request("POST", "/biofeedback/", json=data)
     
+    @staticmethod
+    def stream_chat(context: UserSessionContext, text: str):
+        """Yield the coach's reply chunk by chunk as the backend relays it from the model"""
+        payload = {
+            "message": text,
+            "name": context.name,
+            "coach_preference": context.coach_persona.value,
+            "goal": context.goal,
+            "mood": context.mood_history[-1]["mood"] if context.mood_history else None
+        }
+        with requests.post(f"{API_BASE_URL}/chat/stream", json=payload, stream=True,
+                           timeout=(10, 60)) as response:
+            response.raise_for_status()
+            event = None
+            for line in response.iter_lines(decode_unicode=True):
+                if line.startswith("event: "):
+                    event = line[len("event: "):]
+                elif line.startswith("data: "):
+                    data = json.loads(line[len("data: "):])
+                    if event == "chunk":
+                        yield data["text"]
+                    elif event == "error":
+                        raise ChatStreamError(data["error"])
+                    elif event == "done":
+                        logger.info(f"Chat reply: first token {data['ttft_ms']}ms, "
+                                    f"{data['tokens_per_second']} tokens/s")
+
     @staticmethod
     def get_wellness_tip() -> Dict:
         return WellnessAPI._make_request("GET", "/wellness-tip")
@@ -140,8 +187,9 @@ class WellnessAgent:
     def process_user_input(self, input_text: str) -> Dict:
         input_text = input_text.lower()
         response = ""
+        intent = CHAT_INTENTS.match(input_text).intent
         
-        if any(word in input_text for word in ["meal", "diet", "food", "eat"]):
+        if intent == "meal":
             plan = WellnessAPI.generate_meal_plan(self.context.diet_preferences.value)
             self.context.meal_plan = plan.get("plan", {})
             response = f"🍽️ **{self.context.diet_preferences.value.capitalize()} Meal Plan** 🍽️\n\n"
@@ -151,7 +199,7 @@ class WellnessAgent:
                 response += "\n\n"
             response += "Would you like me to adjust anything?"
         
-        elif any(word in input_text for word in ["workout", "exercise", "train"]):
+        elif intent == "workout":
             plan = WellnessAPI.generate_workout_plan("general")
             self.context.workout_plan = plan.get("plan", {})
             response = "💪 **Personalized Workout Plan** 💪\n\n"
@@ -161,22 +209,16 @@ class WellnessAgent:
                 response += "\n\n"
             response += "How does this plan look to you?"
         
-        elif any(word in input_text for word in ["goal", "target", "objective"]):
+        elif intent == "goal":
             self.context.goal = input_text
             response = f"🎯 **Goal Successfully Set**: \n\n{input_text}\n\nWould you like me to help create a plan to achieve this?"
         
-        elif any(word in input_text for word in ["tip", "advice", "suggestion"]):
+        elif intent == "tip":
             tip = WellnessAPI.get_wellness_tip()
             response = f"💡 **Today's Wellness Tip**: \n\n{tip['tip']}\n\nWould you like another tip?"
         
-        elif any(word in input_text for word in ["happy", "sad", "angry", "mood"]):
-            mood = "neutral"
-            if any(word in input_text for word in ["happy", "joy", "good"]):
-                mood = "happy"
-            elif any(word in input_text for word in ["sad", "depress", "down"]):
-                mood = "sad"
-            elif any(word in input_text for word in ["angry", "mad", "frustrat"]):
-                mood = "angry"
+        elif intent == "mood":
+            mood = MOOD_INTENTS.match(input_text).intent or "neutral"
             
             self.context.add_mood(mood)
             response = f"🌱 Thank you for sharing your mood. I've noted that you're feeling {mood}. "
@@ -188,13 +230,17 @@ class WellnessAgent:
                 response += "How can I help you feel better today?"
         
         else:
-            responses = [
+            # General chat is answered by the coach model through the backend; a greeting covers a failed stream
+            greetings = [
                 f"Hello {self.context.name}! 🙏 I'm your {self.context.coach_persona.value}. How can I help you today?",
                 f"Hi {self.context.name}! 🌟 Your {self.context.coach_persona.value} here. What wellness topic shall we explore?",
                 f"Welcome {self.context.name}! 🌿 As your {self.context.coach_persona.value}, I'm ready to assist.",
                 f"Good to see you {self.context.name}! 💪 Your {self.context.coach_persona.value} is here."
             ]
-            response = random.choice(responses)
+            return {
+                "response": random.choice(greetings),
+                "stream": WellnessAPI.stream_chat(self.context, input_text)
+            }
         
         return {"response": response}
 
@@ -281,7 +327,7 @@ def initialize_session_state():
         try:
             user_data = {
                 "name": "Guest",
-                "email": "guest@wellness.com",
+                "email": f"guest-{uuid.uuid4().hex[:12]}@wellness.com",
                 "is_premium": False,
                 "coach_preference": "ZenBot"
             }
@@ -377,6 +423,21 @@ def configure_sidebar():
             except requests.exceptions.RequestException as e:
                 st.error(f"Failed to record: {str(e)}")
 
+def render_stream(chunks) -> str:
+    """Show a reply as its chunks arrive and return its text; empty if the backend could not stream it"""
+    placeholder = st.empty()
+    text = ""
+    try:
+        for chunk in chunks:
+            text += chunk
+            placeholder.markdown(text + "▌")
+    except (requests.exceptions.RequestException, ChatStreamError) as e:
+        logger.warning(f"Chat stream failed: {e}")
+        text = ""
+    # The finished reply is shown with the rest of the conversation
+    placeholder.empty()
+    return text
+
 def main_content():
     agent = get_wellness_agent()
     
@@ -433,8 +494,11 @@ def main_content():
         with st.spinner(f"{st.session_state.user_context.coach_persona.value} is thinking..."):
             try:
                 output = agent.process_user_input(user_input)
+                response = output.get('response', "I didn't understand that.")
+                if 'stream' in output:
+                    response = render_stream(output['stream']) or response
                 st.session_state.past.append(user_input)
-                st.session_state.generated.append(output.get('response', "I didn't understand that."))
+                st.session_state.generated.append(response)
                 
                 if any(word in user_input.lower() for word in ["done", "completed", "finished"]):
                     st.session_state.user_context.increment_streak()
@@ -1,14 +1,25 @@
-import google.generativeai as genai
-from typing import Generator
+from typing import Generator, Optional
 from src.hooks import LifecycleHooks
 from src.context import UserSessionContext
+from src.llm_cache import llm_cache
+from src.llm_clients import get_model
+from src.stream_metrics import StreamStats, measure_stream
 
 class ResponseStreamer:
     """Utility class for streaming responses from Gemini"""
     
     @staticmethod
-    def stream_response(prompt: str, context: UserSessionContext) -> Generator[str, None, None]:
-        """Stream a response from Gemini"""
+    def stream_response(prompt: str, context: UserSessionContext, stats: Optional[StreamStats] = None,
+                        reraise: bool = False) -> Generator[str, None, None]:
+        """Stream a response from Gemini as its chunks arrive
+
+        Time to first token and tokens/sec are logged for every response and
+        recorded in ``stats`` when one is passed. A failure is reported to
+        the error hook and then sent as an apology in the reply text, or
+        re-raised when ``reraise`` is set so the caller can report it apart
+        from the reply.
+        """
+        stats = stats or StreamStats()
         try:
             full_prompt = f"""
             Respond to the user as {context.coach_persona}, their health coach.
@@ -21,10 +32,11 @@ class ResponseStreamer:
             Respond conversationally in short chunks suitable for streaming.
             """
             
-            model = genai.GenerativeModel('gemini-pro')
-            for chunk in model.generate_content_stream(full_prompt):
-                yield chunk.text
+            model = get_model()
+            yield from measure_stream(llm_cache.stream(model, full_prompt, 'response_streamer'), stats)
         
         except Exception as e:
             LifecycleHooks.on_error('ResponseStreamer', e, context)
+            if reraise:
+                raise
             yield "I encountered an error processing your request. Please try again."
\ No newline at end of file